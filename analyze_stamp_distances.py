@@ -2,15 +2,15 @@
 """
 Stamp Distance Analysis Tool
 
-This script analyzes the distance between geocoded pilgrim stamps and the Camino Frances trail.
-It identifies stamps that are positioned beyond a specified distance threshold from the trail.
+This script analyzes the distance between geocoded pilgrim stamps and the Camino trails.
+It identifies stamps that are positioned beyond a specified distance threshold from the trail
+of their route.
 """
 
 import pandas as pd
 import json
 import folium
-from shapely.geometry import Point, LineString
-from shapely.ops import nearest_points
+import shapely
 import numpy as np
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
@@ -20,13 +20,35 @@ import warnings
 import sys
 import os
 import math
+import time
+from typing import List, NamedTuple
+from routes import ROUTES
+from stamp_identity import stamps_in
 
 warnings.filterwarnings('ignore')
 
+# Mean radius of Earth in kilometers
+EARTH_RADIUS_KM = 6371
+# Length of one degree of latitude in kilometers
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+# Trail route label of trails not tagged with a route; they serve every stamp
+UNTAGGED_ROUTE = ''
+
+class TrailPart(NamedTuple):
+    """One continuous line of a trail"""
+    
+    route: str    # Route name as in the stamps' route column, or UNTAGGED_ROUTE
+    coords: list  # [lon, lat] coordinates
+
 def parse_arguments():
     """Parse command-line arguments"""
     parser = argparse.ArgumentParser(
-        description='Analyze distances between pilgrim stamps and Camino Frances trail',
+        description='Analyze distances between pilgrim stamps and the Camino trails',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
@@ -34,6 +56,12 @@ Examples:
   %(prog)s -d 2.0            # Use 2.0 km threshold
   %(prog)s --distance 10.0   # Use 10.0 km threshold
   %(prog)s -f input.csv      # Use custom input file
+  %(prog)s -t frances=camino_frances_main_trail.geojson   # Use the detailed trail
+  %(prog)s -t frances=frances.geojson navarro=navarro.geojson   # One trail per route
+  %(prog)s --allow-fallback   # Measure stamps of routes without a trail against all trails
+  %(prog)s --distance-mode degrees   # Nearest point in lon/lat degrees (legacy)
+  %(prog)s --between 120 145  # List stamps between km 120 and 145 of the trail
+  %(prog)s --chainage-csv data/stamp_chainage.csv   # Export every stamp's km along the trail
         """
     )
     parser.add_argument(
@@ -48,16 +76,62 @@ Examples:
         default='data/pilgrim_stamps_geocoded.csv',
         help='Input CSV file path (default: data/pilgrim_stamps_geocoded.csv)'
     )
+    parser.add_argument(
+        '-t', '--trail-file',
+        type=str,
+        nargs='+',
+        default=['frances=camino_frances_main_trail_simple.geojson'],
+        help='Trail GeoJSON files as ROUTE=PATH, ROUTE being a route key or name; a plain PATH '
+             'takes routes from a "route" feature property, else serves all stamps '
+             '(default: frances=camino_frances_main_trail_simple.geojson)'
+    )
+    parser.add_argument(
+        '--allow-fallback',
+        action='store_true',
+        help='Measure stamps of routes without a trail against all trails instead of stopping with an error'
+    )
+    parser.add_argument(
+        '--distance-mode',
+        choices=['metric', 'degrees'],
+        default='metric',
+        help='Find nearest trail points in metres on a local transverse Mercator projection, '
+             'or in raw lon/lat degrees followed by haversine (default: metric)'
+    )
+    parser.add_argument(
+        '--between',
+        type=float,
+        nargs=2,
+        metavar=('START_KM', 'END_KM'),
+        help='List the stamps between two distances along their trail, in km from its eastern end'
+    )
+    parser.add_argument(
+        '--chainage-csv',
+        type=str,
+        help='Write every stamp with its distance to and position along the trail, sorted by chainage_km'
+    )
     
     args = parser.parse_args()
     
     if args.distance <= 0:
         parser.error("Distance must be a positive number")
+    if args.between and args.between[0] > args.between[1]:
+        parser.error("--between START_KM must not exceed END_KM")
     
     return args
 
-def load_trail_data(geojson_path):
-    """Load and validate trail data from GeoJSON file"""
+def route_name(route):
+    """Resolve a route key such as "navarro" to the name used in the stamps' route column"""
+    return ROUTES[route].name if route in ROUTES else route
+
+def load_trail_data(trail_spec):
+    """
+    Load and validate trail data from a GeoJSON file.
+    
+    trail_spec is PATH or ROUTE=PATH. Every LineString feature and every line
+    of a MultiLineString becomes a TrailPart, tagged with ROUTE, else with the
+    feature's "route" property, else untagged.
+    """
+    route, _, geojson_path = trail_spec.rpartition('=')
     try:
         with open(geojson_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -69,13 +143,24 @@ def load_trail_data(geojson_path):
         if not features:
             raise ValueError("No features found in GeoJSON")
         
-        # Extract coordinates from the first feature (assuming single trail)
-        coords = features[0]['geometry']['coordinates']
-        if not coords or len(coords) < 2:
-            raise ValueError("Invalid trail: insufficient coordinates")
+        parts = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            properties = feature.get('properties') or {}
+            part_route = route_name(route or properties.get('route') or UNTAGGED_ROUTE)
+            if geometry.get('type') == 'LineString':
+                lines = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiLineString':
+                lines = geometry['coordinates']
+            else:
+                continue
+            parts.extend(TrailPart(part_route, coords) for coords in lines if len(coords) >= 2)
+        
+        if not parts:
+            raise ValueError("Invalid trail: no lines with at least two coordinates")
         
-        print(f"✓ Loaded trail with {len(coords)} coordinate points")
-        return coords
+        print(f"✓ Loaded trail '{geojson_path}' with {len(parts)} lines and {sum(len(p.coords) for p in parts)} coordinate points")
+        return parts
         
     except FileNotFoundError:
         print(f"❌ Error: Trail file '{geojson_path}' not found")
@@ -121,80 +206,438 @@ def load_stamps_data(csv_path):
         sys.exit(1)
 
 def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate the great circle distance between two points on Earth"""
+    """Calculate the great circle distance between points on Earth (scalars or NumPy arrays)"""
     # Convert decimal degrees to radians
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
     
     # Haversine formula
     dlat = lat2 - lat1
     dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    # Radius of Earth in kilometers
-    r = 6371
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(a))
     
-    return c * r
+    return c * EARTH_RADIUS_KM
 
-def calculate_distances_to_trail(stamps_df, trail_coords, max_distance_km):
-    """Calculate distances from stamps to trail and identify those beyond threshold"""
-    print(f"Calculating distances to trail (threshold: {max_distance_km} km)...")
-    
-    # Convert trail coordinates to LineString for efficient distance calculation
-    trail_line = LineString([(coord[0], coord[1]) for coord in trail_coords])
-    
-    # Initialize results
-    distances = []
-    beyond_threshold = []
-    
+def valid_stamp_coordinates(stamps_df):
+    """Keep the stamps with coordinates that are present and non-zero"""
     valid_stamps = stamps_df.dropna(subset=['latitude', 'longitude'])
-    valid_stamps = valid_stamps[(valid_stamps['latitude'] != 0) & (valid_stamps['longitude'] != 0)]
+    return valid_stamps[(valid_stamps['latitude'] != 0) & (valid_stamps['longitude'] != 0)]
+
+class LocalTransverseMercator:
+    """
+    Transverse Mercator projection on WGS84 centred on a region.
+    
+    Like UTM but with the central meridian at the middle of the data and a
+    scale factor of 1 on it, so a trail crossing UTM zones 29N and 30N is
+    projected in one system. Planar distances grow with the point scale
+    factor, about 1 + (dlon * cos(lat))^2 / 2: at 42.5N that is 0.13% at
+    4 degrees of longitude from the central meridian and 0.2% at 5, so
+    callers divide local distances by scale_factor() to get true ones.
+    Forward and inverse series follow Snyder, "Map Projections: A Working
+    Manual" (USGS PP 1395), equations 8-5 to 8-25.
+    """
+    
+    def __init__(self, central_meridian):
+        """Set up the projection around a central meridian in degrees"""
+        self.central_meridian = central_meridian
+        self.e2 = WGS84_F * (2 - WGS84_F)
+        self.ep2 = self.e2 / (1 - self.e2)
+    
+    @classmethod
+    def for_coords(cls, coords):
+        """Projection centred on the longitude span of [lon, lat] coordinates"""
+        lons = np.asarray(coords, dtype=float)[:, 0]
+        return cls((lons.min() + lons.max()) / 2)
+    
+    def _meridian_distance(self, lat):
+        """Distance along the meridian from the equator to latitude lat (radians), in metres"""
+        e2 = self.e2
+        e4 = e2 * e2
+        e6 = e4 * e2
+        return WGS84_A * (
+            (1 - e2/4 - 3*e4/64 - 5*e6/256) * lat
+            - (3*e2/8 + 3*e4/32 + 45*e6/1024) * np.sin(2*lat)
+            + (15*e4/256 + 45*e6/1024) * np.sin(4*lat)
+            - (35*e6/3072) * np.sin(6*lat)
+        )
     
-    print(f"Processing {len(valid_stamps)} stamps with valid coordinates...")
+    def forward(self, lons, lats):
+        """Project lon/lat degrees (arrays) to x/y metres"""
+        lat = np.radians(lats)
+        sin_lat, cos_lat, tan_lat = np.sin(lat), np.cos(lat), np.tan(lat)
+        n = WGS84_A / np.sqrt(1 - self.e2 * sin_lat**2)
+        t = tan_lat**2
+        c = self.ep2 * cos_lat**2
+        a = np.radians(np.asarray(lons, dtype=float) - self.central_meridian) * cos_lat
+        
+        x = n * (a + (1 - t + c) * a**3 / 6 + (5 - 18*t + t**2 + 72*c - 58*self.ep2) * a**5 / 120)
+        y = self._meridian_distance(lat) + n * tan_lat * (
+            a**2 / 2
+            + (5 - t + 9*c + 4*c**2) * a**4 / 24
+            + (61 - 58*t + t**2 + 600*c - 330*self.ep2) * a**6 / 720
+        )
+        return x, y
+    
+    def scale_factor(self, lons, lats):
+        """Point scale factor at lon/lat degrees (arrays): planar / true distance"""
+        lat = np.radians(lats)
+        cos_lat = np.cos(lat)
+        t = np.tan(lat)**2
+        c = self.ep2 * cos_lat**2
+        a = np.radians(np.asarray(lons, dtype=float) - self.central_meridian) * cos_lat
+        return (
+            1
+            + (1 + c) * a**2 / 2
+            + (5 - 4*t + 42*c + 13*c**2 - 28*self.ep2) * a**4 / 24
+            + (61 - 148*t + 16*t**2) * a**6 / 720
+        )
     
-    for idx, (_, stamp) in enumerate(valid_stamps.iterrows()):
-        if idx % 100 == 0:
-            print(f"  Processing stamp {idx+1}/{len(valid_stamps)}...")
+    def inverse(self, x, y):
+        """Unproject x/y metres (arrays) to lon/lat degrees"""
+        e2 = self.e2
+        e1 = (1 - math.sqrt(1 - e2)) / (1 + math.sqrt(1 - e2))
+        mu = np.asarray(y, dtype=float) / (WGS84_A * (1 - e2/4 - 3*e2**2/64 - 5*e2**3/256))
+        lat1 = (
+            mu
+            + (3*e1/2 - 27*e1**3/32) * np.sin(2*mu)
+            + (21*e1**2/16 - 55*e1**4/32) * np.sin(4*mu)
+            + (151*e1**3/96) * np.sin(6*mu)
+            + (1097*e1**4/512) * np.sin(8*mu)
+        )
+        sin_lat1, cos_lat1, tan_lat1 = np.sin(lat1), np.cos(lat1), np.tan(lat1)
+        c1 = self.ep2 * cos_lat1**2
+        t1 = tan_lat1**2
+        n1 = WGS84_A / np.sqrt(1 - e2 * sin_lat1**2)
+        r1 = WGS84_A * (1 - e2) / (1 - e2 * sin_lat1**2) ** 1.5
+        d = np.asarray(x, dtype=float) / n1
         
-        # Create Point for stamp
-        stamp_point = Point(stamp['longitude'], stamp['latitude'])
+        lat = lat1 - (n1 * tan_lat1 / r1) * (
+            d**2 / 2
+            - (5 + 3*t1 + 10*c1 - 4*c1**2 - 9*self.ep2) * d**4 / 24
+            + (61 + 90*t1 + 298*c1 + 45*t1**2 - 252*self.ep2 - 3*c1**2) * d**6 / 720
+        )
+        lon = (
+            d
+            - (1 + 2*t1 + c1) * d**3 / 6
+            + (5 - 2*c1 + 28*t1 - 3*c1**2 + 8*self.ep2 + 24*t1**2) * d**5 / 120
+        ) / cos_lat1
+        return self.central_meridian + np.degrees(lon), np.degrees(lat)
+
+class TrailIndex:
+    """
+    Spatial index over the segments of one or more trails.
+    
+    Every trail line is split into short segments of at most SEGMENT_VERTICES
+    vertices, which are indexed in STRtrees: one per route and one over all
+    segments. A nearest-point query then only visits the segments near each
+    stamp instead of every vertex of the trail, so the cost grows with
+    stamps x log(segments) and a detailed trail is as practical as a
+    simplified one. Each stamp is measured against the trail of its own
+    route; stamps of routes without a trail are measured against all trails.
+    
+    With a projection, the trails are projected once when the index is built
+    and nearest points are searched in metres; stamps are projected in bulk
+    per query. Distances and trail lengths are divided by the projection's
+    scale factor where they lie. Without one, the search runs in lon/lat
+    degrees.
+    
+    Cumulative trail length is precomputed per vertex, so the chainage of a
+    nearest point (its km along its route) is the cumulative length at its
+    edge plus its offset on that edge. The lines of a route are chained in
+    file order.
+    """
+    
+    # Vertices per indexed segment; a few per segment keeps the tree small
+    # without making the exact distance to a candidate segment expensive
+    SEGMENT_VERTICES = 8
+    # Projected distances are true ones times the scale factor; the margin
+    # covers its change between the trail and a stamp
+    PROJECTION_SCALE_MARGIN = 0.01
+    
+    def __init__(self, trail_parts: List[TrailPart], projection=None, chainage_from_east=True):
+        """
+        Split the trails into segments and index them, projected if a projection is given.
+        
+        With chainage_from_east, a route's chainage runs from its eastern end
+        (the Camino is walked westwards), else from its first vertex.
+        """
+        # Lines of one route are kept together so route chainage is contiguous
+        trail_parts = sorted(trail_parts, key=lambda part: part.route)
+        self.projection = projection
+        self.routes = list(dict.fromkeys(part.route for part in trail_parts))
+        self.coords = np.concatenate([np.asarray(part.coords, dtype=float)[:, :2] for part in trail_parts])
+        if projection:
+            self.index_coords = np.column_stack(projection.forward(self.coords[:, 0], self.coords[:, 1]))
+            self.vertex_scale = projection.scale_factor(self.coords[:, 0], self.coords[:, 1])
+        else:
+            self.index_coords = self.coords
         
-        # Find nearest point on trail
-        nearest_point = nearest_points(stamp_point, trail_line)[1]
+        part_lengths = np.array([len(part.coords) for part in trail_parts])
+        part_starts = np.concatenate([[0], np.cumsum(part_lengths)[:-1]])
+        part_routes = np.array([self.routes.index(part.route) for part in trail_parts])
         
-        # Calculate distance using Haversine formula
-        distance_km = haversine_distance(
-            stamp['latitude'], stamp['longitude'],
-            nearest_point.y, nearest_point.x
+        # Segments never cross from one line into the next; consecutive
+        # segments of a line share their boundary vertex
+        step = self.SEGMENT_VERTICES - 1
+        self.segment_starts = np.concatenate([
+            np.arange(start, start + length - 1, step) for start, length in zip(part_starts, part_lengths)
+        ])
+        part_ends = np.repeat(part_starts + part_lengths - 1, np.ceil((part_lengths - 1) / step).astype(int))
+        self.segment_ends = np.minimum(self.segment_starts + step, part_ends)
+        self.segment_routes = np.repeat(part_routes, np.ceil((part_lengths - 1) / step).astype(int))
+        self.segments = shapely.linestrings(
+            np.concatenate([self.index_coords[start:end + 1] for start, end in zip(self.segment_starts, self.segment_ends)]),
+            indices=np.repeat(np.arange(len(self.segment_starts)), self.segment_ends - self.segment_starts + 1)
         )
+        self.tree = shapely.STRtree(self.segments)
+        self.route_trees = {}
+        for code, route in enumerate(self.routes):
+            segment_ids = np.flatnonzero(self.segment_routes == code)
+            self.route_trees[route] = (shapely.STRtree(self.segments[segment_ids]), segment_ids)
+        
+        # Cumulative length at every vertex: in index units over all lines (for
+        # locating), and in km per route (for chainage). The step from one line
+        # to the next has zero length.
+        vertex_part = np.repeat(np.arange(len(trail_parts)), part_lengths)
+        same_line = vertex_part[:-1] == vertex_part[1:]
+        edge_lengths = np.hypot(*np.diff(self.index_coords, axis=0).T) * same_line
+        self.cumulative_index = np.concatenate([[0.0], np.cumsum(edge_lengths)])
+        if projection:
+            # Planar edge lengths over the mean scale factor of their ends
+            edge_km = edge_lengths / 1000 / ((self.vertex_scale[:-1] + self.vertex_scale[1:]) / 2)
+        else:
+            edge_km = haversine_distance(
+                self.coords[:-1, 1], self.coords[:-1, 0], self.coords[1:, 1], self.coords[1:, 0]
+            ) * same_line
+        cumulative_km = np.concatenate([[0.0], np.cumsum(edge_km)])
         
-        distances.append(distance_km)
-        
-        # Check if beyond threshold
-        if distance_km > max_distance_km:
-            beyond_threshold.append({
-                'place': stamp['place'],
-                'town': stamp['town'],
-                'latitude': stamp['latitude'],
-                'longitude': stamp['longitude'],
-                'distance_km': distance_km,
-                'nearest_trail_lat': nearest_point.y,
-                'nearest_trail_lon': nearest_point.x
-            })
-    
-    print("✓ Distance calculation complete!")
+        vertex_route = part_routes[vertex_part]
+        route_first = np.array([np.flatnonzero(vertex_route == code)[0] for code in range(len(self.routes))])
+        route_last = np.array([np.flatnonzero(vertex_route == code)[-1] for code in range(len(self.routes))])
+        self.route_length_km = dict(zip(self.routes, cumulative_km[route_last] - cumulative_km[route_first]))
+        self.cumulative_km = cumulative_km - cumulative_km[route_first][vertex_route]
+        
+        # Trails drawn from west to east get their chainage reversed
+        if chainage_from_east:
+            reverse = self.coords[route_first, 0] < self.coords[route_last, 0]
+        else:
+            reverse = np.zeros(len(self.routes), dtype=bool)
+        self.reverse_chainage = dict(zip(self.routes, reverse))
+    
+    def search_radius(self, max_distance_km):
+        """
+        Radius in index units that holds every point within max_distance_km of the trail.
+        
+        Projected, that is the distance in metres times the trail's largest
+        scale factor, plus a margin.
+        In degrees, a degree of longitude shrinks with latitude, so the radius
+        is sized for the trail's highest latitude, with a margin for the diagonal.
+        """
+        if self.projection:
+            return max_distance_km * 1000 * self.vertex_scale.max() * (1 + self.PROJECTION_SCALE_MARGIN)
+        max_lat = min(89.0, np.abs(self.coords[:, 1]).max() + max_distance_km / KM_PER_DEGREE)
+        return math.sqrt(2) * max_distance_km / (KM_PER_DEGREE * math.cos(math.radians(max_lat)))
+    
+    def nearest_segments(self, points, routes=None, max_distance_km=None):
+        """
+        Find the trail segment nearest to each point.
+        
+        Points are grouped by route and each group is queried in one batch
+        against its route's tree; points whose route has no trail, or all
+        points when routes is None, are queried against every segment.
+        
+        With max_distance_km, the first pass only searches the segments within
+        the matching search radius; the few points left over are clearly beyond
+        the threshold and are resolved by an unbounded search.
+        
+        Returns an array of segment indices, one per point, and the number of
+        points beyond the search radius.
+        """
+        groups = []
+        if routes is None:
+            groups.append((self.tree, None, np.arange(len(points))))
+        else:
+            routes = np.asarray(routes, dtype=object)
+            has_trail = np.isin(routes, list(self.route_trees))
+            for route, (tree, segment_ids) in self.route_trees.items():
+                groups.append((tree, segment_ids, np.flatnonzero(routes == route)))
+            groups.append((self.tree, None, np.flatnonzero(~has_trail)))
+        
+        nearest = np.full(len(points), -1, dtype=np.intp)
+        beyond_radius = 0
+        for tree, segment_ids, point_ids in groups:
+            if not len(point_ids):
+                continue
+            found = np.full(len(point_ids), -1, dtype=np.intp)
+            if max_distance_km is not None:
+                point_idx, tree_idx = tree.query_nearest(
+                    points[point_ids], max_distance=self.search_radius(max_distance_km), all_matches=False
+                )
+                found[point_idx] = tree_idx
+            
+            # all_matches=False keeps one segment per point when several are equally close
+            remaining = np.flatnonzero(found < 0)
+            if len(remaining):
+                point_idx, tree_idx = tree.query_nearest(points[point_ids[remaining]], all_matches=False)
+                found[remaining[point_idx]] = tree_idx
+                if max_distance_km is not None:
+                    beyond_radius += len(remaining)
+            nearest[point_ids] = found if segment_ids is None else segment_ids[found]
+        return nearest, beyond_radius
+    
+    def distances(self, stamps_df, max_distance_km=None):
+        """
+        Compute the distance from every stamp to its trail in one vectorized pass.
+        
+        Stamps are matched by their route column when there is one. Returns a
+        DataFrame indexed like stamps_df with distance_km, nearest_trail_lat,
+        nearest_trail_lon, trail_route and chainage_km, plus the number of
+        stamps beyond the search radius of max_distance_km.
+        """
+        lats = stamps_df['latitude'].to_numpy(float)
+        lons = stamps_df['longitude'].to_numpy(float)
+        routes = stamps_df['route'].to_numpy(object) if 'route' in stamps_df.columns else None
+        if self.projection:
+            points = shapely.points(*self.projection.forward(lons, lats))
+        else:
+            points = shapely.points(lons, lats)
+        segment_ids, beyond_radius = self.nearest_segments(points, routes, max_distance_km)
+        
+        # The second vertex of each shortest line is the nearest point on the trail
+        shortest_lines = shapely.shortest_line(points, self.segments[segment_ids])
+        nearest = shapely.get_coordinates(shortest_lines)[1::2]
+        if self.projection:
+            nearest_lon, nearest_lat = self.projection.inverse(nearest[:, 0], nearest[:, 1])
+            # True length over the scale factor midway between stamp and trail
+            scale = self.projection.scale_factor((lons + nearest_lon) / 2, (lats + nearest_lat) / 2)
+            distance_km = shapely.length(shortest_lines) / 1000 / scale
+        else:
+            nearest_lon, nearest_lat = nearest[:, 0], nearest[:, 1]
+            distance_km = haversine_distance(lats, lons, nearest_lat, nearest_lon)
+        
+        distances = pd.DataFrame({
+            'distance_km': distance_km,
+            'nearest_trail_lat': nearest_lat,
+            'nearest_trail_lon': nearest_lon,
+            'trail_route': np.array(self.routes, dtype=object)[self.segment_routes[segment_ids]],
+            'chainage_km': self.chainage(segment_ids, shapely.points(nearest)),
+        }, index=stamps_df.index)
+        return distances, beyond_radius
+    
+    def chainage(self, segment_ids, trail_points):
+        """
+        Position along its route, in km, of points on the given segments.
+        
+        Args:
+            segment_ids: Index of the segment each point lies on
+            trail_points: Points on the trail, in index coordinates
+        """
+        starts = self.segment_starts[segment_ids]
+        # Offset from the first vertex in index units, then the edge it falls on
+        offsets = self.cumulative_index[starts] + shapely.line_locate_point(self.segments[segment_ids], trail_points)
+        edges = np.searchsorted(self.cumulative_index, offsets, side='right') - 1
+        edges = np.clip(edges, starts, self.segment_ends[segment_ids] - 1)
+        edge_lengths = self.cumulative_index[edges + 1] - self.cumulative_index[edges]
+        fractions = np.divide(
+            offsets - self.cumulative_index[edges], edge_lengths,
+            out=np.zeros_like(offsets), where=edge_lengths > 0
+        )
+        chainage_km = self.cumulative_km[edges] + fractions * (self.cumulative_km[edges + 1] - self.cumulative_km[edges])
+        
+        route_codes = self.segment_routes[segment_ids]
+        reverse = np.array([self.reverse_chainage[route] for route in self.routes])[route_codes]
+        lengths = np.array([self.route_length_km[route] for route in self.routes])[route_codes]
+        return np.where(reverse, lengths - chainage_km, chainage_km)
+
+class ChainageIndex:
+    """
+    Stamps sorted by route and chainage for range queries.
+    
+    "Stamps between km 120 and 145" is two binary searches per route on the
+    sorted chainage array and one slice, instead of a scan of every stamp.
+    """
+    
+    def __init__(self, stamps_df):
+        """Sort stamps that have trail_route and chainage_km columns"""
+        self.stamps = stamps_df.sort_values(['trail_route', 'chainage_km'], kind='stable')
+        self.chainage_km = self.stamps['chainage_km'].to_numpy()
+        routes = self.stamps['trail_route'].to_numpy(object)
+        # Slice of every route in the sorted frame
+        boundaries = np.flatnonzero(routes[1:] != routes[:-1]) + 1
+        starts = np.concatenate([[0], boundaries]) if len(routes) else np.array([], dtype=int)
+        ends = np.concatenate([boundaries, [len(routes)]]) if len(routes) else np.array([], dtype=int)
+        self.route_slices = {routes[start]: (start, end) for start, end in zip(starts, ends)}
+    
+    def between(self, start_km, end_km, route=None):
+        """Stamps with start_km <= chainage_km <= end_km, per route in trail order"""
+        sections = []
+        for name, (first, last) in self.route_slices.items():
+            if route is not None and name != route:
+                continue
+            chainage_km = self.chainage_km[first:last]
+            lo = first + np.searchsorted(chainage_km, start_km, side='left')
+            hi = first + np.searchsorted(chainage_km, end_km, side='right')
+            sections.append(self.stamps.iloc[lo:hi])
+        return pd.concat(sections) if sections else self.stamps.iloc[:0]
+
+def calculate_distances_to_trail(stamps_df, trail_parts, max_distance_km, distance_mode='metric',
+                                 allow_fallback=False):
+    """
+    Calculate distances from stamps to their route's trail and identify those beyond threshold.
+    
+    Stamps of a route without a trail would be measured against the other
+    routes' trails, which flags most of them as far off; that raises a
+    ValueError unless allow_fallback is set or an untagged trail is given.
+    """
+    print(f"Calculating distances to trail (threshold: {max_distance_km} km, {distance_mode} mode)...")
+    
+    # Index the trail segments for nearest-segment queries
+    all_coords = np.concatenate([np.asarray(part.coords, dtype=float)[:, :2] for part in trail_parts])
+    projection = LocalTransverseMercator.for_coords(all_coords) if distance_mode == 'metric' else None
+    trail_index = TrailIndex(trail_parts, projection)
+    
+    valid_stamps = valid_stamp_coordinates(stamps_df)
+    
+    print(f"Processing {len(valid_stamps)} stamps with valid coordinates against {len(trail_index.segments)} trail segments...")
+    if 'route' in valid_stamps.columns:
+        unmatched = ~valid_stamps['route'].isin(trail_index.routes)
+        if unmatched.any() and UNTAGGED_ROUTE not in trail_index.routes:
+            missing_routes = ', '.join(sorted(valid_stamps.loc[unmatched, 'route'].astype(str).unique()))
+            if not allow_fallback:
+                raise ValueError(
+                    f"No trail for route(s) {missing_routes} ({unmatched.sum()} stamps). "
+                    f"Add one with -t ROUTE=PATH, or pass --allow-fallback to measure them against all trails"
+                )
+            print(f"⚠️  Warning: {unmatched.sum()} stamps on routes without a trail ({missing_routes}) are measured against all trails")
+    
+    start = time.perf_counter()
+    distances, beyond_radius = trail_index.distances(valid_stamps, max_distance_km)
+    elapsed = time.perf_counter() - start
+    
+    # Check if beyond threshold
+    beyond = distances['distance_km'] > max_distance_km
+    beyond_threshold = (
+        valid_stamps.loc[beyond, ['place', 'town', 'latitude', 'longitude']]
+        .join(distances[beyond])
+        .to_dict('records')
+    )
+    
+    print(f"✓ Distance calculation complete in {elapsed:.3f}s!")
     print(f"  - Valid stamps processed: {len(valid_stamps)}")
+    print(f"  - Stamps outside the search radius (cut off early): {beyond_radius}")
     print(f"  - Stamps beyond {max_distance_km}km threshold: {len(beyond_threshold)}")
+    for route in trail_index.routes:
+        print(f"  - Trail length of {route or 'untagged trail'}: {trail_index.route_length_km[route]:.1f} km")
     
-    return beyond_threshold, distances
+    return beyond_threshold, valid_stamps.join(distances)
 
-def create_interactive_map(trail_coords, stamps_df, wrongly_geocoded, max_distance_km):
-    """Create an interactive folium map showing trail and stamps"""
+def create_interactive_map(trail_parts, stamps_df, wrongly_geocoded, max_distance_km):
+    """Create an interactive folium map showing trails and stamps"""
     print("Creating interactive map...")
     
     # Calculate center point from trail coordinates
-    trail_lats = [coord[1] for coord in trail_coords]
-    trail_lons = [coord[0] for coord in trail_coords]
+    trail_lats = [coord[1] for part in trail_parts for coord in part.coords]
+    trail_lons = [coord[0] for part in trail_parts for coord in part.coords]
     center_lat = (min(trail_lats) + max(trail_lats)) / 2
     center_lon = (min(trail_lons) + max(trail_lons)) / 2
     
@@ -205,26 +648,25 @@ def create_interactive_map(trail_coords, stamps_df, wrongly_geocoded, max_distan
         tiles='OpenStreetMap'
     )
     
-    # Add trail
-    folium.PolyLine(
-        locations=[[coord[1], coord[0]] for coord in trail_coords],
-        color='blue',
-        weight=4,
-        opacity=0.8,
-        popup='Camino Frances Trail'
-    ).add_to(m)
+    # Add trails
+    for part in trail_parts:
+        folium.PolyLine(
+            locations=[[coord[1], coord[0]] for coord in part.coords],
+            color='blue',
+            weight=4,
+            opacity=0.8,
+            popup=f"{part.route or 'Camino'} Trail"
+        ).add_to(m)
+    
+    # Flag wrongly geocoded stamps in one lookup by stamp identity
+    flagged = stamps_in(stamps_df, pd.DataFrame(wrongly_geocoded, columns=['place', 'town']))
     
     # Add stamps
-    for _, stamp in stamps_df.iterrows():
+    for (_, stamp), is_wrongly_geocoded in zip(stamps_df.iterrows(), flagged):
         if pd.isna(stamp['latitude']) or pd.isna(stamp['longitude']):
             continue
             
         # Determine color based on whether it's wrongly geocoded
-        is_wrongly_geocoded = any(
-            wg['place'] == stamp['place'] and wg['town'] == stamp['town']
-            for wg in wrongly_geocoded
-        )
-        
         color = 'red' if is_wrongly_geocoded else 'green'
         popup_text = f"""
         <b>{stamp['place']}</b><br>
@@ -288,7 +730,7 @@ def export_to_excel(wrongly_geocoded, max_distance_km):
     # Add title
     ws.merge_cells('A1:H1')
     title_cell = ws['A1']
-    title_cell.value = f"Pilgrim Stamps Beyond {max_distance_km}km from Camino Frances Trail"
+    title_cell.value = f"Pilgrim Stamps Beyond {max_distance_km}km from the Trail of Their Route"
     title_cell.font = Font(bold=True, size=14)
     title_cell.alignment = Alignment(horizontal="center")
     
@@ -372,16 +814,32 @@ def main():
     
     # Load data
     print("Loading data files...")
-    trail_coords = load_trail_data('camino_frances_main_trail_simple.geojson')
+    trail_parts = [part for trail_spec in args.trail_file for part in load_trail_data(trail_spec)]
     stamps_df = load_stamps_data(input_file)
     print("Data loaded successfully!")
-    print(f"  - Trail coordinates: {len(trail_coords)} points")
+    print(f"  - Trail coordinates: {sum(len(part.coords) for part in trail_parts)} points in {len(trail_parts)} lines")
     print(f"  - Stamps: {len(stamps_df)} records\n")
     
     # Calculate distances
-    wrongly_geocoded, all_distances = calculate_distances_to_trail(
-        stamps_df, trail_coords, max_distance_km
-    )
+    try:
+        wrongly_geocoded, all_distances = calculate_distances_to_trail(
+            stamps_df, trail_parts, max_distance_km, args.distance_mode, args.allow_fallback
+        )
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    
+    # Position along the trail
+    chainage_index = ChainageIndex(all_distances)
+    if args.chainage_csv:
+        chainage_index.stamps.to_csv(args.chainage_csv, index=False)
+        print(f"✓ Stamp chainage saved as '{args.chainage_csv}'")
+    if args.between:
+        start_km, end_km = args.between
+        section = chainage_index.between(start_km, end_km)
+        print(f"\nStamps between km {start_km:g} and {end_km:g}: {len(section)}")
+        for _, stamp in section.iterrows():
+            print(f"  - {stamp['trail_route'] or 'km'} {stamp['chainage_km']:.1f}: {stamp['place']} in {stamp['town']} ({stamp['distance_km']:.2f} km off trail)")
     
     if not wrongly_geocoded:
         print("✅ All stamps are within the distance threshold!")
@@ -400,7 +858,7 @@ def main():
     
     # Create map
     print("\nCreating interactive map...")
-    create_interactive_map(trail_coords, stamps_df, wrongly_geocoded, max_distance_km)
+    create_interactive_map(trail_parts, stamps_df, wrongly_geocoded, max_distance_km)
     print("\nMap creation complete - Excel export pending...")
     
     # Export to Excel
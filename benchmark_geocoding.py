@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Geocoding Benchmark
+
+This script drives PilgrimStampGeocoder against the local stand-in for the
+Google Geocoding API (geocoding_stub_server.py), so geocoding throughput,
+concurrency, caching and retry behaviour can be measured reproducibly without
+an API key or network access. Every run must produce the same coordinates.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from geocode_cache import GeocodeCache
+from geocode_pilgrim_stamps import PilgrimStampGeocoder
+from geocoder_backends import GoogleBackend
+from geocoding_stub_server import StubGeocodingServer
+
+RESULT_COLUMNS = ['latitude', 'longitude', 'geocoding_status']
+
+def parse_arguments():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark geocoding against a local stand-in for the Google Geocoding API',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                                  # 500 synthetic rows at 1, 4 and 16 workers
+  %(prog)s --input data/pilgrim_stamps.csv  # Geocode the real dataset's queries
+  %(prog)s --error-rate 0.05 --quota-error-rate 0.05   # Exercise retries
+  %(prog)s --cache                          # Also compare a cold and a warm cache run
+        """
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        help='Dataset CSV with place and town columns (default: synthetic rows)'
+    )
+    parser.add_argument(
+        '--rows',
+        type=int,
+        default=500,
+        help='Number of synthetic rows (default: 500)'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        nargs='+',
+        default=[1, 4, 16],
+        help='Worker counts to compare (default: 1 4 16)'
+    )
+    parser.add_argument(
+        '--qps',
+        type=float,
+        default=100.0,
+        help='Geocoder rate limit in requests per second (default: 100)'
+    )
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.05,
+        help='Server response time in seconds (default: 0.05)'
+    )
+    parser.add_argument(
+        '--miss-rate',
+        type=float,
+        default=0.1,
+        help='Share of addresses without a result (default: 0.1)'
+    )
+    parser.add_argument(
+        '--error-rate',
+        type=float,
+        default=0.0,
+        help='Share of requests failing with HTTP 500 (default: 0)'
+    )
+    parser.add_argument(
+        '--quota-error-rate',
+        type=float,
+        default=0.0,
+        help='Share of requests failing with OVER_QUERY_LIMIT (default: 0)'
+    )
+    parser.add_argument(
+        '--server-qps-limit',
+        type=float,
+        help='Quota of the server in requests per second, answered with OVER_QUERY_LIMIT beyond it'
+    )
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='Also run twice with a fresh geocode cache to measure cold and warm runs'
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Show the geocoder log'
+    )
+    return parser.parse_args()
+
+def synthetic_dataset(rows):
+    """Build a dataset shaped like pilgrim_stamps.csv, with repeated places as in the real data"""
+    # One place in five is listed twice, like stamps appearing on two routes
+    place_ids = [i % max(1, rows * 4 // 5) for i in range(rows)]
+    towns = [f"Town {place_id % max(1, rows // 8)}" for place_id in place_ids]
+    places = [f"Albergue {place_id}" if place_id % 25 else '' for place_id in place_ids]
+    return pd.DataFrame({
+        'route': 'Camino Francés',
+        'town': towns,
+        'place': places,
+        'categories': '',
+        'english_categories': '',
+        'image_path': '',
+        'stamp_url': [f"https://example.invalid/item/{i}" for i in range(rows)],
+    })
+
+def run(server, csv_path, workers, qps, geocode_cache=None):
+    """Geocode the dataset once; return the results, seconds taken and requests served"""
+    backend = GoogleBackend(server.client(), geocode_cache)
+    geocoder = PilgrimStampGeocoder(geocode_cache, backends=[backend])
+    geocoder.rate_limiter.configure(geocoder.rate_limit_host, qps, workers)
+
+    requests_before = server.stats['requests']
+    start = time.perf_counter()
+    result = geocoder.geocode_dataset(csv_path, workers=workers)
+    elapsed = time.perf_counter() - start
+    return result, elapsed, server.stats['requests'] - requests_before
+
+def print_row(label, result, elapsed, requests):
+    """Print one line of the results table"""
+    geocoded = int((result['geocoding_status'] == 'success').sum())
+    print(f"{label:<16}{elapsed:>10.2f}{len(result) / elapsed:>12.1f}{requests:>10}{geocoded:>10}")
+
+def main():
+    """Main function to run the benchmark"""
+    print("Geocoding Benchmark")
+    print("=" * 40)
+
+    args = parse_arguments()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.input:
+            dataset = pd.read_csv(args.input)
+            print(f"✓ Loaded {len(dataset)} rows from {args.input}")
+        else:
+            dataset = synthetic_dataset(args.rows)
+            print(f"✓ Using {len(dataset)} synthetic rows")
+        csv_path = os.path.join(work_dir, 'dataset.csv')
+        dataset.to_csv(csv_path, index=False)
+
+        server = StubGeocodingServer(
+            latency=args.latency,
+            miss_rate=args.miss_rate,
+            error_rate=args.error_rate,
+            quota_error_rate=args.quota_error_rate,
+            qps_limit=args.server_qps_limit,
+        )
+        with server:
+            print(f"✓ Stub geocoding server on {server.url} ({args.latency * 1000:.0f} ms latency, "
+                  f"{args.error_rate:.0%} server errors, {args.quota_error_rate:.0%} quota errors)\n")
+
+            print(f"{'Run':<16}{'seconds':>10}{'rows/s':>12}{'requests':>10}{'geocoded':>10}")
+            reference = None
+            mismatches = 0
+            for workers in args.workers:
+                result, elapsed, requests = run(server, csv_path, workers, args.qps)
+                print_row(f"{workers} workers", result, elapsed, requests)
+                if reference is None:
+                    reference = result
+                elif not result[RESULT_COLUMNS].equals(reference[RESULT_COLUMNS]):
+                    mismatches += 1
+                    print(f"❌ Results with {workers} workers differ from {args.workers[0]} workers")
+
+            if args.cache:
+                workers = max(args.workers)
+                geocode_cache = GeocodeCache(os.path.join(work_dir, 'geocode_cache.sqlite'))
+                for label in ('cold cache', 'warm cache'):
+                    result, elapsed, requests = run(server, csv_path, workers, args.qps, geocode_cache)
+                    print_row(label, result, elapsed, requests)
+                    if not result[RESULT_COLUMNS].equals(reference[RESULT_COLUMNS]):
+                        mismatches += 1
+                        print(f"❌ Results with a {label} differ from the uncached run")
+                geocode_cache.close()
+
+        print(f"\nServer: {server.stats['requests']} requests, {server.stats['server_errors']} server errors, "
+              f"{server.stats['quota_errors']} quota errors, at most {server.stats['max_in_flight']} in flight")
+
+    if mismatches:
+        print(f"❌ {mismatches} runs produced different results")
+        sys.exit(1)
+    print("✓ All runs produced identical results")
+
+if __name__ == "__main__":
+    main()
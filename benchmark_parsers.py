@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Parser Backend Benchmark
+
+This script measures the per-page parse cost of each HTML parser backend and
+checks that all backends extract identical data. Pages are taken from the
+HTTP response cache of a previous crawl when available, otherwise synthetic
+pages shaped like the site's Joomla/Zoo templates are used.
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+from parsers import PARSERS, get_parser
+
+def parse_arguments():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark HTML parser backends on stamp pages',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                                  # Use pages from data/http_cache.sqlite
+  %(prog)s --synthetic 200                  # Use 200 synthetic pages
+  %(prog)s --repeat 5                       # Parse every page 5 times
+        """
+    )
+    parser.add_argument(
+        '--cache-path',
+        type=str,
+        default='data/http_cache.sqlite',
+        help='HTTP cache to read crawled pages from (default: data/http_cache.sqlite)'
+    )
+    parser.add_argument(
+        '--synthetic',
+        type=int,
+        default=0,
+        help='Number of synthetic pages to use instead of cached pages'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Times each page is parsed per backend (default: 3)'
+    )
+    return parser.parse_args()
+
+def load_cached_pages(cache_path):
+    """Load crawled HTML pages from the HTTP cache"""
+    if not os.path.exists(cache_path):
+        return []
+    conn = sqlite3.connect(cache_path)
+    try:
+        rows = conn.execute(
+            "SELECT url, headers, body FROM responses WHERE headers LIKE '%text/html%'"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(url, body.decode('utf-8', errors='replace')) for url, _, body in rows]
+
+def synthetic_stamp_page(i):
+    """Build a stamp page resembling the site's item template"""
+    menu = ''.join(
+        f'<li><a href="/index.php/ruta-del-camino-frances/menu-camino-frances/category/town-{j}">Town {j}</a></li>'
+        for j in range(150)
+    )
+    scripts = '<script>var x = 1;</script>' * 20
+    return f"""<!DOCTYPE html>
+<html><head><title>Sello {i} - Los Sellos del Camino</title>{scripts}</head>
+<body>
+<div id="header"><img src="/images/logo.png" alt="logo"><ul class="menu">{menu}</ul></div>
+<div class="item">
+  <h1 class="pos-title">Albergue de peregrinos número {i}</h1>
+  <div class="pos-media"><img src="/media/zoo/images/sello_{i}_abc123.jpg" alt="sello"></div>
+  <div class="element element-itemcategory first last">
+    <a href="/index.php/category/albergues">Albergues de peregrinos</a>,
+    <a href="/index.php/category/iglesias"> Iglesias y parroquias </a>
+  </div>
+  <p>{'Lorem ipsum dolor sit amet. ' * 200}</p>
+</div>
+<div id="footer"><img src="/images/footer_banner.png"></div>
+</body></html>"""
+
+def synthetic_town_page(i):
+    """Build a town page resembling the site's category template"""
+    items = ''.join(
+        f'<div class="teaser"><a href="/index.php/ruta-del-camino-frances/menu-camino-frances/item/sello-{i}-{j}">'
+        f'<img src="/media/zoo/images/thumb_{i}_{j}.jpg"></a>'
+        f'<a href="/index.php/ruta-del-camino-frances/menu-camino-frances/item/sello-{i}-{j}">Sello {j}</a></div>'
+        for j in range(30)
+    )
+    return f"<html><head><title>Town {i}</title></head><body>{items}</body></html>"
+
+def extract(parser, url, html):
+    """Run the extraction the scraper performs for a page"""
+    if '/item/' in url:
+        return parser.extract_stamp_page(html)
+    pattern = '/item/' if '/category/' in url else '/category/'
+    return parser.extract_links(html, pattern)
+
+def benchmark(parser, pages, repeat):
+    """Return per-page parse times in milliseconds for one backend"""
+    timings = []
+    for url, html in pages:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            extract(parser, url, html)
+        timings.append((time.perf_counter() - start) * 1000 / repeat)
+    return timings
+
+def main():
+    """Main function to run the benchmark"""
+    print("Parser Backend Benchmark")
+    print("=" * 40)
+
+    args = parse_arguments()
+
+    pages = [] if args.synthetic else load_cached_pages(args.cache_path)
+    if pages:
+        print(f"✓ Loaded {len(pages)} cached pages from {args.cache_path}")
+    else:
+        count = args.synthetic or 100
+        pages = [(f'synthetic/item/{i}', synthetic_stamp_page(i)) for i in range(count)]
+        pages += [(f'synthetic/category/{i}', synthetic_town_page(i)) for i in range(max(1, count // 10))]
+        print(f"✓ Using {len(pages)} synthetic pages")
+
+    parsers = {name: get_parser(name) for name in PARSERS}
+
+    # Every backend must extract exactly the same data
+    reference_name = 'html.parser'
+    mismatches = 0
+    for url, html in pages:
+        reference = extract(parsers[reference_name], url, html)
+        for name, parser in parsers.items():
+            if name != reference_name and extract(parser, url, html) != reference:
+                mismatches += 1
+                print(f"❌ {name} output differs from {reference_name} for {url}")
+    if mismatches:
+        print(f"❌ {mismatches} mismatching pages")
+        sys.exit(1)
+    print(f"✓ All backends produce identical output on {len(pages)} pages\n")
+
+    results = {}
+    for name, parser in parsers.items():
+        results[name] = benchmark(parser, pages, args.repeat)
+
+    print(f"{'Backend':<14}{'mean ms/page':>14}{'median':>10}{'p95':>10}")
+    for name, timings in results.items():
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        print(f"{name:<14}{statistics.mean(timings):>14.2f}{statistics.median(timings):>10.2f}{p95:>10.2f}")
+
+    speedup = statistics.mean(results[reference_name]) / statistics.mean(results['lxml'])
+    print(f"\n🚀 lxml is {speedup:.1f}x faster than {reference_name} per page")
+
+if __name__ == "__main__":
+    main()
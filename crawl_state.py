@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Persistent crawl frontier and result journal for the Pilgrim Stamp Scraper.
+Records every town and stamp URL as pending, done or failed in SQLite so an
+interrupted crawl can be resumed without repeating completed work.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+class CrawlState:
+    """
+    SQLite-backed crawl frontier.
+
+    Town pages and stamp pages each have a status row. Completed stamp rows
+    also hold the scraped record, so a resumed crawl can return them
+    without fetching anything.
+    """
+
+    def __init__(self, path: str = 'data/crawl_state.sqlite'):
+        """
+        Open (or create) the crawl state database.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+
+        state_dir = os.path.dirname(path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+        # One connection shared by all worker threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS towns (
+                    route TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (route, url)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS stamps (
+                    route TEXT NOT NULL,
+                    town_url TEXT NOT NULL,
+                    town_name TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    record TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (route, town_name, url)
+                )
+            """)
+
+    def reset(self) -> None:
+        """Forget all previous progress, for a fresh (non-resumed) crawl."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM towns")
+            self._conn.execute("DELETE FROM stamps")
+        logging.info(f"Crawl state reset: {self.path}")
+
+    def get_towns(self, route: str) -> List[str]:
+        """
+        Get the town URLs recorded for a route, in discovery order.
+
+        Args:
+            route: Route key, e.g. "navarro"
+
+        Returns:
+            List of town URLs (empty if the route menu was never crawled)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM towns WHERE route = ? ORDER BY rowid", (route,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add_towns(self, route: str, town_urls: List[str]) -> None:
+        """
+        Add town URLs to the frontier as pending (existing rows are kept).
+
+        Args:
+            route: Route key
+            town_urls: Town URLs found on the route menu page
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO towns (route, url, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(route, url, PENDING, now) for url in town_urls]
+            )
+
+    def get_town_stamps(self, route: str, town_url: str) -> Optional[List[str]]:
+        """
+        Get the stamp URLs of a town page that was already crawled.
+
+        Args:
+            route: Route key
+            town_url: Town page URL
+
+        Returns:
+            List of stamp URLs, or None if the town page still has to be fetched
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM towns WHERE route = ? AND url = ?", (route, town_url)
+            ).fetchone()
+            if row is None or row[0] != DONE:
+                return None
+            rows = self._conn.execute(
+                "SELECT url FROM stamps WHERE route = ? AND town_url = ? ORDER BY rowid",
+                (route, town_url)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def record_town(self, route: str, town_url: str, town_name: str, stamp_urls: List[str]) -> None:
+        """
+        Mark a town page as done and add its stamp URLs as pending.
+
+        Args:
+            route: Route key
+            town_url: Town page URL
+            town_name: Town name used as the record key
+            stamp_urls: Stamp location URLs found on the town page
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO towns (route, url, status, error, updated_at) VALUES (?, ?, ?, NULL, ?) "
+                "ON CONFLICT (route, url) DO UPDATE SET "
+                "status = excluded.status, error = excluded.error, updated_at = excluded.updated_at",
+                (route, town_url, DONE, now)
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO stamps (route, town_url, town_name, url, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(route, town_url, town_name, url, PENDING, now) for url in stamp_urls]
+            )
+
+    def mark_town_failed(self, route: str, town_url: str, error: str) -> None:
+        """
+        Mark a town page as failed so a resumed crawl fetches it again.
+
+        Args:
+            route: Route key
+            town_url: Town page URL
+            error: Error description
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO towns (route, url, status, error, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (route, url) DO UPDATE SET "
+                "status = excluded.status, error = excluded.error, updated_at = excluded.updated_at",
+                (route, town_url, FAILED, error, time.time())
+            )
+
+    def get_stamp_record(self, route: str, town_name: str, stamp_url: str) -> Optional[Dict]:
+        """
+        Get the journaled record of a completed stamp location.
+
+        Args:
+            route: Route key
+            town_name: Town the stamp was listed under
+            stamp_url: Stamp location URL
+
+        Returns:
+            Scraped record, or None if the stamp is pending or failed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM stamps WHERE route = ? AND town_name = ? AND url = ? AND status = ?",
+                (route, town_name, stamp_url, DONE)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record_stamp(self, route: str, town_name: str, stamp_url: str,
+                     record: Optional[Dict], error: Optional[str] = None) -> None:
+        """
+        Journal the outcome of a stamp location.
+
+        A stamp that is not in the frontier yet (e.g. found after its town
+        was journaled) gets its own row, without a town page URL.
+
+        Args:
+            route: Route key
+            town_name: Town the stamp was listed under
+            stamp_url: Stamp location URL
+            record: Scraped record, or None if the stamp failed
+            error: Error description for failed stamps
+        """
+        status = DONE if record else FAILED
+        payload = json.dumps(record, ensure_ascii=False) if record else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO stamps (route, town_url, town_name, url, status, record, error, updated_at) "
+                "VALUES (?, '', ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (route, town_name, url) DO UPDATE SET "
+                "status = excluded.status, record = excluded.record, error = excluded.error, "
+                "updated_at = excluded.updated_at",
+                (route, town_name, stamp_url, status, payload, error, time.time())
+            )
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """
+        Count towns and stamps by status.
+
+        Returns:
+            {"towns": {status: count}, "stamps": {status: count}}
+        """
+        with self._lock:
+            towns = dict(self._conn.execute("SELECT status, COUNT(*) FROM towns GROUP BY status").fetchall())
+            stamps = dict(self._conn.execute("SELECT status, COUNT(*) FROM stamps GROUP BY status").fetchall())
+        return {'towns': towns, 'stamps': stamps}
+
+    def log_summary(self) -> None:
+        """Log the frontier status counts."""
+        summary = self.summary()
+        for kind, counts in summary.items():
+            logging.info(
+                f"Crawl state {kind}: {counts.get(DONE, 0)} done, "
+                f"{counts.get(FAILED, 0)} failed, {counts.get(PENDING, 0)} pending"
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -12,8 +12,9 @@ import numpy as np
 import folium
 import re
 import warnings
-import shutil
 import os
+from image_store import link_or_copy
+from stamp_identity import stamps_in
 warnings.filterwarnings('ignore')
 
 def load_reviewed_data(filepath):
@@ -35,7 +36,7 @@ def load_reviewed_data(filepath):
     return df
 
 def copy_stamp_images(df, stamp_images_folder):
-    """Copy stamp images to the stamp_images folder"""
+    """Hardlink stamp images into the stamp_images folder, copying only across file systems"""
     print("Copying stamp images...")
     
     # Filter for new stamps (those with English_category)
@@ -48,6 +49,7 @@ def copy_stamp_images(df, stamp_images_folder):
     # Create stamp_images folder if it doesn't exist
     os.makedirs(stamp_images_folder, exist_ok=True)
     
+    linked_count = 0
     copied_count = 0
     for idx, stamp in new_stamps.iterrows():
         stamp_path = stamp['Stamp_download_path']
@@ -65,14 +67,17 @@ def copy_stamp_images(df, stamp_images_folder):
         dest_path = os.path.join(stamp_images_folder, filename)
         
         try:
-            # Copy the image file
-            shutil.copy2(stamp_path, dest_path)
-            copied_count += 1
-            print(f"  ✓ Copied: {filename}")
+            # Link the image file; identical files are not duplicated on disk
+            result = link_or_copy(stamp_path, dest_path)
+            if result == 'copied':
+                copied_count += 1
+            else:
+                linked_count += 1
+            print(f"  ✓ {result.capitalize()}: {filename}")
         except Exception as e:
             print(f"  ❌ Error copying {filename}: {e}")
     
-    print(f"✓ Copied {copied_count} stamp images to {stamp_images_folder}")
+    print(f"✓ Linked {linked_count} and copied {copied_count} stamp images to {stamp_images_folder}")
 
 def parse_google_coordinates(coord_string):
     """Parse Google coordinates string into lat, lon"""
@@ -259,26 +264,15 @@ def create_verification_map(updated_df, trail_geojson_path, corrected_coords_df)
         popup='Camino Frances Trail'
     ).add_to(m)
     
+    # Look up corrected and new stamps by stamp identity, once for all stamps
+    corrected = stamps_in(updated_df, corrected_coords_df)
+    new = stamps_in(updated_df, corrected_coords_df[corrected_coords_df['english_category'].notna()])
+    
     # Add stamps
-    for _, stamp in updated_df.iterrows():
+    for (_, stamp), was_corrected, is_new in zip(updated_df.iterrows(), corrected, new):
         if pd.isna(stamp['latitude']) or pd.isna(stamp['longitude']):
             continue
         
-        # Check if this stamp was corrected
-        was_corrected = any(
-            (corrected_coords_df['place'] == stamp['place']) & 
-            (corrected_coords_df['town'] == stamp['town'])
-            for _, corrected_coords_df in corrected_coords_df.iterrows()
-        )
-        
-        # Check if this is a new stamp
-        is_new = any(
-            (corrected_coords_df['place'] == stamp['place']) & 
-            (corrected_coords_df['town'] == stamp['town']) &
-            (pd.notna(corrected_coords_df['english_category']) if hasattr(corrected_coords_df, 'english_category') else False)
-            for _, corrected_coords_df in corrected_coords_df.iterrows()
-        )
-        
         # Color code: green for original, orange for corrected, red for new
         if is_new:
             color = 'red'
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Image download pool for the Pilgrim Stamp Scraper.
+A fixed set of worker threads takes image downloads from a bounded queue,
+so the scrape stage keeps fetching pages while images are written to disk.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+# Suffix of in-progress downloads; the final image only appears via an atomic rename
+PARTIAL_SUFFIX = '.part'
+
+class ImageDownloadPool:
+    """
+    Bounded pool of download worker threads fed by a queue.
+
+    submit() blocks while the queue is full, which keeps the scrape stage at
+    most queue_size downloads ahead of the workers instead of buffering an
+    unbounded backlog in memory.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 0):
+        """
+        Start the worker threads.
+
+        Args:
+            workers: Number of concurrent downloads
+            queue_size: Maximum queued downloads; 0 means four per worker
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size or workers * 4)
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'blocked_seconds': 0.0}
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'image-download-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a download job.
+
+        Args:
+            func: Callable performing the download, run on a worker thread
+            *args, **kwargs: Arguments passed to func
+
+        Returns:
+            Future resolving to func's return value
+        """
+        future = Future()
+        start = time.monotonic()
+        self._queue.put((future, func, args, kwargs))
+        with self._lock:
+            self.stats['submitted'] += 1
+            self.stats['blocked_seconds'] += time.monotonic() - start
+        return future
+
+    @staticmethod
+    def completed(value) -> Future:
+        """Wrap a value that needs no download in an already resolved Future."""
+        future = Future()
+        future.set_result(value)
+        return future
+
+    def _worker(self) -> None:
+        """Run queued jobs until a stop sentinel arrives."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+
+            future, func, args, kwargs = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    future.set_exception(e)
+                    result = None
+                else:
+                    future.set_result(result)
+                with self._lock:
+                    self.stats['succeeded' if result else 'failed'] += 1
+            self._queue.task_done()
+
+    def close(self) -> None:
+        """Wait for queued downloads to finish and stop the workers."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def log_stats(self) -> None:
+        """Log download outcomes and how long the scrape stage waited on a full queue."""
+        logging.info(
+            f"Image downloads ({self.workers} workers): {self.stats['succeeded']} succeeded, "
+            f"{self.stats['failed']} failed, scrape stage blocked {self.stats['blocked_seconds']:.1f}s on a full queue"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def remove_partial_downloads(directory: str) -> int:
+    """
+    Delete in-progress download files left behind by a killed run.
+
+    Args:
+        directory: Image directory to clean
+
+    Returns:
+        Number of files removed
+    """
+    if not os.path.isdir(directory):
+        return 0
+
+    removed = 0
+    for filename in os.listdir(directory):
+        if filename.endswith(PARTIAL_SUFFIX):
+            os.remove(os.path.join(directory, filename))
+            removed += 1
+    if removed:
+        logging.info(f"Removed {removed} partial downloads from {directory}")
+    return removed
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Persistent geocoding cache for the Pilgrim Stamp geocoder.
+Stores full geocoder responses in SQLite keyed by a normalized query, so a
+re-run on an unchanged dataset is answered without touching the API.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a geocoding query for use as a cache key.
+
+    Case, accents and whitespace differences do not change the key, so
+    "Albergue  San Martín, Cizur Menor" and "albergue san martin,cizur menor"
+    share one entry.
+
+    Args:
+        query: Query string as sent to the geocoder
+
+    Returns:
+        Normalized key
+    """
+    decomposed = unicodedata.normalize('NFKD', query)
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    key = without_accents.casefold()
+    key = re.sub(r'\s*,\s*', ', ', key)
+    return re.sub(r'\s+', ' ', key).strip()
+
+class GeocodeCache:
+    """
+    SQLite-backed cache of geocoder responses.
+
+    Found results expire after ttl_days. Queries with no result are cached
+    too ("negative" entries) with their own, shorter negative_ttl_days, so
+    misses are not re-queried on every run but are retried eventually.
+    Errors are never cached.
+    """
+
+    def __init__(self, path: str = 'data/geocode_cache.sqlite', ttl_days: Optional[float] = 180,
+                 negative_ttl_days: Optional[float] = 14):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+            ttl_days: Lifetime of found results in days, or None to keep them forever
+            negative_ttl_days: Lifetime of "no result" entries in days, or None to keep them forever
+        """
+        self.path = path
+        self.ttl_days = ttl_days
+        self.negative_ttl_days = negative_ttl_days
+        self.stats = {'hits': 0, 'negative_hits': 0, 'expired': 0, 'misses': 0, 'stored': 0}
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # One connection shared by all worker threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    query_key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    found INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+        logging.info(f"Geocode cache at {path} (TTL {ttl_days} days, negative TTL {negative_ttl_days} days)")
+
+    def _count(self, key: str) -> None:
+        """Increment a statistics counter."""
+        with self._lock:
+            self.stats[key] += 1
+
+    def _is_fresh(self, found: bool, fetched_at: float) -> bool:
+        """Check an entry against the TTL that applies to it."""
+        ttl_days = self.ttl_days if found else self.negative_ttl_days
+        return ttl_days is None or time.time() - fetched_at < ttl_days * SECONDS_PER_DAY
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached response for a query.
+
+        Args:
+            query: Query string as sent to the geocoder
+
+        Returns:
+            Dictionary with response (list of geocoder results, empty for a
+            cached miss) and fetched_at, or None if absent or expired
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, found, fetched_at FROM geocodes WHERE query_key = ?",
+                (normalize_query(query),)
+            ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+
+        response, found, fetched_at = row
+        if not self._is_fresh(bool(found), fetched_at):
+            self._count('expired')
+            return None
+
+        self._count('hits' if found else 'negative_hits')
+        return {'response': json.loads(response), 'fetched_at': fetched_at}
+
+    def store(self, query: str, response: List[Dict[str, Any]]) -> None:
+        """
+        Cache a geocoder response; an empty response is cached as a negative entry.
+
+        Args:
+            query: Query string as sent to the geocoder
+            response: Full list of results returned by the geocoder
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+                (normalize_query(query), query, json.dumps(response, ensure_ascii=False),
+                 int(bool(response)), time.time())
+            )
+        self._count('stored')
+
+    def log_stats(self) -> None:
+        """Log how many queries the cache answered."""
+        logging.info(
+            f"Geocode cache: {self.stats['hits']} hits, {self.stats['negative_hits']} cached misses, "
+            f"{self.stats['misses'] + self.stats['expired']} looked up "
+            f"({self.stats['expired']} expired), {self.stats['stored']} stored"
+        )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
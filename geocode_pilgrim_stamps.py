@@ -1,106 +1,410 @@
 #!/usr/bin/env python3
 """
 Geocoding script for pilgrim stamps data.
-Converts town and place names to coordinates using Google Maps Geocoding API.
+Converts town and place names to coordinates using Google Maps Geocoding API,
+with an optional offline gazetteer fallback at town level.
 """
 
 import pandas as pd
+import numpy as np
 import time
 import requests
-from typing import Tuple, Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import folium
 from folium import Popup, Marker
+from folium.plugins import MarkerCluster
+from folium.utilities import JsCode
+from branca.element import MacroElement, Template
 import logging
 from pathlib import Path
 import json
-import googlemaps
 import os
+import shutil
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from utils import RATE_LIMITER
+from geocode_cache import GeocodeCache, normalize_query
+from geocoder_backends import GazetteerBackend, GoogleBackend
+from incremental import KEY_COLUMNS, load_changeset
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Columns geocode_dataset adds to the dataset
+GEOCODE_COLUMNS = [
+    'latitude', 'longitude', 'geocoding_status', 'geocoding_source', 'confidence',
+    'google_latitude', 'google_longitude', 'google_query', 'google_success',
+]
+# Columns identifying a geocoding lookup
+QUERY_KEY_COLUMNS = ['place_key', 'town_key']
+# Categories of the categorical result columns
+GEOCODING_STATUSES = ['pending', 'success', 'failed']
+GEOCODING_SOURCES = ['none', 'google', 'gazetteer']
+CONFIDENCE_LEVELS = ['low', 'medium', 'high']
+# Map rendering modes: one clustered GeoJSON layer, the same with stamp details
+# in external files loaded on demand, or one Marker object per stamp
+MAP_MODES = ['cluster', 'lazy', 'markers']
+# Stamps per details file of the lazy map; neighbouring rows share a town
+DETAILS_SHARD_SIZE = 50
+
+# Tooltip and popup HTML of a stamp from its properties, shared by the layers
+STAMP_HTML_JS = """
+    function esc(value) {
+        return String(value).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    }
+    function tooltipHtml(p) {
+        var tooltip = p.place + ' - ' + p.town + ' (' + p.confidence + ' confidence, ' + p.source + ')';
+        if (tooltip.length > 50) {
+            tooltip = tooltip.slice(0, 47) + '...';
+        }
+        return '<div>' + esc(tooltip) + '</div>';
+    }
+    function popupHtml(p, lat, lon) {
+        var image = p.image ? '<div style="text-align: center; margin: 10px 0;">'
+            + '<img src="' + esc(p.image) + '" alt="Pilgrim Stamp" loading="lazy" style="max-width: 280px; max-height: 200px; border: 2px solid #ddd; border-radius: 5px;">'
+            + '</div><hr style="margin: 8px 0;">' : '';
+        return '<div style="width: 320px; font-family: Arial, sans-serif;">'
+            + '<h3 style="color: #2E8B57; margin-bottom: 10px; font-size: 16px;">' + esc(p.place) + '</h3>'
+            + '<hr style="margin: 8px 0;">'
+            + '<p style="margin: 5px 0;"><strong>🏘️ Town:</strong> ' + esc(p.town) + '</p>'
+            + '<p style="margin: 5px 0;"><strong>🚶‍♂️ Route:</strong> ' + esc(p.route) + '</p>'
+            + '<p style="margin: 5px 0;"><strong>📍 Final Coordinates:</strong> ' + lat.toFixed(6) + ', ' + lon.toFixed(6) + '</p>'
+            + '<p style="margin: 5px 0;"><strong>🎯 Source:</strong> ' + esc(p.source) + ' (' + esc(p.confidence) + ' confidence)</p>'
+            + '<hr style="margin: 8px 0;">'
+            + '<p style="margin: 5px 0; font-size: 11px;"><strong>Google Maps:</strong> '
+            + (p.google ? p.google[0].toFixed(6) + ', ' + p.google[1].toFixed(6) : 'Failed') + '</p>'
+            + '<hr style="margin: 8px 0;">'
+            + image
+            + '<p style="margin: 5px 0; font-size: 12px;"><strong>Categories (EN):</strong><br>' + esc(p.categories_en || 'N/A') + '</p>'
+            + '<p style="margin: 5px 0; font-size: 12px;"><strong>Categorías (ES):</strong><br>' + esc(p.categories_es || 'N/A') + '</p>'
+            + '</div>';
+    }
+"""
+
+# Builds the icon, tooltip and popup of a stamp from its GeoJSON feature in the
+# browser; the popup HTML is only generated when it is opened
+STAMP_FEATURE_JS = """
+function (feature, layer) {
+    var p = feature.properties;
+    var lat = feature.geometry.coordinates[1], lon = feature.geometry.coordinates[0];
+""" + STAMP_HTML_JS + """
+    layer.setIcon(L.AwesomeMarkers.icon({
+        icon: 'info-sign', prefix: 'glyphicon', markerColor: p.color, iconColor: 'white'
+    }));
+    layer.bindTooltip(tooltipHtml(p), {sticky: true});
+    layer.bindPopup(function () {
+        return popupHtml(p, lat, lon);
+    }, {maxWidth: 300});
+}
+"""
+
+# Same for a feature holding only its id and color: the stamp's details file
+# (DETAILS_URL/<id // SHARD_SIZE>.json) is fetched on first hover or popup,
+# once per file, and the stamp image only loads with the popup
+LAZY_STAMP_FEATURE_JS = """
+function (feature, layer) {
+    var id = feature.properties.id;
+    var lat = feature.geometry.coordinates[1], lon = feature.geometry.coordinates[0];
+""" + STAMP_HTML_JS + """
+    function details() {
+        var shard = Math.floor(id / SHARD_SIZE);
+        var shards = window.stampDetailShards = window.stampDetailShards || {};
+        if (!shards[shard]) {
+            shards[shard] = fetch(DETAILS_URL + '/' + shard + '.json').then(function (response) {
+                if (!response.ok) {
+                    delete shards[shard];
+                    throw new Error('Could not load stamp details: ' + response.status);
+                }
+                return response.json();
+            });
+        }
+        return shards[shard].then(function (stamps) {
+            return stamps[id];
+        });
+    }
+    layer.setIcon(L.AwesomeMarkers.icon({
+        icon: 'info-sign', prefix: 'glyphicon', markerColor: feature.properties.color, iconColor: 'white'
+    }));
+    layer.bindTooltip('<div>…</div>', {sticky: true});
+    layer.on('mouseover', function () {
+        details().then(function (p) {
+            layer.setTooltipContent(tooltipHtml(p));
+        });
+    });
+    layer.bindPopup('<div>Loading…</div>', {maxWidth: 300});
+    layer.on('popupopen', function (e) {
+        details().then(function (p) {
+            e.popup.setContent(popupHtml(p, lat, lon));
+        }, function (error) {
+            e.popup.setContent('<div>' + esc(error.message) + '</div>');
+        });
+    });
+}
+"""
+
+def stamp_marker_color(place: str, categories_en: str, categories_es: str) -> str:
+    """
+    Marker color of a stamp, from keywords in its place name and categories.
+    
+    Args:
+        place: Place name
+        categories_en: English categories, empty if missing
+        categories_es: Spanish categories, empty if missing
+        
+    Returns:
+        Folium marker color
+    """
+    place_lower = place.lower()
+    categories_en_lower = categories_en.lower()
+    categories_es_lower = categories_es.lower()
+    
+    if ('albergue' in place_lower or 'hostel' in place_lower or 
+        'hostel' in categories_en_lower or 'albergue' in categories_es_lower):
+        return 'green'  # Hostels/Albergues
+    if ('hotel' in place_lower or 'hotel' in categories_en_lower or 
+          'hotel' in categories_es_lower):
+        return 'purple'  # Hotels
+    if ('bar' in place_lower or 'restaurant' in place_lower or 'café' in place_lower or
+          'bar' in categories_en_lower or 'restaurant' in categories_en_lower or
+          'bar' in categories_es_lower or 'restaurante' in categories_es_lower):
+        return 'orange'  # Food & Drink
+    if ('iglesia' in place_lower or 'catedral' in place_lower or 'church' in place_lower or
+          'church' in categories_en_lower or 'iglesia' in categories_es_lower or 
+          'catedral' in categories_es_lower):
+        return 'red'  # Religious sites
+    return 'blue'  # default
+
+def map_bounded(executor: ThreadPoolExecutor, fn, window: int, *iterables):
+    """
+    Like executor.map, with at most `window` calls submitted ahead of the consumer.
+    
+    executor.map submits every call up front, so a consumer that stops early
+    still pays for the whole run. Here calls are submitted as results are
+    taken, and those not yet started are cancelled when the consumer stops.
+    
+    Args:
+        executor: Executor to run the calls on
+        fn: Function to call
+        window: Maximum calls submitted but not yet consumed
+        *iterables: Argument iterables, as for map
+        
+    Yields:
+        Results of fn, in argument order
+    """
+    futures = deque()
+    try:
+        for args in zip(*iterables):
+            if len(futures) >= window:
+                yield futures.popleft().result()
+            futures.append(executor.submit(fn, *args))
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _normalize_series(series: pd.Series) -> pd.Series:
+    """Apply normalize_query once per distinct value of a column."""
+    uniques = series.unique()
+    return series.map(dict(zip(uniques, (normalize_query(value) for value in uniques))))
+
+def plan_geocoding_queries(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the lookup key of every row.
+    
+    Rows whose place and town only differ in case, accents or whitespace
+    (a stamp listed under several routes, re-scraped duplicates) get the
+    same key and are geocoded once.
+    
+    Args:
+        df: Dataset with place and town columns
+        
+    Returns:
+        DataFrame aligned with df with place, town (stripped) and the
+        normalized place_key and town_key
+    """
+    queries = pd.DataFrame({
+        'place': df['place'].astype(str).str.strip(),
+        'town': df['town'].astype(str).str.strip(),
+    })
+    queries['place_key'] = _normalize_series(queries['place'])
+    queries['town_key'] = _normalize_series(queries['town'])
+    return queries
+
+def _float_column(values: pd.Series) -> np.ndarray:
+    """Parse a coordinate column exactly (empty text is NaN); CSV coordinates must round-trip unchanged."""
+    return values.where(values.ne(''), np.nan).astype('float64').to_numpy()
+
+def with_result_dtypes(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Give the geocoding result columns of a frame their proper dtypes.
+    
+    Args:
+        frame: DataFrame holding GEOCODE_COLUMNS, e.g. read back from CSV
+        
+    Returns:
+        Frame with float64 coordinates, bool google_success, str google_query
+        and categorical status, source and confidence
+    """
+    return frame.assign(
+        latitude=_float_column(frame['latitude']),
+        longitude=_float_column(frame['longitude']),
+        geocoding_status=pd.Categorical(frame['geocoding_status'], categories=GEOCODING_STATUSES),
+        geocoding_source=pd.Categorical(frame['geocoding_source'], categories=GEOCODING_SOURCES),
+        confidence=pd.Categorical(frame['confidence'], categories=CONFIDENCE_LEVELS),
+        google_latitude=_float_column(frame['google_latitude']),
+        google_longitude=_float_column(frame['google_longitude']),
+        google_query=frame['google_query'].fillna('').astype(str),
+        google_success=frame['google_success'].astype(str).eq('True'),
+    )
+
+def load_geocode_checkpoint(checkpoint_path: str) -> Optional[pd.DataFrame]:
+    """
+    Load the lookups completed by an earlier, interrupted run.
+    
+    Args:
+        checkpoint_path: Checkpoint CSV written by geocode_dataset
+        
+    Returns:
+        DataFrame with QUERY_KEY_COLUMNS and GEOCODE_COLUMNS (latest entry
+        per key), or None if there is no checkpoint
+    """
+    if not Path(checkpoint_path).exists():
+        return None
+    
+    # Keys such as "nan" must stay strings, so read everything as text first
+    checkpoint = pd.read_csv(checkpoint_path, dtype=str, keep_default_na=False)
+    checkpoint = checkpoint.drop_duplicates(QUERY_KEY_COLUMNS, keep='last').reset_index(drop=True)
+    return with_result_dtypes(checkpoint)
+
+def append_geocode_checkpoint(checkpoint_path: str, frame: pd.DataFrame) -> None:
+    """
+    Append completed lookups to the checkpoint CSV.
+    
+    Args:
+        checkpoint_path: Checkpoint CSV path
+        frame: Completed lookups with QUERY_KEY_COLUMNS and GEOCODE_COLUMNS
+    """
+    if frame.empty:
+        return
+    write_header = not Path(checkpoint_path).exists()
+    frame[QUERY_KEY_COLUMNS + GEOCODE_COLUMNS].to_csv(checkpoint_path, mode='a', header=write_header, index=False)
+
+def load_unchanged_geocodes(previous_csv: str, changeset: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """
+    Take the lookups of stamps an incremental crawl left unchanged from the previous output.
+    
+    Added and modified stamps are left out so they are geocoded afresh,
+    and removed (tombstoned) stamps are dropped.
+    
+    Args:
+        previous_csv: Geocoded CSV of the previous run
+        changeset: Changeset written by main.py --incremental
+        
+    Returns:
+        DataFrame with QUERY_KEY_COLUMNS and GEOCODE_COLUMNS, or None if the
+        previous output is missing or predates the stamp_url column
+    """
+    if not Path(previous_csv).exists():
+        logger.warning(f"⚠️  No previous geocoded output at {previous_csv} - geocoding every row")
+        return None
+    
+    previous = pd.read_csv(previous_csv, dtype=str, keep_default_na=False)
+    missing_columns = [col for col in KEY_COLUMNS + GEOCODE_COLUMNS if col not in previous.columns]
+    if missing_columns:
+        logger.warning(f"⚠️  {previous_csv} lacks {missing_columns} - geocoding every row")
+        return None
+    
+    changed_records = changeset['added'] + [entry['after'] for entry in changeset['modified']] + changeset['removed']
+    changed_keys = {tuple(str(record[col]) for col in KEY_COLUMNS) for record in changed_records}
+    is_changed = pd.MultiIndex.from_frame(previous[KEY_COLUMNS]).isin(changed_keys)
+    unchanged = previous[~is_changed].reset_index(drop=True)
+    
+    lookups = pd.concat(
+        [plan_geocoding_queries(unchanged)[QUERY_KEY_COLUMNS], with_result_dtypes(unchanged[GEOCODE_COLUMNS])],
+        axis=1
+    )
+    logger.info(
+        f"♻️  Changeset: {len(changeset['added'])} added, {len(changeset['modified'])} modified, "
+        f"{len(changeset['removed'])} removed - reusing {len(unchanged)} geocoded rows from {previous_csv}"
+    )
+    return lookups.drop_duplicates(QUERY_KEY_COLUMNS).reset_index(drop=True)
+
+class LazyGeoJsonLoader(MacroElement):
+    """
+    Fetches a GeoJSON file asynchronously when the page opens, adds its
+    features to a GeoJSON layer and hands the new markers to the layer's
+    marker cluster.
+    """
+    
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        fetch({{ this.url|tojson }}).then(function (response) {
+            if (!response.ok) {
+                throw new Error('Could not load stamps: ' + response.status);
+            }
+            return response.json();
+        }).then(function (data) {
+            {{ this.layer.get_name() }}.addData(data);
+            // The cluster only picks up markers added to the layer after it when they are re-added
+            {{ this.cluster.get_name() }}.addLayer({{ this.layer.get_name() }});
+        }).catch(function (error) {
+            console.error(error);
+        });
+        {% endmacro %}
+    """)
+    
+    def __init__(self, url: str, layer: folium.GeoJson, cluster: MarkerCluster):
+        super().__init__()
+        self._name = 'LazyGeoJsonLoader'
+        self.url = url
+        self.layer = layer
+        self.cluster = cluster
+
 class PilgrimStampGeocoder:
-    """Geocoder for pilgrim stamp locations using Google Maps API."""
+    """Geocoder for pilgrim stamp locations using Google Maps API and optional fallback backends."""
     
-    def __init__(self):
+    def __init__(self, geocode_cache: Optional[GeocodeCache] = None, backends: Optional[List] = None):
+        """
+        Initialize the geocoder.
+        
+        Args:
+            geocode_cache: Optional persistent cache of Google responses
+            backends: Geocoder backends tried in order until one finds the
+                location; defaults to Google Maps only, which requires
+                GOOGLE_MAPS_API_KEY
+        """
+        self.geocode_cache = geocode_cache
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'PilgrimStampGeocoder/1.0 (https://github.com/yourusername)'
         })
-        self.rate_limit_delay = 0.1  # Reduced delay since Google is much faster
+        # Google requests are paced by the shared per-host token bucket
+        self.rate_limiter = RATE_LIMITER
+        self.rate_limit_host = 'maps.googleapis.com'
         
-        # Initialize Google Maps client (required)
-        self.google_client = None
-        google_api_key = os.getenv('GOOGLE_MAPS_API_KEY')
-        if google_api_key:
-            try:
-                self.google_client = googlemaps.Client(key=google_api_key)
-                logger.info("✅ Google Maps API client initialized successfully")
-            except Exception as e:
-                logger.error(f"❌ Failed to initialize Google Maps API: {e}")
-                raise Exception("Google Maps API initialization failed - check your API key")
-        else:
-            logger.error("❌ GOOGLE_MAPS_API_KEY environment variable not set")
-            raise Exception("GOOGLE_MAPS_API_KEY environment variable is required")
+        if backends is None:
+            backends = [GoogleBackend.from_environment(geocode_cache)]
+        if not backends:
+            raise ValueError("At least one geocoder backend is required")
+        self.backends = backends
         
-        logger.info("PilgrimStampGeocoder initialized successfully")
-        logger.info(f"Rate limiting set to {self.rate_limit_delay} seconds between requests")
-        logger.info("🌍 Single geocoding: Google Maps API only")
-    
-    def geocode_google(self, query: str) -> Optional[Tuple[float, float]]:
-        """
-        Geocode using Google Maps Geocoding API.
+        google = next((backend for backend in backends if backend.name == 'google'), None)
+        self.google_client = google.client if google else None
         
-        Args:
-            query: Search query string
-            
-        Returns:
-            Tuple of (latitude, longitude) or None if not found
-        """
-        if not self.google_client:
-            logger.error("Google Maps API client not available")
-            return None
-            
-        try:
-            logger.debug(f"Querying Google Maps with: {query}")
-            
-            # Google Maps geocoding with region bias for Spain
-            result = self.google_client.geocode(
-                query,
-                region='es',  # Bias towards Spain
-                language='en'
-            )
-            
-            if result and len(result) > 0:
-                location = result[0]['geometry']['location']
-                lat = location['lat']
-                lng = location['lng']
-                
-                # Check if the result is in Spain (basic validation)
-                if 'address_components' in result[0]:
-                    country_found = False
-                    for component in result[0]['address_components']:
-                        if 'country' in component['types'] and component['short_name'] == 'ES':
-                            country_found = True
-                            break
-                    
-                    if not country_found:
-                        logger.warning(f"Google result for '{query}' may not be in Spain")
-                
-                logger.info(f"Found Google coordinates for '{query}': ({lat}, {lng})")
-                return (lat, lng)
-            else:
-                logger.debug(f"No Google results found for '{query}'")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Google geocoding error for '{query}': {e}")
-            return None
+        logger.info("PilgrimStampGeocoder initialized successfully")
+        if google:
+            bucket = self.rate_limiter.bucket(self.rate_limit_host)
+            logger.info(f"Rate limiting set to {bucket.rate} requests/second (burst {bucket.burst})")
+        logger.info(f"🌍 Geocoder backends: {' -> '.join(backend.name for backend in backends)}")
     
     def geocode_location(self, place: str, town: str) -> Dict[str, Any]:
         """
-        Geocode a location using Google Maps API only.
+        Geocode a location with the first backend that finds it.
         
         Args:
             place: Specific place name
@@ -109,7 +413,7 @@ class PilgrimStampGeocoder:
         Returns:
             Dictionary with Google Maps results and final coordinates
         """
-        logger.info(f"Starting Google Maps geocoding for place='{place}', town='{town}'")
+        logger.info(f"Starting geocoding for place='{place}', town='{town}'")
         
         # Initialize result structure
         result = {
@@ -120,35 +424,53 @@ class PilgrimStampGeocoder:
             'confidence': 'low'
         }
         
-        # Only Strategy 1: Place + Town + Spain (building-level precision required)
-        if not place or not place.strip():
-            logger.warning(f"❌ Empty place name - cannot geocode with required precision for town '{town}'")
-            return result
+        for backend in self.backends:
+            query = backend.query(place, town)
+            if not query:
+                logger.warning(f"❌ {backend.name}: cannot query place='{place}', town='{town}'")
+                continue
             
-        query = f"{place}, {town}, Spain"
-        result['google_query'] = query
-        
-        # Try Google Maps
-        logger.info(f"🗺️  Google Maps: Trying '{query}'")
-        google_coords = self.geocode_google(query)
-        result['google_coords'] = google_coords
-        
-        if google_coords:
-            logger.info(f"✅ Google Maps successful: {google_coords}")
-            result['final_coords'] = google_coords
-            result['geocoding_source'] = 'google'
-            result['confidence'] = 'high'
-        else:
-            logger.warning(f"❌ Google Maps failed")
+            logger.info(f"🗺️  {backend.name}: Trying '{query}'")
+            match = backend.geocode(query)
+            if backend.name == 'google':
+                result['google_query'] = query
+                result['google_coords'] = (match.latitude, match.longitude) if match else None
+            
+            if match:
+                logger.info(f"✅ {backend.name} successful: ({match.latitude}, {match.longitude})")
+                result['final_coords'] = (match.latitude, match.longitude)
+                result['geocoding_source'] = backend.name
+                result['confidence'] = match.confidence
+                break
+            logger.warning(f"❌ {backend.name} failed")
         
         return result
     
-    def geocode_dataset(self, csv_path: str) -> pd.DataFrame:
+    def geocode_dataset(self, csv_path: str, workers: int = 1, checkpoint_path: Optional[str] = None,
+                        resume: bool = False, checkpoint_every: int = 100,
+                        reuse: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Geocode the entire pilgrim stamps dataset.
         
+        With workers > 1 the lookups run on a thread pool: at most `workers`
+        requests are in flight, the shared rate limiter caps queries per
+        second, and results are assembled in row order.
+        
+        With a checkpoint path, completed lookups are appended to the
+        checkpoint every `checkpoint_every` results and when the run stops
+        early. A resumed run skips lookups the checkpoint holds as
+        successful, matching rows on their normalized (place, town) key;
+        failed lookups are tried again (cheaply, if the geocode cache
+        already holds a "no result" for them). Lookups passed as reuse, e.g.
+        from load_unchanged_geocodes, are skipped the same way.
+        
         Args:
             csv_path: Path to the input CSV file
+            workers: Number of concurrent geocoding requests
+            checkpoint_path: Optional checkpoint CSV of completed lookups
+            resume: Reuse the lookups in an existing checkpoint instead of starting over
+            checkpoint_every: Lookups between checkpoint flushes
+            reuse: Completed lookups to keep, with QUERY_KEY_COLUMNS and GEOCODE_COLUMNS
             
         Returns:
             DataFrame with added latitude and longitude columns
@@ -156,72 +478,168 @@ class PilgrimStampGeocoder:
         logger.info(f"Loading dataset from {csv_path}")
         df = pd.read_csv(csv_path)
         
-        # Add coordinate columns for Google Maps geocoding
-        df['latitude'] = None
-        df['longitude'] = None
-        df['geocoding_status'] = 'pending'
-        df['geocoding_source'] = 'none'
-        df['confidence'] = 'low'
+        # Plan one lookup per unique normalized (place, town)
+        queries = plan_geocoding_queries(df)
+        plan = queries.drop_duplicates(QUERY_KEY_COLUMNS).reset_index(drop=True)
+        dedup_ratio = 1 - len(plan) / len(df) if len(df) else 0.0
+        logger.info(
+            f"🧮 Query plan: {len(df)} rows -> {len(plan)} unique (place, town) lookups "
+            f"({dedup_ratio:.1%} deduplicated)"
+        )
+        
+        # Lookups already completed by an interrupted run
+        completed = None
+        if checkpoint_path:
+            if resume:
+                completed = load_geocode_checkpoint(checkpoint_path)
+            elif Path(checkpoint_path).exists():
+                os.remove(checkpoint_path)
+        if reuse is not None:
+            completed = reuse if completed is None else pd.concat([completed, reuse], ignore_index=True)
+        if completed is not None:
+            completed = completed[completed['geocoding_status'] == 'success']
+            completed = completed.drop_duplicates(QUERY_KEY_COLUMNS)
+            completed = plan[QUERY_KEY_COLUMNS].merge(completed, on=QUERY_KEY_COLUMNS, how='inner')
+            is_done = plan.set_index(QUERY_KEY_COLUMNS).index.isin(completed.set_index(QUERY_KEY_COLUMNS).index)
+            pending = plan[~is_done].reset_index(drop=True)
+            logger.info(f"⏩ Skipping {len(completed)} of {len(plan)} lookups already geocoded")
+        else:
+            pending = plan
         
-        # Google Maps results
-        df['google_latitude'] = None
-        df['google_longitude'] = None
-        df['google_query'] = ''
-        df['google_success'] = False
+        total_lookups = len(pending)
         
-        total_rows = len(df)
-        successful_geocodes = 0
+        logger.info(f"Starting geocoding of {total_lookups} locations ({workers} concurrent requests)...")
+        backend_names = [backend.name for backend in self.backends]
+        if 'gazetteer' in backend_names:
+            logger.info(f"Note: Backends tried in order: {', '.join(backend_names)} - gazetteer matches are town-level coordinates")
+        else:
+            logger.info("Note: Only building-level precision accepted - town-level coordinates will be rejected")
         
-        logger.info(f"Starting geocoding of {total_rows} locations...")
-        logger.info("Note: Only building-level precision accepted - town-level coordinates will be rejected")
+        places = pending['place'].tolist()
+        towns = pending['town'].tolist()
         
-        for index, row in df.iterrows():
-            place = str(row['place']).strip()
-            town = str(row['town']).strip()
-            
-            logger.info(f"\n--- Processing {index + 1}/{total_rows}: {place} in {town} ---")
-            
-            geocoding_result = self.geocode_location(place, town)
-            
-            # Store Google Maps results
-            if geocoding_result['google_coords']:
-                df.at[index, 'google_latitude'] = geocoding_result['google_coords'][0]
-                df.at[index, 'google_longitude'] = geocoding_result['google_coords'][1]
-                df.at[index, 'google_success'] = True
-                df.at[index, 'google_query'] = geocoding_result['google_query']
+        if workers > 1:
+            # Results come in plan order however the requests complete; a
+            # window of two lookups per worker keeps every worker busy, and
+            # an interrupted run stops after the lookups already in flight
+            executor = ThreadPoolExecutor(max_workers=workers)
+            results = map_bounded(executor, self.geocode_location, workers * 2, places, towns)
+            try:
+                pending = self._assemble_results(pending, results, checkpoint_path, checkpoint_every)
+            finally:
+                results.close()
+                executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            results = map(self.geocode_location, places, towns)
+            pending = self._assemble_results(pending, results, checkpoint_path, checkpoint_every)
+        
+        if completed is not None:
+            plan = pd.concat([completed, pending[QUERY_KEY_COLUMNS + GEOCODE_COLUMNS]], ignore_index=True)
+        else:
+            plan = pending
+        
+        # Fan the lookup results back out to every row sharing the key
+        geocoded = queries[QUERY_KEY_COLUMNS].merge(
+            plan[QUERY_KEY_COLUMNS + GEOCODE_COLUMNS], on=QUERY_KEY_COLUMNS, how='left', sort=False
+        )
+        df = pd.concat(
+            [df.drop(columns=GEOCODE_COLUMNS, errors='ignore').reset_index(drop=True), geocoded[GEOCODE_COLUMNS]],
+            axis=1
+        )
+        
+        return self._log_dataset_summary(df)
+    
+    def _assemble_results(self, plan: pd.DataFrame, results, checkpoint_path: Optional[str] = None,
+                          checkpoint_every: int = 100) -> pd.DataFrame:
+        """
+        Collect geocoding results into typed columns, in plan order.
+        
+        Results are written into preallocated arrays and attached to the
+        plan in one step; progress uses running counters, so the cost per
+        result is constant however large the dataset.
+        
+        Args:
+            plan: Query plan with place and town columns
+            results: Iterable of geocode_location results, one per plan row
+            checkpoint_path: Optional checkpoint CSV completed lookups are appended to
+            checkpoint_every: Lookups between checkpoint flushes
             
-            # Store final results
-            if geocoding_result['final_coords']:
-                df.at[index, 'latitude'] = geocoding_result['final_coords'][0]
-                df.at[index, 'longitude'] = geocoding_result['final_coords'][1]
-                df.at[index, 'geocoding_status'] = 'success'
-                df.at[index, 'geocoding_source'] = 'google'
-                df.at[index, 'confidence'] = geocoding_result['confidence']
-                
-                # Mark Google as successful
-                df.at[index, 'google_success'] = True
+        Returns:
+            Plan with the GEOCODE_COLUMNS added
+        """
+        total = len(plan)
+        latitude = np.full(total, np.nan)
+        longitude = np.full(total, np.nan)
+        google_latitude = np.full(total, np.nan)
+        google_longitude = np.full(total, np.nan)
+        google_success = np.zeros(total, dtype=bool)
+        google_query = np.full(total, '', dtype=object)
+        status = np.full(total, 'failed', dtype=object)
+        source = np.full(total, 'none', dtype=object)
+        confidence = np.full(total, 'low', dtype=object)
+        
+        def result_frame(start: int, stop: int) -> pd.DataFrame:
+            """Typed result columns of plan rows start..stop."""
+            return plan.iloc[start:stop].assign(
+                latitude=latitude[start:stop],
+                longitude=longitude[start:stop],
+                geocoding_status=pd.Categorical(status[start:stop], categories=GEOCODING_STATUSES),
+                geocoding_source=pd.Categorical(source[start:stop], categories=GEOCODING_SOURCES),
+                confidence=pd.Categorical(confidence[start:stop], categories=CONFIDENCE_LEVELS),
+                google_latitude=google_latitude[start:stop],
+                google_longitude=google_longitude[start:stop],
+                google_query=google_query[start:stop],
+                google_success=google_success[start:stop],
+            )
+        
+        successful_geocodes = 0
+        google_successes = 0
+        progress_every = max(5, total // 100)
+        done = 0
+        flushed = 0
+        
+        try:
+            for position, geocoding_result in enumerate(results):
+                # Store Google Maps results
+                if geocoding_result['google_coords']:
+                    google_latitude[position], google_longitude[position] = geocoding_result['google_coords']
+                    google_success[position] = True
+                    google_query[position] = geocoding_result['google_query']
+                    google_successes += 1
                 
-                successful_geocodes += 1
-                logger.info(f"✅ Row {index + 1} geocoded successfully via Google Maps: {geocoding_result['final_coords']} (confidence: {geocoding_result['confidence']})")
-            else:
-                df.at[index, 'geocoding_status'] = 'failed'
-                df.at[index, 'geocoding_source'] = 'none'
-                df.at[index, 'confidence'] = 'low'
-                logger.warning(f"❌ Row {index + 1} geocoding failed on Google Maps")
-            
-            # Rate limiting between requests
-            time.sleep(self.rate_limit_delay)
-            
-            # Progress update every 5 rows
-            if (index + 1) % 5 == 0:
-                current_success_rate = (successful_geocodes / (index + 1)) * 100
+                # Store final results
+                if geocoding_result['final_coords']:
+                    latitude[position], longitude[position] = geocoding_result['final_coords']
+                    status[position] = 'success'
+                    source[position] = geocoding_result['geocoding_source']
+                    confidence[position] = geocoding_result['confidence']
+                    successful_geocodes += 1
+                    logger.debug(f"✅ Lookup {position + 1} geocoded successfully via {source[position]}: {geocoding_result['final_coords']} (confidence: {confidence[position]})")
+                else:
+                    logger.debug(f"❌ Lookup {position + 1} geocoding failed")
                 
-                # Count Google successes
-                google_successes = df.head(index + 1)['google_success'].sum()
+                # Progress update from running counters
+                done = position + 1
+                if done % progress_every == 0 or done == total:
+                    logger.info(f"📊 Progress: {done}/{total} ({done / total * 100:.1f}%)")
+                    logger.info(f"   • Overall success rate: {successful_geocodes / done * 100:.1f}%")
+                    logger.info(f"   • Google Maps successes: {google_successes}")
                 
-                logger.info(f"📊 Progress: {index + 1}/{total_rows} ({((index + 1)/total_rows)*100:.1f}%)")
-                logger.info(f"   • Overall success rate: {current_success_rate:.1f}%")
-                logger.info(f"   • Google Maps successes: {google_successes}")
+                if checkpoint_path and done - flushed >= checkpoint_every:
+                    append_geocode_checkpoint(checkpoint_path, result_frame(flushed, done))
+                    flushed = done
+        finally:
+            # Keep what was completed, also when the run is interrupted
+            if checkpoint_path and done > flushed:
+                append_geocode_checkpoint(checkpoint_path, result_frame(flushed, done))
+                logger.info(f"💾 Checkpointed {done} completed lookups to {checkpoint_path}")
+        
+        return result_frame(0, total)
+    
+    def _log_dataset_summary(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Log the success statistics of a geocoded dataset and return it."""
+        total_rows = len(df)
+        successful_geocodes = int((df['geocoding_status'] == 'success').sum())
         
         # Final summary with single geocoding statistics
         final_success_rate = (successful_geocodes / total_rows) * 100
@@ -235,6 +653,9 @@ class PilgrimStampGeocoder:
         
         logger.info(f"\n📊 Service Performance:")
         logger.info(f"   • Google Maps: {google_total_successes}/{total_rows} ({google_total_successes/total_rows*100:.1f}%)")
+        gazetteer_successes = int((df['geocoding_source'] == 'gazetteer').sum())
+        if gazetteer_successes:
+            logger.info(f"   • Gazetteer (town level): {gazetteer_successes}/{total_rows} ({gazetteer_successes/total_rows*100:.1f}%)")
         
         if final_success_rate < 50:
             logger.warning("⚠️  Low success rate - consider reviewing place names or geocoding strategy")
@@ -245,13 +666,23 @@ class PilgrimStampGeocoder:
         
         return df
     
-    def create_folium_map(self, df: pd.DataFrame, output_path: str = "pilgrim_stamps_map.html"):
+    def create_folium_map(self, df: pd.DataFrame, output_path: str = "pilgrim_stamps_map.html",
+                          map_mode: str = 'cluster'):
         """
         Create an interactive Folium map of all geocoded locations.
         
+        In "cluster" mode all stamps are one GeoJSON layer, clustered in the
+        browser, with icons, tooltips and popups built in JavaScript from the
+        feature properties; the page holds each stamp's data once instead of
+        a marker, icon, popup and tooltip object each. "lazy" mode loads the
+        same layer from a compact file next to the map and fetches popup
+        details on demand, so the page must be served over HTTP. "markers"
+        mode adds one folium Marker with an inline HTML popup per stamp.
+        
         Args:
             df: DataFrame with latitude, longitude columns
             output_path: Path to save the HTML map
+            map_mode: "cluster", "lazy" or "markers"
         """
         # Filter successful geocodes
         geocoded_df = df[df['geocoding_status'] == 'success'].copy()
@@ -276,6 +707,230 @@ class PilgrimStampGeocoder:
         )
         
         # Add markers for each successfully geocoded location
+        if map_mode == 'cluster':
+            marker_count = self._add_stamp_layer(m, geocoded_df)
+        elif map_mode == 'lazy':
+            marker_count = self._add_lazy_stamp_layer(m, geocoded_df, output_path)
+        else:
+            marker_count = self._add_stamp_markers(m, geocoded_df)
+        
+        # Add a legend to explain marker colors and confidence
+        legend_html = '''
+        <div style="position: fixed; 
+                    bottom: 50px; left: 50px; width: 290px; height: 200px; 
+                    background-color: white; border:2px solid grey; z-index:9999; 
+                    font-size:14px; padding: 10px">
+        <h4>Legend</h4>
+        <i class="fa fa-map-marker fa-2x" style="color:green"></i> Albergues/Hostels<br>
+        <i class="fa fa-map-marker fa-2x" style="color:purple"></i> Hotels<br>
+        <i class="fa fa-map-marker fa-2x" style="color:orange"></i> Bars/Restaurants<br>
+        <i class="fa fa-map-marker fa-2x" style="color:red"></i> Religious Sites<br>
+        <i class="fa fa-map-marker fa-2x" style="color:blue"></i> Other Locations<br>
+        <hr style="margin: 8px 0;">
+        <strong>Confidence Levels:</strong><br>
+        🎯 High: Google Maps building match<br>
+        📍 Medium: Exact town match (gazetteer)<br>
+        ⚠️ Low: Fuzzy town match (gazetteer)
+        </div>
+        '''
+        m.get_root().html.add_child(folium.Element(legend_html))
+        
+        # Save the map
+        m.save(output_path)
+        logger.info(f"✅ Interactive map saved to {output_path}")
+        logger.info(f"📍 Added {marker_count} markers to the map")
+        
+        # Create a summary text file
+        summary_path = output_path.replace('.html', '_summary.txt')
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(f"Pilgrim Stamps Interactive Map Summary\n")
+            f.write(f"=====================================\n\n")
+            f.write(f"Generated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"Total locations in dataset: {len(df)}\n")
+            f.write(f"Successfully geocoded: {len(geocoded_df)}\n")
+            f.write(f"Failed geocoding: {len(df) - len(geocoded_df)}\n")
+            f.write(f"Success rate: {(len(geocoded_df)/len(df))*100:.1f}%\n\n")
+            
+            # Single geocoding statistics
+            google_successes = df['google_success'].sum()
+            f.write(f"Single Geocoding Performance:\n")
+            f.write(f"- Google Maps: {google_successes}/{len(df)} ({google_successes/len(df)*100:.1f}%)\n")
+            gazetteer_successes = (df['geocoding_source'] == 'gazetteer').sum()
+            f.write(f"- Gazetteer (town level): {gazetteer_successes}/{len(df)} ({gazetteer_successes/len(df)*100:.1f}%)\n\n")
+            
+            f.write(f"Map Details:\n")
+            f.write(f"- Center coordinates: {center_lat:.6f}, {center_lon:.6f}\n")
+            f.write(f"- Markers added: {marker_count}\n")
+            f.write(f"- Map file: {output_path}\n\n")
+            
+            f.write(f"Marker Color Legend:\n")
+            f.write(f"- Green: Albergues/Hostels\n")
+            f.write(f"- Purple: Hotels\n")
+            f.write(f"- Orange: Bars/Restaurants\n")
+            f.write(f"- Red: Religious Sites\n")
+            f.write(f"- Blue: Other Locations\n\n")
+            
+            if len(geocoded_df) > 0:
+                f.write(f"Successfully Geocoded Locations:\n")
+                f.write(f"--------------------------------\n")
+                for idx, row in geocoded_df.iterrows():
+                    f.write(f"{idx+1}. {row['place']} in {row['town']} → ({row['latitude']:.6f}, {row['longitude']:.6f})\n")
+            
+            if len(df) - len(geocoded_df) > 0:
+                failed_df = df[df['geocoding_status'] == 'failed']
+                f.write(f"\nFailed Geocoding Locations:\n")
+                f.write(f"---------------------------\n")
+                for idx, row in failed_df.iterrows():
+                    f.write(f"{idx+1}. {row['place']} in {row['town']}\n")
+        
+        logger.info(f"📄 Summary report saved to {summary_path}")
+        logger.info(f"🌐 Open {output_path} in your browser to view the interactive map!")
+    
+    def _stamp_features(self, geocoded_df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Build a GeoJSON Point feature per stamp with its popup details as properties.
+        
+        Args:
+            geocoded_df: Successfully geocoded stamps
+            
+        Returns:
+            List of GeoJSON features
+        """
+        features = []
+        for _, row in geocoded_df.iterrows():
+            place = str(row['place'])
+            categories_en = str(row['english_categories']) if pd.notna(row['english_categories']) and row['english_categories'] else ''
+            categories_es = str(row['categories']) if pd.notna(row['categories']) and row['categories'] else ''
+            properties = {
+                'place': place,
+                'town': str(row['town']),
+                'route': str(row['route']),
+                'source': str(row.get('geocoding_source', 'unknown')),
+                'confidence': str(row.get('confidence', 'low')),
+                'color': stamp_marker_color(place, categories_en, categories_es),
+            }
+            # Optional details are left out rather than written as nulls
+            google_lat = row.get('google_latitude')
+            google_lon = row.get('google_longitude')
+            if pd.notna(google_lat):
+                properties['google'] = [float(google_lat), float(google_lon)]
+            image_path = row.get('image_path', '')
+            if pd.notna(image_path) and image_path and Path(image_path).exists():
+                properties['image'] = str(image_path)
+            if categories_en:
+                properties['categories_en'] = categories_en
+            if categories_es:
+                properties['categories_es'] = categories_es
+            
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [float(row['longitude']), float(row['latitude'])]},
+                'properties': properties,
+            })
+        return features
+    
+    def _add_clustered(self, m: folium.Map, layer: folium.GeoJson) -> MarkerCluster:
+        """Add a GeoJSON layer of stamps to the map through a marker cluster."""
+        # Markers are added to the cluster in chunks so the page stays responsive
+        cluster = MarkerCluster(name='Pilgrim stamps', options={'chunkedLoading': True})
+        layer.add_to(cluster)
+        cluster.add_to(m)
+        return cluster
+    
+    def _add_stamp_layer(self, m: folium.Map, geocoded_df: pd.DataFrame) -> int:
+        """
+        Add all stamps to the map as one clustered GeoJSON layer.
+        
+        Args:
+            m: Map to add the layer to
+            geocoded_df: Successfully geocoded stamps
+            
+        Returns:
+            Number of stamps added
+        """
+        features = self._stamp_features(geocoded_df)
+        layer = folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            name='Pilgrim stamps',
+            on_each_feature=JsCode(STAMP_FEATURE_JS)
+        )
+        self._add_clustered(m, layer)
+        return len(features)
+    
+    def _add_lazy_stamp_layer(self, m: folium.Map, geocoded_df: pd.DataFrame, output_path: str) -> int:
+        """
+        Add all stamps as one clustered layer loaded from files next to the map.
+        
+        Writes <map>_data/stamps.geojson with only the id, marker color and
+        coordinates of each stamp, which the page loads on open, and the
+        popup details in <map>_data/details/<id // DETAILS_SHARD_SIZE>.json,
+        which are fetched when a stamp is first hovered or opened. The page
+        itself no longer grows with the number of stamps.
+        
+        Args:
+            m: Map to add the layer to
+            geocoded_df: Successfully geocoded stamps
+            output_path: Path the HTML map will be saved to
+            
+        Returns:
+            Number of stamps added
+        """
+        map_path = Path(output_path)
+        data_dir = map_path.with_name(f"{map_path.stem}_data")
+        details_dir = data_dir / 'details'
+        # Shards of a previous, larger map would be left behind otherwise
+        if details_dir.exists():
+            shutil.rmtree(details_dir)
+        details_dir.mkdir(parents=True)
+        
+        points = []
+        shards: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        for stamp_id, feature in enumerate(self._stamp_features(geocoded_df)):
+            details = feature['properties']
+            lon, lat = feature['geometry']['coordinates']
+            points.append({
+                'type': 'Feature',
+                # 6 decimals (~0.1 m) is the precision the popup shows
+                'geometry': {'type': 'Point', 'coordinates': [round(lon, 6), round(lat, 6)]},
+                'properties': {'id': stamp_id, 'color': details.pop('color')},
+            })
+            shards.setdefault(stamp_id // DETAILS_SHARD_SIZE, {})[stamp_id] = details
+        
+        for shard, stamps in shards.items():
+            with open(details_dir / f"{shard}.json", 'w', encoding='utf-8') as f:
+                json.dump(stamps, f, ensure_ascii=False, separators=(',', ':'))
+        stamps_path = data_dir / 'stamps.geojson'
+        with open(stamps_path, 'w', encoding='utf-8') as f:
+            json.dump({'type': 'FeatureCollection', 'features': points}, f, separators=(',', ':'))
+        logger.info(f"📦 Wrote {len(points)} stamp locations to {stamps_path} and their details to {len(shards)} files in {details_dir}")
+        
+        # The page fetches the files relative to its own location
+        data_url = data_dir.name
+        feature_js = (LAZY_STAMP_FEATURE_JS
+                      .replace('DETAILS_URL', json.dumps(f"{data_url}/details"))
+                      .replace('SHARD_SIZE', str(DETAILS_SHARD_SIZE)))
+        # The layer starts empty and is filled once the file has loaded, so
+        # the page does not block on it
+        layer = folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': []},
+            name='Pilgrim stamps',
+            on_each_feature=JsCode(feature_js)
+        )
+        cluster = self._add_clustered(m, layer)
+        LazyGeoJsonLoader(f"{data_url}/stamps.geojson", layer, cluster).add_to(m)
+        return len(points)
+    
+    def _add_stamp_markers(self, m: folium.Map, geocoded_df: pd.DataFrame) -> int:
+        """
+        Add one folium Marker with an inline HTML popup per stamp.
+        
+        Args:
+            m: Map to add the markers to
+            geocoded_df: Successfully geocoded stamps
+            
+        Returns:
+            Number of markers added
+        """
         marker_count = 0
         for _, row in geocoded_df.iterrows():
             # Prepare popup content with all relevant information
@@ -329,27 +984,7 @@ class PilgrimStampGeocoder:
                 tooltip_text = tooltip_text[:37] + "..."
             
             # Add marker with different colors based on category and confidence
-            marker_color = 'blue'  # default
-            
-            # Check both place name and categories for better color determination
-            place_lower = place.lower()
-            categories_en_lower = str(categories_en).lower() if pd.notna(categories_en) and categories_en else ""
-            categories_es_lower = str(categories_es).lower() if pd.notna(categories_es) and categories_es else ""
-            
-            if ('albergue' in place_lower or 'hostel' in place_lower or 
-                'hostel' in categories_en_lower or 'albergue' in categories_es_lower):
-                marker_color = 'green'  # Hostels/Albergues
-            elif ('hotel' in place_lower or 'hotel' in categories_en_lower or 
-                  'hotel' in categories_es_lower):
-                marker_color = 'purple'  # Hotels
-            elif ('bar' in place_lower or 'restaurant' in place_lower or 'café' in place_lower or
-                  'bar' in categories_en_lower or 'restaurant' in categories_en_lower or
-                  'bar' in categories_es_lower or 'restaurante' in categories_es_lower):
-                marker_color = 'orange'  # Food & Drink
-            elif ('iglesia' in place_lower or 'catedral' in place_lower or 'church' in place_lower or
-                  'church' in categories_en_lower or 'iglesia' in categories_es_lower or 
-                  'catedral' in categories_es_lower):
-                marker_color = 'red'  # Religious sites
+            marker_color = stamp_marker_color(place, categories_en, categories_es)
             
             # Add confidence indicator to tooltip
             confidence = row.get('confidence', 'low')
@@ -368,78 +1003,122 @@ class PilgrimStampGeocoder:
             
             marker_count += 1
         
-        # Add a legend to explain marker colors and confidence
-        legend_html = '''
-        <div style="position: fixed; 
-                    bottom: 50px; left: 50px; width: 250px; height: 200px; 
-                    background-color: white; border:2px solid grey; z-index:9999; 
-                    font-size:14px; padding: 10px">
-        <h4>Legend</h4>
-        <i class="fa fa-map-marker fa-2x" style="color:green"></i> Albergues/Hostels<br>
-        <i class="fa fa-map-marker fa-2x" style="color:purple"></i> Hotels<br>
-        <i class="fa fa-map-marker fa-2x" style="color:orange"></i> Bars/Restaurants<br>
-        <i class="fa fa-map-marker fa-2x" style="color:red"></i> Religious Sites<br>
-        <i class="fa fa-map-marker fa-2x" style="color:blue"></i> Other Locations<br>
-        <hr style="margin: 8px 0;">
-        <strong>Confidence Levels:</strong><br>
-        🎯 High: Google Maps successful<br>
-        📍 Medium: One service tried<br>
-        ⚠️ Low: Both services failed
-        </div>
-        '''
-        m.get_root().html.add_child(folium.Element(legend_html))
-        
-        # Save the map
-        m.save(output_path)
-        logger.info(f"✅ Interactive map saved to {output_path}")
-        logger.info(f"📍 Added {marker_count} markers to the map")
-        
-        # Create a summary text file
-        summary_path = output_path.replace('.html', '_summary.txt')
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            f.write(f"Pilgrim Stamps Interactive Map Summary\n")
-            f.write(f"=====================================\n\n")
-            f.write(f"Generated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Total locations in dataset: {len(df)}\n")
-            f.write(f"Successfully geocoded: {len(geocoded_df)}\n")
-            f.write(f"Failed geocoding: {len(df) - len(geocoded_df)}\n")
-            f.write(f"Success rate: {(len(geocoded_df)/len(df))*100:.1f}%\n\n")
-            
-            # Single geocoding statistics
-            google_successes = df['google_success'].sum()
-            f.write(f"Single Geocoding Performance:\n")
-            f.write(f"- Google Maps: {google_successes}/{len(df)} ({google_successes/len(df)*100:.1f}%)\n\n")
-            
-            f.write(f"Map Details:\n")
-            f.write(f"- Center coordinates: {center_lat:.6f}, {center_lon:.6f}\n")
-            f.write(f"- Markers added: {marker_count}\n")
-            f.write(f"- Map file: {output_path}\n\n")
-            
-            f.write(f"Marker Color Legend:\n")
-            f.write(f"- Green: Albergues/Hostels\n")
-            f.write(f"- Purple: Hotels\n")
-            f.write(f"- Orange: Bars/Restaurants\n")
-            f.write(f"- Red: Religious Sites\n")
-            f.write(f"- Blue: Other Locations\n\n")
-            
-            if len(geocoded_df) > 0:
-                f.write(f"Successfully Geocoded Locations:\n")
-                f.write(f"--------------------------------\n")
-                for idx, row in geocoded_df.iterrows():
-                    f.write(f"{idx+1}. {row['place']} in {row['town']} → ({row['latitude']:.6f}, {row['longitude']:.6f})\n")
-            
-            if len(df) - len(geocoded_df) > 0:
-                failed_df = df[df['geocoding_status'] == 'failed']
-                f.write(f"\nFailed Geocoding Locations:\n")
-                f.write(f"---------------------------\n")
-                for idx, row in failed_df.iterrows():
-                    f.write(f"{idx+1}. {row['place']} in {row['town']}\n")
-        
-        logger.info(f"📄 Summary report saved to {summary_path}")
-        logger.info(f"🌐 Open {output_path} in your browser to view the interactive map!")
+        return marker_count
+
+def parse_arguments():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Geocode pilgrim stamp locations with the Google Maps Geocoding API',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                          # Geocode, answering repeated queries from the cache
+  %(prog)s --cache-ttl-days 30      # Re-query results older than 30 days
+  %(prog)s --no-cache               # Query Google for every row
+  %(prog)s -w 16 --qps 40           # 16 requests in flight, at most 40 per second
+  %(prog)s --resume                 # Continue an interrupted run from its checkpoint
+  %(prog)s --changeset data/pilgrim_stamps_changeset.json  # Geocode only stamps an incremental crawl added or changed
+  %(prog)s --gazetteer data/ES.txt  # Fall back to town coordinates when Google misses
+  %(prog)s --gazetteer data/ES.txt --offline  # Town coordinates only, no network
+  %(prog)s --map-mode lazy          # Map data in files loaded on demand (serve over HTTP)
+  %(prog)s --map-mode markers       # One marker object per stamp instead of a clustered layer
+        """
+    )
+    parser.add_argument(
+        '--cache-path',
+        type=str,
+        default='data/geocode_cache.sqlite',
+        help='Persistent geocode cache (default: data/geocode_cache.sqlite)'
+    )
+    parser.add_argument(
+        '--cache-ttl-days',
+        type=float,
+        default=180,
+        help='Days before a cached result is re-queried (default: 180)'
+    )
+    parser.add_argument(
+        '--negative-ttl-days',
+        type=float,
+        default=14,
+        help='Days before a cached "no result" is re-queried (default: 14)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the geocode cache'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=8,
+        help='Maximum concurrent geocoding requests (default: 8)'
+    )
+    parser.add_argument(
+        '--qps',
+        type=float,
+        default=10.0,
+        help='Maximum geocoding requests per second (default: 10)'
+    )
+    parser.add_argument(
+        '--checkpoint-path',
+        type=str,
+        default='data/pilgrim_stamps_geocoded.checkpoint.csv',
+        help='Checkpoint of completed lookups (default: data/pilgrim_stamps_geocoded.checkpoint.csv)'
+    )
+    parser.add_argument(
+        '--checkpoint-every',
+        type=int,
+        default=100,
+        help='Lookups between checkpoint flushes (default: 100)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip lookups already geocoded in the checkpoint of an interrupted run'
+    )
+    parser.add_argument(
+        '--changeset',
+        type=str,
+        help='Changeset of main.py --incremental: geocode only added and modified stamps, '
+             'reusing the previous output for the rest'
+    )
+    parser.add_argument(
+        '--gazetteer',
+        type=str,
+        help='Offline gazetteer (GeoNames TSV or GeoJSON town points) for town-level fallback coordinates'
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Geocode with the gazetteer only, without Google Maps'
+    )
+    parser.add_argument(
+        '--map-mode',
+        choices=MAP_MODES,
+        default='cluster',
+        help='Render stamps as one clustered GeoJSON layer, the same with stamp data loaded on demand '
+             'from files next to the map, or as one marker each (default: cluster)'
+    )
+    
+    args = parser.parse_args()
+    
+    if args.cache_ttl_days <= 0 or args.negative_ttl_days <= 0:
+        parser.error("Cache TTLs must be positive numbers")
+    if args.workers < 1:
+        parser.error("Workers must be at least 1")
+    if args.qps <= 0:
+        parser.error("QPS must be a positive number")
+    if args.checkpoint_every < 1:
+        parser.error("Checkpoint interval must be at least 1")
+    if args.offline and not args.gazetteer:
+        parser.error("--offline requires --gazetteer")
+    
+    return args
 
 def main():
     """Main function to run the complete pilgrim stamps geocoding process."""
+    args = parse_arguments()
+    
     logger.info("🚀 Starting Pilgrim Stamps Geocoding Script")
     logger.info("=" * 60)
     
@@ -458,7 +1137,20 @@ def main():
     # Initialize geocoder
     try:
         logger.info("🔧 Initializing geocoder...")
-        geocoder = PilgrimStampGeocoder()
+        geocode_cache = None
+        if not args.no_cache:
+            geocode_cache = GeocodeCache(args.cache_path, args.cache_ttl_days, args.negative_ttl_days)
+        backends = []
+        if not args.offline:
+            if os.getenv('GOOGLE_MAPS_API_KEY') or not args.gazetteer:
+                backends.append(GoogleBackend.from_environment(geocode_cache))
+            else:
+                logger.warning("⚠️  GOOGLE_MAPS_API_KEY not set - using the gazetteer only")
+        if args.gazetteer:
+            backends.append(GazetteerBackend(args.gazetteer))
+        geocoder = PilgrimStampGeocoder(geocode_cache, backends)
+        # Quota ceiling for all workers together; bursts up to the in-flight limit
+        geocoder.rate_limiter.configure(geocoder.rate_limit_host, args.qps, args.workers)
         logger.info("✅ Geocoder initialized successfully")
     except Exception as e:
         logger.error(f"❌ Failed to initialize geocoder: {e}")
@@ -473,13 +1165,27 @@ def main():
         logger.info(f"📁 Processing dataset: {input_csv}")
         logger.info("⚠️  Note: Using Google Maps API for fast, accurate geocoding")
         
+        reuse = None
+        if args.changeset:
+            reuse = load_unchanged_geocodes(output_csv, load_changeset(args.changeset))
+        
         start_time = time.time()
-        geocoded_df = geocoder.geocode_dataset(input_csv)
+        geocoded_df = geocoder.geocode_dataset(
+            input_csv,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint_path,
+            resume=args.resume,
+            checkpoint_every=args.checkpoint_every,
+            reuse=reuse,
+        )
         end_time = time.time()
         
         processing_time = end_time - start_time
         logger.info(f"⏱️  Dataset processing completed in {processing_time:.1f} seconds")
         logger.info(f"🚀 Google Maps API processing: {processing_time:.1f} seconds for {len(geocoded_df)} locations")
+        geocoder.rate_limiter.log_stats()
+        if geocoder.geocode_cache:
+            geocoder.geocode_cache.log_stats()
         
         # Step 2: Save geocoded data to CSV
         logger.info("\n" + "="*60)
@@ -492,6 +1198,10 @@ def main():
             csv_size = Path(output_csv).stat().st_size
             logger.info(f"✅ Geocoded data saved to CSV: {output_csv} ({csv_size} bytes)")
             
+            # The output holds every lookup now; a later run starts fresh
+            if Path(args.checkpoint_path).exists():
+                os.remove(args.checkpoint_path)
+            
             # Save to Excel
             try:
                 geocoded_df.to_excel(output_excel, index=False)
@@ -514,7 +1224,7 @@ def main():
         
         if successful_geocodes > 0:
             logger.info(f"🗺️  Creating map with {successful_geocodes} successfully geocoded locations...")
-            geocoder.create_folium_map(geocoded_df, map_output)
+            geocoder.create_folium_map(geocoded_df, map_output, args.map_mode)
             
             # Verify map creation
             if Path(map_output).exists():
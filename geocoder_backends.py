@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Geocoder backends for the Pilgrim Stamp geocoder.
+Each backend turns a (place, town) pair into a query and the query into
+coordinates. The Google backend resolves individual buildings over the
+network; the gazetteer backend resolves towns from a local file, instantly
+and offline, at town-level precision and therefore lower confidence.
+"""
+
+import bisect
+import csv
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from geocode_cache import GeocodeCache, normalize_query
+from utils import RATE_LIMITER
+
+try:
+    import googlemaps
+    GOOGLEMAPS_AVAILABLE = True
+except ImportError:
+    GOOGLEMAPS_AVAILABLE = False
+
+# GeoNames dump columns (https://download.geonames.org/export/dump/readme.txt)
+GEONAMES_NAME = 1
+GEONAMES_ASCIINAME = 2
+GEONAMES_ALTERNATE_NAMES = 3
+GEONAMES_LATITUDE = 4
+GEONAMES_LONGITUDE = 5
+GEONAMES_FEATURE_CLASS = 6
+GEONAMES_COUNTRY = 8
+GEONAMES_POPULATION = 14
+# Feature class of cities, towns and villages
+GEONAMES_POPULATED_PLACE = 'P'
+
+class GeocodeMatch(NamedTuple):
+    """Coordinates found by a backend."""
+
+    latitude: float
+    longitude: float
+    confidence: str  # "low", "medium" or "high"
+    matched: str     # What the query matched, for logging
+
+class GoogleBackend:
+    """
+    Google Maps Geocoding API backend.
+
+    Queries "<place>, <town>, Spain" for building-level coordinates. Responses
+    go through the optional persistent cache and requests are paced by the
+    shared per-host rate limiter.
+    """
+
+    name = 'google'
+
+    def __init__(self, client, geocode_cache: Optional[GeocodeCache] = None,
+                 rate_limiter=RATE_LIMITER, rate_limit_host: str = 'maps.googleapis.com'):
+        """
+        Args:
+            client: googlemaps.Client (or anything with the same geocode method)
+            geocode_cache: Optional persistent cache of Google responses
+            rate_limiter: Token-bucket limiter shared with other requests
+            rate_limit_host: Host whose bucket paces the requests
+        """
+        self.client = client
+        self.geocode_cache = geocode_cache
+        self.rate_limiter = rate_limiter
+        self.rate_limit_host = rate_limit_host
+
+    @classmethod
+    def from_environment(cls, geocode_cache: Optional[GeocodeCache] = None) -> 'GoogleBackend':
+        """
+        Create the backend with the key in GOOGLE_MAPS_API_KEY.
+
+        Raises:
+            Exception: If the key is missing or the client cannot be created
+        """
+        google_api_key = os.getenv('GOOGLE_MAPS_API_KEY')
+        if not google_api_key:
+            logging.error("❌ GOOGLE_MAPS_API_KEY environment variable not set")
+            raise Exception("GOOGLE_MAPS_API_KEY environment variable is required")
+        if not GOOGLEMAPS_AVAILABLE:
+            raise Exception("The googlemaps package is required for Google geocoding")
+        try:
+            client = googlemaps.Client(key=google_api_key)
+            logging.info("✅ Google Maps API client initialized successfully")
+        except Exception as e:
+            logging.error(f"❌ Failed to initialize Google Maps API: {e}")
+            raise Exception("Google Maps API initialization failed - check your API key")
+        return cls(client, geocode_cache)
+
+    def query(self, place: str, town: str) -> Optional[str]:
+        """Build the query for a location; None without a place name (building-level precision required)."""
+        if not place or not place.strip():
+            return None
+        return f"{place}, {town}, Spain"
+
+    def geocode(self, query: str) -> Optional[GeocodeMatch]:
+        """
+        Geocode a query.
+
+        Args:
+            query: Query from query()
+
+        Returns:
+            GeocodeMatch with high confidence, or None if not found
+        """
+        cached = self.geocode_cache.lookup(query) if self.geocode_cache else None
+        if cached is not None:
+            logging.debug(f"Geocode cache hit for: {query}")
+            result = cached['response']
+        elif not self.client:
+            logging.error("Google Maps API client not available")
+            return None
+
+        try:
+            if cached is None:
+                logging.debug(f"Querying Google Maps with: {query}")
+
+                # Google Maps geocoding with region bias for Spain
+                self.rate_limiter.acquire(self.rate_limit_host)
+                result = self.client.geocode(
+                    query,
+                    region='es',  # Bias towards Spain
+                    language='en'
+                )
+                # Cache found and empty responses alike; errors raise and are not cached
+                if self.geocode_cache:
+                    self.geocode_cache.store(query, result or [])
+
+            if not result:
+                logging.debug(f"No Google results found for '{query}'")
+                return None
+
+            location = result[0]['geometry']['location']
+
+            # Check if the result is in Spain (basic validation)
+            if 'address_components' in result[0]:
+                country_found = any(
+                    'country' in component['types'] and component['short_name'] == 'ES'
+                    for component in result[0]['address_components']
+                )
+                if not country_found:
+                    logging.warning(f"Google result for '{query}' may not be in Spain")
+
+            logging.info(f"Found Google coordinates for '{query}': ({location['lat']}, {location['lng']})")
+            return GeocodeMatch(location['lat'], location['lng'], 'high', query)
+
+        except Exception as e:
+            logging.error(f"Google geocoding error for '{query}': {e}")
+            return None
+
+def town_key(name: str) -> str:
+    """Normalize a town name for matching: geocoding normalization without punctuation."""
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w]+', ' ', normalize_query(name))).strip()
+
+def _town_variants(town: str) -> List[str]:
+    """
+    Alternative spellings inside one town label.
+
+    "Pamplona / Iruña" and "Estella (Lizarra)" name the town twice, so each
+    part is tried on its own.
+    """
+    parts = re.split(r'\s*(?:/|\(|\)|\s-\s|,)\s*', town)
+    return [part for part in parts if part.strip() and part.strip() != town.strip()]
+
+class GazetteerBackend:
+    """
+    Offline town-level backend over a local gazetteer.
+
+    Loads a GeoNames dump (tab-separated, e.g. ES.txt) or a GeoJSON file of
+    Point features with a "name" property. Names are indexed in a hash for
+    exact matches and in a sorted key list for prefix matches; remaining
+    misses fall back to close spellings among keys with the same initial.
+    Exact matches get medium confidence, fuzzy ones low.
+    """
+
+    name = 'gazetteer'
+
+    def __init__(self, path: str, country: Optional[str] = 'ES', fuzzy_cutoff: float = 0.85):
+        """
+        Load and index the gazetteer.
+
+        Args:
+            path: GeoNames TSV, or .json/.geojson FeatureCollection of town points
+            country: Only keep GeoNames entries of this country code (None keeps all)
+            fuzzy_cutoff: Minimum similarity ratio for a misspelled match
+        """
+        self.path = path
+        self.country = country
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+        # key -> (latitude, longitude, population, display name)
+        self._places: Dict[str, Tuple[float, float, int, str]] = {}
+        if os.path.splitext(path)[1].lower() in ('.json', '.geojson'):
+            self._load_geojson(path)
+        else:
+            self._load_geonames(path)
+
+        self._sorted_keys = sorted(self._places)
+        self._keys_by_initial: Dict[str, List[str]] = {}
+        for key in self._sorted_keys:
+            self._keys_by_initial.setdefault(key[0], []).append(key)
+
+        self._lock = threading.Lock()
+        self._matches: Dict[str, Optional[GeocodeMatch]] = {}
+        logging.info(f"Gazetteer {path}: {len(self._places)} place names indexed")
+
+    def _add(self, name: str, latitude: float, longitude: float, population: int = 0, display: str = '') -> None:
+        """Index one name, keeping the most populous place when names collide."""
+        key = town_key(name)
+        if not key:
+            return
+        existing = self._places.get(key)
+        if existing is None or population > existing[2]:
+            self._places[key] = (latitude, longitude, population, display or name)
+
+    def _load_geonames(self, path: str) -> None:
+        """Index the populated places of a GeoNames dump under all their names."""
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(row) <= GEONAMES_POPULATION or row[GEONAMES_FEATURE_CLASS] != GEONAMES_POPULATED_PLACE:
+                    continue
+                if self.country and row[GEONAMES_COUNTRY] != self.country:
+                    continue
+                latitude = float(row[GEONAMES_LATITUDE])
+                longitude = float(row[GEONAMES_LONGITUDE])
+                population = int(row[GEONAMES_POPULATION] or 0)
+                display = row[GEONAMES_NAME]
+                names = [row[GEONAMES_NAME], row[GEONAMES_ASCIINAME]] + row[GEONAMES_ALTERNATE_NAMES].split(',')
+                for name in names:
+                    self._add(name, latitude, longitude, population, display)
+
+    def _load_geojson(self, path: str) -> None:
+        """Index the named Point features of a GeoJSON FeatureCollection."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for feature in data.get('features', []):
+            geometry = feature.get('geometry') or {}
+            properties = feature.get('properties') or {}
+            name = properties.get('name') or properties.get('town')
+            if geometry.get('type') != 'Point' or not name:
+                continue
+            longitude, latitude = geometry['coordinates'][:2]
+            self._add(name, latitude, longitude, int(properties.get('population') or 0))
+
+    def query(self, place: str, town: str) -> Optional[str]:
+        """The town is the query; None without a town name."""
+        if not town or not town.strip():
+            return None
+        return town.strip()
+
+    def geocode(self, query: str) -> Optional[GeocodeMatch]:
+        """
+        Find a town in the gazetteer.
+
+        Args:
+            query: Town name
+
+        Returns:
+            GeocodeMatch with medium (exact) or low (fuzzy) confidence, or None
+        """
+        with self._lock:
+            if query in self._matches:
+                return self._matches[query]
+
+        match = self._match(query)
+        if match:
+            logging.info(f"Found gazetteer coordinates for '{query}' ({match.matched}): ({match.latitude}, {match.longitude})")
+        else:
+            logging.debug(f"No gazetteer match for '{query}'")
+        with self._lock:
+            self._matches[query] = match
+        return match
+
+    def _result(self, key: str, confidence: str) -> GeocodeMatch:
+        """Build the match for an indexed key."""
+        latitude, longitude, _, display = self._places[key]
+        return GeocodeMatch(latitude, longitude, confidence, display)
+
+    def _match(self, town: str) -> Optional[GeocodeMatch]:
+        """Exact name, then each spelling variant, then prefix, then close spelling."""
+        keys = [town_key(town)] + [town_key(variant) for variant in _town_variants(town)]
+        keys = [key for key in keys if key]
+
+        for key in keys:
+            if key in self._places:
+                return self._result(key, 'medium')
+
+        for key in keys:
+            # "Santo Domingo" -> "Santo Domingo de la Calzada": most populous completion
+            prefix = key + ' '
+            start = bisect.bisect_left(self._sorted_keys, prefix)
+            candidates = []
+            for candidate in self._sorted_keys[start:]:
+                if not candidate.startswith(prefix):
+                    break
+                candidates.append(candidate)
+            if candidates:
+                return self._result(max(candidates, key=lambda c: self._places[c][2]), 'low')
+
+        for key in keys:
+            close = difflib.get_close_matches(key, self._keys_by_initial.get(key[0], []), n=1, cutoff=self.fuzzy_cutoff)
+            if close:
+                return self._result(close[0], 'low')
+
+        return None
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Google Geocoding API.
+Serves /maps/api/geocode/json with Google's response format, so the geocoder
+can be exercised and benchmarked without a key or network access. Results
+are derived from a hash of the normalized address, so every run returns the
+same coordinates; latency, server errors and quota errors are configurable.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from geocode_cache import normalize_query
+
+GEOCODE_PATH = '/maps/api/geocode/json'
+# googlemaps.Client only accepts keys of this shape
+STUB_API_KEY = 'AIzaStubGeocodingServerKey000000000000'
+
+# Bounding box of the Camino routes in northern Spain
+LATITUDE_RANGE = (42.0, 43.0)
+LONGITUDE_RANGE = (-8.6, -1.3)
+
+class StubGeocodingServer:
+    """
+    Threaded HTTP server answering geocoding requests like Google does.
+
+    Misses ("ZERO_RESULTS") are chosen by address hash and are stable. Server
+    errors (HTTP 500) and quota errors ("OVER_QUERY_LIMIT") are drawn at
+    random per request, so a retried request can succeed. qps_limit also
+    answers "OVER_QUERY_LIMIT" to requests beyond that many per second.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.05,
+                 jitter: float = 0.0, miss_rate: float = 0.1, error_rate: float = 0.0,
+                 quota_error_rate: float = 0.0, qps_limit: Optional[float] = None, seed: int = 0):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free port
+            latency: Seconds each response is delayed
+            jitter: Extra random delay of up to this many seconds
+            miss_rate: Share of addresses without a result
+            error_rate: Share of requests answered with HTTP 500
+            quota_error_rate: Share of requests answered with OVER_QUERY_LIMIT
+            qps_limit: Requests per second served before OVER_QUERY_LIMIT, None for no limit
+            seed: Seed of the random error draws
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.miss_rate = miss_rate
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.qps_limit = qps_limit
+        self.stats = {'requests': 0, 'ok': 0, 'zero_results': 0, 'server_errors': 0,
+                      'quota_errors': 0, 'max_in_flight': 0}
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._window_start = 0.0
+        self._window_count = 0
+        self._thread = None
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to googlemaps.Client(base_url=...)."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def client(self, **kwargs):
+        """
+        Create a googlemaps.Client talking to this server.
+
+        The client's own throttle is lifted so the geocoder's rate limiter
+        alone paces requests; kwargs override any client option.
+        """
+        import googlemaps
+
+        options = {'key': STUB_API_KEY, 'base_url': self.url, 'queries_per_second': 10000}
+        options.update(kwargs)
+        return googlemaps.Client(**options)
+
+    def start(self) -> 'StubGeocodingServer':
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-geocoding-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """Stop serving from the background thread and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _count(self, key: str) -> None:
+        """Increment a statistics counter."""
+        with self._lock:
+            self.stats[key] += 1
+
+    def _over_qps_limit(self) -> bool:
+        """Count a request against the current one-second window."""
+        if not self.qps_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            return self._window_count > self.qps_limit
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        """Answer one HTTP request."""
+        with self._lock:
+            self.stats['requests'] += 1
+            self._in_flight += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self._in_flight)
+            error_draw = self._random.random()
+            delay = self.latency + self._random.random() * self.jitter
+        try:
+            time.sleep(delay)
+            status, body = self._respond(request.path, error_draw)
+            payload = json.dumps(body).encode('utf-8')
+            request.send_response(status)
+            request.send_header('Content-Type', 'application/json; charset=UTF-8')
+            request.send_header('Content-Length', str(len(payload)))
+            request.end_headers()
+            request.wfile.write(payload)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _respond(self, path: str, error_draw: float):
+        """Build the HTTP status and JSON body for a request path."""
+        parsed = urlparse(path)
+        params = parse_qs(parsed.query)
+        if parsed.path != GEOCODE_PATH:
+            return 404, {'status': 'INVALID_REQUEST', 'error_message': f"Unknown path {parsed.path}"}
+        if not params.get('key'):
+            return 200, {'status': 'REQUEST_DENIED', 'error_message': 'You must use an API key.'}
+        address = params.get('address', [''])[0]
+        if not address:
+            return 200, {'status': 'INVALID_REQUEST', 'results': []}
+
+        if error_draw < self.error_rate:
+            self._count('server_errors')
+            return 500, {'status': 'UNKNOWN_ERROR', 'results': []}
+        if error_draw < self.error_rate + self.quota_error_rate or self._over_qps_limit():
+            self._count('quota_errors')
+            return 200, {'status': 'OVER_QUERY_LIMIT', 'error_message': 'You have exceeded your rate-limit for this API.'}
+
+        result = stub_result(address, self.miss_rate)
+        if result is None:
+            self._count('zero_results')
+            return 200, {'status': 'ZERO_RESULTS', 'results': []}
+        self._count('ok')
+        return 200, {'status': 'OK', 'results': [result]}
+
+def stub_result(address: str, miss_rate: float = 0.1) -> Optional[dict]:
+    """
+    Deterministic geocoding result for an address.
+
+    Args:
+        address: Address as queried
+        miss_rate: Share of addresses without a result
+
+    Returns:
+        Google-style result dictionary, or None for a miss
+    """
+    digest = hashlib.sha256(normalize_query(address).encode('utf-8')).digest()
+    if int.from_bytes(digest[:4], 'big') / 2 ** 32 < miss_rate:
+        return None
+
+    lat_fraction = int.from_bytes(digest[4:8], 'big') / 2 ** 32
+    lng_fraction = int.from_bytes(digest[8:12], 'big') / 2 ** 32
+    lat = round(LATITUDE_RANGE[0] + lat_fraction * (LATITUDE_RANGE[1] - LATITUDE_RANGE[0]), 7)
+    lng = round(LONGITUDE_RANGE[0] + lng_fraction * (LONGITUDE_RANGE[1] - LONGITUDE_RANGE[0]), 7)
+    return {
+        'address_components': [
+            {'long_name': address.split(',')[0].strip(), 'short_name': address.split(',')[0].strip(),
+             'types': ['establishment', 'point_of_interest']},
+            {'long_name': 'Spain', 'short_name': 'ES', 'types': ['country', 'political']},
+        ],
+        'formatted_address': address,
+        'geometry': {'location': {'lat': lat, 'lng': lng}, 'location_type': 'ROOFTOP'},
+        'place_id': f"stub-{digest.hex()[:27]}",
+        'types': ['establishment', 'point_of_interest'],
+    }
+
+def parse_arguments():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Serve a local stand-in for the Google Geocoding API',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Examples:
+  %(prog)s --port 8765                          # Serve on http://127.0.0.1:8765
+  %(prog)s --latency 0.2 --error-rate 0.05      # Slow and flaky
+  %(prog)s --qps-limit 20                       # Quota errors above 20 requests per second
+
+Point googlemaps.Client(key='{STUB_API_KEY}', base_url='http://127.0.0.1:8765') at it.
+        """
+    )
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per response (default: 0.05)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random delay of up to this many seconds (default: 0)')
+    parser.add_argument('--miss-rate', type=float, default=0.1, help='Share of addresses without a result (default: 0.1)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests failing with HTTP 500 (default: 0)')
+    parser.add_argument('--quota-error-rate', type=float, default=0.0, help='Share of requests failing with OVER_QUERY_LIMIT (default: 0)')
+    parser.add_argument('--qps-limit', type=float, help='Requests per second served before OVER_QUERY_LIMIT')
+    return parser.parse_args()
+
+def main():
+    """Run the stand-in server until interrupted"""
+    args = parse_arguments()
+    server = StubGeocodingServer(args.host, args.port, args.latency, args.jitter, args.miss_rate,
+                                 args.error_rate, args.quota_error_rate, args.qps_limit)
+    print(f"Stub geocoding server on {server.url}{GEOCODE_PATH} (API key {STUB_API_KEY})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Served: {server.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP response cache for the Pilgrim Stamp Scraper.
+Stores page bodies in SQLite together with their ETag and Last-Modified
+validators so re-crawls can use conditional GETs. Streamed downloads
+(stamp images) bypass it: the image store already keeps them.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_MODES = ('use', 'refresh', 'offline')
+
+class CacheMissError(requests.RequestException):
+    """Raised in offline mode when a URL has no cached response."""
+
+class HttpCache:
+    """
+    SQLite-backed response cache with conditional revalidation.
+
+    Modes:
+        use: revalidate cached entries with If-None-Match/If-Modified-Since
+             and serve the cached body on 304 Not Modified
+        refresh: ignore cached entries, fetch everything and overwrite the cache
+        offline: serve only from the cache and never touch the network
+
+    Only text responses are stored. Requests made with stream=True go
+    straight to the network, so their bodies are never read into memory.
+    """
+
+    def __init__(self, path: str = 'data/http_cache.sqlite', mode: str = 'use'):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+            mode: One of "use", "refresh" or "offline"
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}. Use one of {', '.join(CACHE_MODES)}")
+
+        self.path = path
+        self.mode = mode
+        self.stats = {'hits': 0, 'revalidated': 0, 'stored': 0, 'misses': 0}
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # One connection shared by all worker threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    status_code INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+        logging.info(f"HTTP cache at {path} (mode: {mode})")
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        Get the cached entry for a URL.
+
+        Args:
+            url: Request URL
+
+        Returns:
+            Dictionary with status_code, headers, body, etag and last_modified, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status_code, headers, body, etag, last_modified FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'status_code': row[0],
+            'headers': json.loads(row[1]),
+            'body': row[2],
+            'etag': row[3],
+            'last_modified': row[4],
+        }
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """
+        Store a successful response body and its validators.
+
+        Args:
+            url: Request URL
+            response: Response with status 200 (its body is read fully)
+        """
+        headers = dict(response.headers)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, json.dumps(headers), response.content,
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), time.time())
+            )
+        self._count('stored')
+
+    def _count(self, key: str) -> None:
+        """Increment a statistics counter."""
+        with self._lock:
+            self.stats[key] += 1
+
+    def _touch(self, url: str) -> None:
+        """Record that a cached entry was just revalidated."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    @staticmethod
+    def _to_response(url: str, entry: Dict) -> requests.Response:
+        """Rebuild a requests.Response from a cached entry."""
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = url
+        response.reason = 'OK'
+        response.from_cache = True
+        return response
+
+    def get(self, url: str, fetch: Callable[..., requests.Response], **kwargs) -> requests.Response:
+        """
+        Get a URL through the cache.
+
+        Args:
+            url: Request URL
+            fetch: Callable performing the network request, called as fetch(url, headers=..., **kwargs)
+            **kwargs: Extra arguments passed to fetch
+
+        Returns:
+            Response, rebuilt from the cache on a hit or 304
+        """
+        if kwargs.get('stream'):
+            if self.mode == 'offline':
+                self._count('misses')
+                raise CacheMissError(f"Offline mode: streamed downloads are not cached: {url}")
+            return fetch(url, **kwargs)
+        
+        cached = None if self.mode == 'refresh' else self.lookup(url)
+
+        if self.mode == 'offline':
+            if cached is None:
+                self._count('misses')
+                raise CacheMissError(f"Offline mode: no cached response for {url}")
+            self._count('hits')
+            return self._to_response(url, cached)
+
+        # Conditional GET when we hold a validated copy
+        headers = dict(kwargs.pop('headers', None) or {})
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = fetch(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and cached:
+            logging.debug(f"Not modified, serving cached copy: {url}")
+            self._touch(url)
+            self._count('revalidated')
+            return self._to_response(url, cached)
+
+        self._count('misses')
+        if response.status_code == 200 and response.headers.get('Content-Type', '').startswith('text/'):
+            self.store(url, response)
+        return response
+
+    def log_stats(self) -> None:
+        """Log how many requests the cache answered."""
+        logging.info(
+            f"HTTP cache ({self.mode}): {self.stats['hits']} offline hits, "
+            f"{self.stats['revalidated']} revalidated (304), "
+            f"{self.stats['misses']} fetched, {self.stats['stored']} stored"
+        )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Content-addressed image store for the Pilgrim Stamp Scraper.
+Stamp images are saved once per distinct content under their SHA-256, and a
+JSON manifest maps each stamp URL to the image URL, hash and stored path.
+"""
+
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+class ImageStore:
+    """
+    Stores image files as <directory>/<sha256><ext>.
+
+    Identical bytes reached from different stamps or towns are kept once,
+    and a stamp's image path only changes when the image content changes.
+    """
+
+    def __init__(self, directory: str = 'images/stamp_images', manifest_path: Optional[str] = None,
+                 autosave_every: int = 50):
+        """
+        Open the store and load its manifest.
+
+        Args:
+            directory: Folder holding the image files
+            manifest_path: Manifest JSON (defaults to <directory>/manifest.json)
+            autosave_every: Save the manifest after this many new stamp entries
+        """
+        self.directory = directory
+        self.manifest_path = manifest_path or os.path.join(directory, 'manifest.json')
+        self.autosave_every = autosave_every
+        self.stats = {'stored': 0, 'deduplicated': 0, 'bytes_saved': 0}
+
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.manifest = {'stamps': {}, 'objects': {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            logging.info(
+                f"Image store at {directory}: {len(self.manifest['objects'])} images "
+                f"for {len(self.manifest['stamps'])} stamps"
+            )
+
+    @staticmethod
+    def extension(image_url: str, content_type: str = '') -> str:
+        """
+        Pick the file extension for an image.
+
+        Args:
+            image_url: URL the image was downloaded from
+            content_type: Content-Type of the response
+
+        Returns:
+            Lower-case extension from the URL, else from the content type, else ""
+        """
+        ext = os.path.splitext(urlparse(image_url).path)[1].lower()
+        if ext:
+            return ext
+        return mimetypes.guess_extension(content_type.split(';')[0].strip()) or ''
+
+    def path_for(self, sha256: str, ext: str) -> str:
+        """Stored path of an image with the given hash and extension."""
+        return os.path.join(self.directory, f"{sha256}{ext}")
+
+    def add(self, temp_path: str, sha256: str, size: int, ext: str) -> str:
+        """
+        Move a downloaded file into the store.
+
+        Args:
+            temp_path: Complete downloaded file; it is moved or deleted
+            sha256: Hex digest of the file
+            size: File size in bytes
+            ext: File extension including the dot
+
+        Returns:
+            Stored path of the image
+        """
+        path = self.path_for(sha256, ext)
+        with self._lock:
+            if os.path.exists(path) and os.path.getsize(path) == size:
+                os.remove(temp_path)
+                self.stats['deduplicated'] += 1
+                self.stats['bytes_saved'] += size
+            else:
+                os.replace(temp_path, path)
+                self.stats['stored'] += 1
+            self.manifest['objects'][sha256] = {'path': path, 'size': size}
+        return path
+
+    def record(self, stamp_url: str, image_url: str, sha256: str) -> None:
+        """
+        Map a stamp to its stored image in the manifest.
+
+        Args:
+            stamp_url: Stamp location page URL
+            image_url: URL the image was downloaded from
+            sha256: Hex digest of the stored image
+        """
+        with self._lock:
+            self.manifest['stamps'][stamp_url] = {
+                'image_url': image_url,
+                'sha256': sha256,
+                'path': self.manifest['objects'][sha256]['path'],
+            }
+            self._unsaved += 1
+            autosave = self._unsaved >= self.autosave_every
+        if autosave:
+            self.save()
+
+    def lookup(self, stamp_url: str) -> Optional[Dict]:
+        """
+        Get the manifest entry of a stamp.
+
+        Args:
+            stamp_url: Stamp location page URL
+
+        Returns:
+            Dictionary with image_url, sha256 and path, or None
+        """
+        with self._lock:
+            return self.manifest['stamps'].get(stamp_url)
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.manifest_path)
+            self._unsaved = 0
+
+    def log_stats(self) -> None:
+        """Log how much the content addressing deduplicated."""
+        logging.info(
+            f"Image store: {self.stats['stored']} new images stored, {self.stats['deduplicated']} duplicates "
+            f"skipped ({self.stats['bytes_saved'] / 1024:.0f} KB saved), "
+            f"{len(self.manifest['objects'])} images for {len(self.manifest['stamps'])} stamps"
+        )
+
+def link_or_copy(source: str, destination: str) -> str:
+    """
+    Hardlink a file to a destination, copying only when linking is impossible.
+
+    Args:
+        source: Existing file
+        destination: Path to create (an existing file there is replaced)
+
+    Returns:
+        "linked", "copied" or "unchanged" (destination already is the same file)
+    """
+    if os.path.exists(destination):
+        if os.path.samefile(source, destination):
+            return 'unchanged'
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+        return 'linked'
+    except OSError:
+        # Different file system, or links not supported
+        shutil.copy2(source, destination)
+        return 'copied'
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Incremental re-crawl support for the Pilgrim Stamp Scraper.
+Diffs the stamp URLs found on the site against the previous dataset, scrapes
+only new and changed stamp locations, merges them into the dataset and
+writes a changeset (added, modified, removed) for the later pipeline stages.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils import file_sha256
+
+# Columns identifying a stamp row and columns compared to detect changes
+KEY_COLUMNS = ['route', 'town', 'stamp_url']
+COMPARE_COLUMNS = ['place', 'categories', 'english_categories', 'image_path']
+# Images are compared by content, not by where they are stored
+IMAGE_COLUMN = 'image_path'
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+def load_previous_dataset(csv_path: str) -> Optional[pd.DataFrame]:
+    """
+    Load the dataset of the previous crawl.
+
+    Args:
+        csv_path: Path of the previous pilgrim_stamps.csv
+
+    Returns:
+        DataFrame, or None if the file is missing or predates the stamp_url column
+    """
+    if not os.path.exists(csv_path):
+        logging.warning(f"No previous dataset at {csv_path}")
+        return None
+
+    df = pd.read_csv(csv_path, keep_default_na=False)
+    missing_columns = [col for col in KEY_COLUMNS if col not in df.columns]
+    if missing_columns:
+        logging.warning(f"Previous dataset {csv_path} lacks {missing_columns}; a full crawl is required")
+        return None
+
+    logging.info(f"✓ Loaded previous dataset with {len(df)} stamps from {csv_path}")
+    return df
+
+def row_key(row) -> Tuple[str, str, str]:
+    """Identity of a stamp row: (route, town, stamp_url)."""
+    return (row['route'], row['town'], row['stamp_url'])
+
+async def _resolve(value):
+    """Await value if the scraper returned a coroutine, so sync and async scrapers share one flow."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+async def crawl_route_incremental(scraper, previous_df: pd.DataFrame) -> Dict:
+    """
+    Re-crawl one route, scraping only stamp locations that are new or changed.
+
+    Works with both PilgrimStampScraper (calls run one after another) and
+    AsyncPilgrimStampScraper (calls run concurrently).
+
+    Args:
+        scraper: Scraper configured for the route, ideally with a response cache
+        previous_df: Dataset of the previous crawl
+
+    Returns:
+        Dictionary with the discovered keys and the new records:
+        {"discovered": set of keys, "added": [records], "modified": [records]}
+    """
+    town_links = await _resolve(scraper.get_town_links())
+    town_stamp_locations = await _resolve(scraper.get_stamp_locations_by_town(town_links))
+
+    previous_keys = {row_key(row) for _, row in previous_df.iterrows()}
+    discovered = set()
+    new_jobs = []
+    known_jobs = []
+    for town_name, stamp_urls in town_stamp_locations.items():
+        for stamp_url in stamp_urls:
+            key = (scraper.route_name, town_name, stamp_url)
+            discovered.add(key)
+            if key in previous_keys:
+                known_jobs.append((town_name, stamp_url))
+            else:
+                new_jobs.append((town_name, stamp_url))
+
+    logging.info(f"{scraper.route_name}: {len(new_jobs)} new stamp locations, {len(known_jobs)} to re-check")
+
+    added = await asyncio.gather(*(
+        _resolve(scraper.process_stamp_location(stamp_url, town_name)) for town_name, stamp_url in new_jobs
+    ))
+    checked = await asyncio.gather(*(
+        _resolve(scraper.check_stamp_location(stamp_url, town_name)) for town_name, stamp_url in known_jobs
+    ))
+
+    return {
+        'discovered': discovered,
+        'added': [record for record in added if record],
+        'modified': [record for changed, record in checked if changed and record],
+    }
+
+def image_identity(image_path: str) -> str:
+    """
+    Content identity of a dataset image path.
+
+    Image store paths are named by the image's SHA-256. Paths written before
+    the image store (images/stamp_images/<name>.jpg) are hashed from the file
+    while it still exists, so an image that only moved into the store is
+    not a modification.
+
+    Args:
+        image_path: Image path from the dataset
+
+    Returns:
+        SHA-256 hex digest, or the path itself if the content is unknown
+    """
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    if CONTENT_ADDRESSED_NAME.match(stem):
+        return stem
+    if os.path.isfile(image_path):
+        return file_sha256(image_path)
+    return image_path
+
+def stamp_changed(before, after) -> bool:
+    """Check whether a re-scraped stamp row differs from its previous row in content."""
+    if any(str(before[col]) != str(after[col]) for col in COMPARE_COLUMNS if col != IMAGE_COLUMN):
+        return True
+    before_image, after_image = str(before[IMAGE_COLUMN]), str(after[IMAGE_COLUMN])
+    return before_image != after_image and image_identity(before_image) != image_identity(after_image)
+
+def merge_dataset(previous_df: pd.DataFrame, discovered: set, added_df: pd.DataFrame,
+                  changed_df: pd.DataFrame, crawled_routes: List[str]) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Merge re-crawled stamps into the previous dataset and build the changeset.
+
+    Args:
+        previous_df: Dataset of the previous crawl
+        discovered: Keys of all stamps found on the site in this crawl
+        added_df: Compiled rows of stamps that were not in the previous dataset
+        changed_df: Compiled rows of re-scraped stamps whose page changed
+        crawled_routes: Route names crawled in this run; other routes are left untouched
+
+    Returns:
+        Tuple of (merged DataFrame, changeset dictionary)
+    """
+    timestamp = pd.Timestamp.now().isoformat()
+    previous_by_key = {row_key(row): row for _, row in previous_df.iterrows()}
+
+    # Pages that changed but whose content did not are not modifications;
+    # they still take the fresh row, e.g. for an image now in the store
+    modified = {}
+    refreshed = {}
+    for _, row in changed_df.iterrows():
+        key = row_key(row)
+        before = previous_by_key.get(key)
+        if before is None:
+            continue
+        if stamp_changed(before, row):
+            modified[key] = row
+        else:
+            refreshed[key] = row
+
+    merged_rows = []
+    removed = []
+    for key, row in previous_by_key.items():
+        if row['route'] in crawled_routes and key not in discovered:
+            # Tombstone: drop from the dataset, keep in the changeset
+            tombstone = row.to_dict()
+            tombstone['removed_at'] = timestamp
+            removed.append(tombstone)
+            continue
+        merged_rows.append(modified.get(key, refreshed.get(key, row)))
+
+    merged_df = pd.DataFrame(merged_rows, columns=previous_df.columns)
+    if not added_df.empty:
+        merged_df = pd.concat([merged_df, added_df[previous_df.columns.intersection(added_df.columns)]],
+                              ignore_index=True)
+    merged_df = merged_df.reset_index(drop=True)
+
+    changeset = {
+        'generated': timestamp,
+        'key_columns': KEY_COLUMNS,
+        'added': added_df.to_dict(orient='records'),
+        'modified': [
+            {'before': previous_by_key[key].to_dict(), 'after': row.to_dict()}
+            for key, row in modified.items()
+        ],
+        'removed': removed,
+    }
+
+    logging.info(
+        f"Changeset: {len(changeset['added'])} added, {len(changeset['modified'])} modified, "
+        f"{len(changeset['removed'])} removed"
+    )
+    return merged_df, changeset
+
+def write_changeset(changeset: Dict, path: str) -> None:
+    """
+    Save a changeset as JSON.
+
+    Args:
+        changeset: Changeset returned by merge_dataset
+        path: Output JSON path
+    """
+    changeset_dir = os.path.dirname(path)
+    if changeset_dir:
+        os.makedirs(changeset_dir, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(changeset, f, indent=2, ensure_ascii=False, default=str)
+    logging.info(f"✓ Changeset saved to {path}")
+
+def load_changeset(path: str) -> Dict:
+    """
+    Load a changeset written by write_changeset.
+
+    Args:
+        path: Changeset JSON path
+
+    Returns:
+        Changeset dictionary with "added", "modified" and "removed" lists
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
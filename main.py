@@ -4,9 +4,19 @@ Main execution script for the Pilgrim Stamp Scraper.
 Scrapes pilgrim stamp locations from the Camino Navarro website.
 """
 
-from scraper import PilgrimStampScraper
+from scraper import PilgrimStampScraper, BASE_URL, create_route_scrapers, crawl_routes
+from routes import get_route, route_keys
+from utils import RATE_LIMITER
+from http_cache import HttpCache, CACHE_MODES
+from crawl_state import CrawlState
+from download_pool import ImageDownloadPool, remove_partial_downloads
+from image_store import ImageStore
+from incremental import load_previous_dataset, crawl_route_incremental, merge_dataset, write_changeset
+import pandas as pd
+from urllib.parse import urlparse
+import argparse
+import asyncio
 import logging
-import time
 
 def setup_logging():
     """Set up logging configuration."""
@@ -19,11 +29,284 @@ def setup_logging():
         ]
     )
 
+def parse_arguments():
+    """Parse command-line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Scrape pilgrim stamp locations from lossellosdelcamino.com',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                          # Sequential crawl
+  %(prog)s --concurrency 8          # Async crawl of all routes at once, 8 requests in flight
+  %(prog)s --routes frances         # Crawl only the Camino Francés
+  %(prog)s -c 8 --rate 4 --burst 8  # Async crawl capped at 4 requests/second
+  %(prog)s --cache-mode offline     # Replay the last crawl from the response cache
+  %(prog)s --resume                 # Continue an interrupted crawl, retrying only failures
+  %(prog)s --incremental            # Scrape only new/changed stamps and write a changeset
+  %(prog)s --image-workers 0        # Download each image before scraping the next page
+        """
+    )
+    parser.add_argument(
+        '-c', '--concurrency',
+        type=int,
+        default=1,
+        help='Maximum requests in flight per host; values above 1 enable the async crawl (default: 1)'
+    )
+    parser.add_argument(
+        '--routes',
+        nargs='+',
+        choices=route_keys(),
+        default=route_keys(),
+        help=f"Routes to crawl (default: all registered routes: {' '.join(route_keys())})"
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=1.0,
+        help='Maximum requests per second to the stamp site (default: 1.0)'
+    )
+    parser.add_argument(
+        '--burst',
+        type=int,
+        default=2,
+        help='Maximum burst of back-to-back requests to the stamp site (default: 2)'
+    )
+    parser.add_argument(
+        '--cache-mode',
+        choices=CACHE_MODES,
+        default='use',
+        help='Response cache mode: revalidate cached pages, refetch everything, or replay offline (default: use)'
+    )
+    parser.add_argument(
+        '--cache-path',
+        type=str,
+        default='data/http_cache.sqlite',
+        help='Response cache database (default: data/http_cache.sqlite)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Resume the previous crawl: skip completed towns and stamps, retry failures'
+    )
+    parser.add_argument(
+        '--state-path',
+        type=str,
+        default='data/crawl_state.sqlite',
+        help='Crawl frontier and result journal (default: data/crawl_state.sqlite)'
+    )
+    parser.add_argument(
+        '--image-workers',
+        type=int,
+        default=4,
+        help='Background image download threads for the sequential crawl; 0 downloads inline (default: 4)'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Diff against the previous data/pilgrim_stamps.csv and scrape only new or changed stamps'
+    )
+    parser.add_argument(
+        '--changeset-path',
+        type=str,
+        default='data/pilgrim_stamps_changeset.json',
+        help='Changeset written by --incremental (default: data/pilgrim_stamps_changeset.json)'
+    )
+    
+    args = parser.parse_args()
+    
+    if args.concurrency < 1:
+        parser.error("Concurrency must be at least 1")
+    if args.rate <= 0:
+        parser.error("Rate must be a positive number")
+    if args.burst < 1:
+        parser.error("Burst must be at least 1")
+    if args.image_workers < 0:
+        parser.error("Image workers cannot be negative")
+    if args.incremental and args.resume:
+        parser.error("--incremental and --resume cannot be combined")
+    
+    return args
+
+def scrape_route(scraper, image_pool=None):
+    """
+    Scrape one route sequentially, one page request at a time.
+    
+    Args:
+        scraper: PilgrimStampScraper configured for the route
+        image_pool: Optional ImageDownloadPool; images are then downloaded in
+            the background while the next pages are scraped
+        
+    Returns:
+        List of scraped stamp records for the route
+    """
+    # Step 1: Get all town links for this route
+    logging.info(f"Step 1: Extracting town links from {scraper.route_name} main page")
+    logging.info("=" * 60)
+    
+    town_links = scraper.get_town_links()
+    if not town_links:
+        logging.warning(f"No town links found for {scraper.route_name}. Continuing to next route.")
+        return []
+    
+    logging.info(f"✓ Found {len(town_links)} towns to process for {scraper.route_name}")
+    
+    # Step 2: Get stamp locations for each town in this route
+    logging.info(f"Step 2: Extracting stamp location links from each town in {scraper.route_name}")
+    logging.info("=" * 60)
+    
+    town_stamp_locations = scraper.get_stamp_locations_by_town(town_links)
+    if not town_stamp_locations:
+        logging.warning(f"No stamp locations found for {scraper.route_name}. Continuing to next route.")
+        return []
+    
+    total_stamp_locations = sum(len(locations) for locations in town_stamp_locations.values())
+    logging.info(f"✓ Found {total_stamp_locations} total stamp locations across all towns in {scraper.route_name}")
+    
+    # Step 3: Scrape each stamp location and download images for this route
+    logging.info(f"Step 3: Scraping stamp location data and downloading images for {scraper.route_name}")
+    logging.info("=" * 60)
+    
+    route_scraped_data = []
+    processed_count = 0
+    failed_count = 0
+    total_processed = 0
+    pending_downloads = []
+    
+    for town_name, stamp_urls in town_stamp_locations.items():
+        logging.info(f"Processing stamp locations for town: {town_name} ({len(stamp_urls)} locations)")
+        
+        for stamp_url in stamp_urls:
+            total_processed += 1
+            try:
+                logging.info(f"  [{total_processed}/{total_stamp_locations}] Processing: {stamp_url.split('/')[-1]}")
+                
+                if image_pool is not None:
+                    # Scrape now, download the image on the pool
+                    pending_downloads.append(
+                        (stamp_url, scraper.queue_stamp_location(stamp_url, town_name, image_pool))
+                    )
+                    continue
+                
+                # Scrape the stamp location and download its image
+                stamp_data = scraper.process_stamp_location(stamp_url, town_name)
+                if stamp_data:
+                    route_scraped_data.append(stamp_data)
+                    processed_count += 1
+                else:
+                    failed_count += 1
+                    
+            except Exception as e:
+                logging.error(f"    ✗ Error processing stamp location {stamp_url}: {e}")
+                failed_count += 1
+                continue
+        
+        logging.info(f"Completed town: {town_name}")
+    
+    # Collect queued downloads in scrape order
+    for stamp_url, future in pending_downloads:
+        try:
+            stamp_data = future.result()
+        except Exception as e:
+            logging.error(f"    ✗ Error processing stamp location {stamp_url}: {e}")
+            stamp_data = None
+        if stamp_data:
+            route_scraped_data.append(stamp_data)
+            processed_count += 1
+        else:
+            failed_count += 1
+    
+    logging.info(f"✓ Successfully processed {processed_count} stamp locations for {scraper.route_name}")
+    if failed_count > 0:
+        logging.warning(f"⚠ Failed to process {failed_count} stamp locations for {scraper.route_name}")
+    
+    return route_scraped_data
+
+def run_incremental(args, cache, image_store, routes, base_filename):
+    """
+    Incremental re-crawl: scrape only new or changed stamps and merge them
+    into the previous dataset, writing a changeset for the later stages.
+    
+    Args:
+        args: Parsed command-line arguments
+        cache: HttpCache used to revalidate known stamp pages cheaply
+        image_store: ImageStore shared by all routes
+        routes: Route keys to crawl
+        base_filename: Dataset path without extension
+    """
+    if not routes:
+        logging.error("Incremental mode needs at least one route to crawl.")
+        return
+    
+    previous_df = load_previous_dataset(f"{base_filename}.csv")
+    if previous_df is None:
+        logging.error("Incremental mode needs a previous dataset with a stamp_url column. Run a full crawl first.")
+        return
+    
+    discovered = set()
+    added_frames = []
+    changed_frames = []
+    crawled_routes = []
+    
+    logging.info("=" * 60)
+    logging.info(f"Incremental crawl of routes: {', '.join(route.upper() for route in routes)}")
+    logging.info("=" * 60)
+    
+    executor = None
+    if args.concurrency > 1:
+        # All routes re-crawled at once under one shared per-host budget
+        scrapers, executor = create_route_scrapers(routes, args.concurrency, cache=cache, image_store=image_store)
+    else:
+        scrapers = [PilgrimStampScraper(route, cache=cache, image_store=image_store) for route in routes]
+    
+    async def crawl_all():
+        return await asyncio.gather(*(crawl_route_incremental(scraper, previous_df) for scraper in scrapers))
+    
+    try:
+        results = asyncio.run(crawl_all())
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
+        image_store.save()
+    
+    for scraper, result in zip(scrapers, results):
+        if not result['discovered']:
+            # Nothing found (site unreachable?): leave this route's rows untouched
+            logging.warning(f"No stamp locations found for {scraper.route_name}; keeping previous rows")
+            continue
+        
+        crawled_routes.append(scraper.route_name)
+        discovered |= result['discovered']
+        if result['added']:
+            added_frames.append(scraper.compile_data(result['added']))
+        if result['modified']:
+            changed_frames.append(scraper.compile_data(result['modified']))
+    
+    empty = pd.DataFrame(columns=previous_df.columns)
+    added_df = pd.concat(added_frames, ignore_index=True) if added_frames else empty
+    changed_df = pd.concat(changed_frames, ignore_index=True) if changed_frames else empty
+    
+    merged_df, changeset = merge_dataset(previous_df, discovered, added_df, changed_df, crawled_routes)
+    
+    # The merged rows span all routes, so any scraper instance can export them
+    exporter = PilgrimStampScraper(routes[-1], image_store=image_store)
+    if exporter.export_data(merged_df, base_filename):
+        logging.info(f"✓ Merged dataset exported to {base_filename}.xlsx and {base_filename}.csv ({len(merged_df)} stamps)")
+    else:
+        logging.error("Failed to export merged dataset")
+        return
+    write_changeset(changeset, args.changeset_path)
+    
+    RATE_LIMITER.log_stats()
+    cache.log_stats()
+    image_store.log_stats()
+
 def main():
     """Main execution function."""
+    args = parse_arguments()
     setup_logging()
     logging.info("Starting Pilgrim Stamp Scraper")
     
+    image_store = None
     try:
         # Validate category translations before starting
         from utils import validate_category_translations
@@ -35,114 +318,74 @@ def main():
             logging.error("Category translation validation failed. Exiting.")
             return
         
-        # Define routes to scrape
-        routes = ["navarro", "frances"]
+        # Pace every request to the stamp site through the shared token bucket
+        RATE_LIMITER.configure(urlparse(BASE_URL).netloc, args.rate, args.burst)
+        
+        # Content-addressed image store shared by all routes; drop
+        # half-written images left by a killed run
+        image_store = ImageStore('images/stamp_images')
+        remove_partial_downloads(image_store.directory)
+        
+        # Persistent response cache shared by all routes
+        cache = HttpCache(args.cache_path, args.cache_mode)
+        
+        # Routes to scrape, from the route registry
+        routes = args.routes
+        base_filename = "data/pilgrim_stamps"
+        
+        if args.incremental:
+            run_incremental(args, cache, image_store, routes, base_filename)
+            return
+        
+        # Crawl frontier and result journal; a fresh run starts from scratch
+        state = CrawlState(args.state_path)
+        if args.resume:
+            logging.info("Resuming previous crawl")
+            state.log_summary()
+        else:
+            state.reset()
+        
         all_scraped_data = []
         
-        for route in routes:
+        if args.concurrency > 1:
+            # Async crawl: all routes at once, towns, stamp pages and images fetched
+            # concurrently under one per-host budget shared by every route
             logging.info("=" * 60)
-            logging.info(f"Processing route: {route.upper()}")
+            logging.info(f"Processing routes: {', '.join(route.upper() for route in routes)}")
             logging.info("=" * 60)
             
-            # Initialize scraper for this route
-            scraper = PilgrimStampScraper(route)
-            
-            # Step 1: Get all town links for this route
-            logging.info(f"Step 1: Extracting town links from {scraper.route_name} main page")
-            logging.info("=" * 60)
-            
-            town_links = scraper.get_town_links()
-            if not town_links:
-                logging.warning(f"No town links found for {scraper.route_name}. Continuing to next route.")
-                continue
-            
-            logging.info(f"✓ Found {len(town_links)} towns to process for {scraper.route_name}")
-            
-            # Step 2: Get stamp locations for each town in this route
-            logging.info(f"Step 2: Extracting stamp location links from each town in {scraper.route_name}")
-            logging.info("=" * 60)
-            
-            town_stamp_locations = scraper.get_stamp_locations_by_town(town_links)
-            if not town_stamp_locations:
-                logging.warning(f"No stamp locations found for {scraper.route_name}. Continuing to next route.")
-                continue
-            
-            total_stamp_locations = sum(len(locations) for locations in town_stamp_locations.values())
-            logging.info(f"✓ Found {total_stamp_locations} total stamp locations across all towns in {scraper.route_name}")
-            
-            # Step 3: Scrape each stamp location and download images for this route
-            logging.info(f"Step 3: Scraping stamp location data and downloading images for {scraper.route_name}")
-            logging.info("=" * 60)
-            
-            route_scraped_data = []
-            processed_count = 0
-            failed_count = 0
-            total_processed = 0
-            
-            for town_name, stamp_urls in town_stamp_locations.items():
-                logging.info(f"Processing stamp locations for town: {town_name} ({len(stamp_urls)} locations)")
+            route_results = asyncio.run(crawl_routes(
+                routes, concurrency=args.concurrency, cache=cache, state=state, image_store=image_store
+            ))
+            image_store.save()
+            for route in routes:
+                all_scraped_data.extend(route_results[route])
+        else:
+            for route in routes:
+                logging.info("=" * 60)
+                logging.info(f"Processing route: {route.upper()}")
+                logging.info("=" * 60)
                 
-                for i, stamp_url in enumerate(stamp_urls, 1):
-                    total_processed += 1
-                    try:
-                        logging.info(f"  [{total_processed}/{total_stamp_locations}] Processing: {stamp_url.split('/')[-1]}")
-                        
-                        # Add rate limiting delay between requests
-                        if i > 1:  # Don't delay for the first request
-                            time.sleep(1)
-                        
-                        # Scrape the stamp location
-                        stamp_data = scraper.scrape_stamp_location(stamp_url)
-                        if stamp_data:
-                            # Download the image
-                            import os
-                            from utils import sanitize_filename
-                            
-                            image_filename = os.path.basename(stamp_data['image_url'])
-                            safe_filename = sanitize_filename(image_filename)
-                            local_image_path = os.path.join('images', 'stamp_images', safe_filename)
-                            
-                            if scraper.download_stamp_image(stamp_data['image_url'], local_image_path):
-                                # Update the stamp data with local image path and town name
-                                stamp_data['local_image_path'] = local_image_path
-                                stamp_data['town_name'] = town_name  # Add the town name from the dictionary
-                                route_scraped_data.append(stamp_data)
-                                processed_count += 1
-                                logging.info(f"    ✓ Successfully processed: {stamp_data['place_name']}")
-                            else:
-                                logging.warning(f"    ⚠ Failed to download image for: {stamp_data['place_name']}")
-                                failed_count += 1
-                        else:
-                            logging.warning(f"    ⚠ Failed to scrape stamp location: {stamp_url}")
-                            failed_count += 1
-                            
-                    except Exception as e:
-                        logging.error(f"    ✗ Error processing stamp location {stamp_url}: {e}")
-                        failed_count += 1
-                        continue
+                # Initialize scraper for this route
+                scraper = PilgrimStampScraper(route, cache=cache, state=state, image_store=image_store)
+                if args.image_workers > 0:
+                    with ImageDownloadPool(args.image_workers) as image_pool:
+                        route_scraped_data = scrape_route(scraper, image_pool)
+                    image_pool.log_stats()
+                else:
+                    route_scraped_data = scrape_route(scraper)
+                image_store.save()
                 
-                # Add 5-second delay after completing each town
-                logging.info(f"Completed town: {town_name}. Waiting 5 seconds before next town...")
-                time.sleep(5)
-            
-            logging.info(f"✓ Successfully processed {processed_count} stamp locations for {scraper.route_name}")
-            if failed_count > 0:
-                logging.warning(f"⚠ Failed to process {failed_count} stamp locations for {scraper.route_name}")
-            
-            # Add route data to overall collection
-            all_scraped_data.extend(route_scraped_data)
-            
-            # Add delay between routes to be respectful
-            if route != routes[-1]:  # Not the last route
-                logging.info("Waiting 5 seconds before processing next route...")
-                time.sleep(5)
+                # Add route data to overall collection
+                all_scraped_data.extend(route_scraped_data)
         
         # Step 4: Compile all data into DataFrame
         logging.info("=" * 60)
         logging.info("Step 4: Compiling all route data into DataFrame")
         logging.info("=" * 60)
         
-        # Use the last scraper instance to compile data (they all have the same method)
+        # Records carry their own route, so any scraper instance can compile them
+        scraper = PilgrimStampScraper(routes[-1], image_store=image_store)
         df = scraper.compile_data(all_scraped_data)
         if df.empty:
             logging.error("Failed to compile data. Exiting.")
@@ -155,7 +398,6 @@ def main():
         logging.info("Step 5: Exporting data to Excel and CSV")
         logging.info("=" * 60)
         
-        base_filename = "data/pilgrim_stamps"
         if scraper.export_data(df, base_filename):
             logging.info(f"✓ Successfully exported data to:")
             logging.info(f"  - {base_filename}.xlsx")
@@ -176,8 +418,7 @@ def main():
         # Calculate route-specific statistics
         route_stats = {}
         for route in routes:
-            route_scraper = PilgrimStampScraper(route)
-            route_name = route_scraper.route_name
+            route_name = get_route(route).name
             route_data = [item for item in all_scraped_data if 'route' in item and item['route'] == route_name]
             route_stats[route] = {
                 'name': route_name,
@@ -197,7 +438,14 @@ def main():
         
         logging.info(f"\nOutput Files:")
         logging.info(f"  - Data exported to: {base_filename}.xlsx and {base_filename}.csv")
-        logging.info(f"  - Images saved to: images/stamp_images/")
+        logging.info(f"  - Images saved to: {image_store.directory}/ (manifest: {image_store.manifest_path})")
+        
+        # Throttling report, to tune --rate/--burst against the site's tolerance
+        logging.info(f"\nRate Limiting:")
+        RATE_LIMITER.log_stats()
+        cache.log_stats()
+        image_store.log_stats()
+        state.log_summary()
         
         # Success rate analysis
         if total_processed > 0:
@@ -218,6 +466,10 @@ def main():
         logging.error(f"Unexpected error in main execution: {e}")
         logging.error("Pilgrim Stamp Scraper failed")
         raise
+    finally:
+        # Images stored since the last autosave stay reachable on the next run
+        if image_store is not None:
+            image_store.save()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+HTML parser backends for the Pilgrim Stamp Scraper.
+Each backend extracts only the pieces the scraper needs from a page: links,
+headings, image sources and the category block. The lxml backend answers
+these with XPath on libxml2's C parser; the BeautifulSoup backend is the
+original pure-Python path and is kept as a fallback and reference.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+HEADING_TAGS = ['h1', 'h2', 'h3']
+CATEGORY_CLASS = 'element-itemcategory'
+
+def _unique(values: List[str]) -> List[str]:
+    """Remove duplicates, keeping document order."""
+    return list(dict.fromkeys(values))
+
+class SoupParser:
+    """BeautifulSoup backend using Python's built-in html.parser."""
+
+    name = 'html.parser'
+
+    def extract_links(self, html: str, pattern: str) -> List[str]:
+        """
+        Extract hrefs containing a pattern.
+
+        Args:
+            html: Page HTML
+            pattern: Substring the href must contain
+
+        Returns:
+            Unique raw href values in document order
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        return _unique([a_tag['href'] for a_tag in soup.find_all('a', href=True) if pattern in a_tag['href']])
+
+    def extract_stamp_page(self, html: str) -> Dict:
+        """
+        Extract the fields of a stamp location page.
+
+        Args:
+            html: Page HTML
+
+        Returns:
+            Dictionary with place_name (first non-empty h1/h2/h3, else title, else None),
+            image_srcs (all img src values), category_classes (class list of the
+            categories div, or None if missing) and categories (link texts in it)
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+
+        place_name = None
+        for heading_tag in HEADING_TAGS:
+            heading = soup.find(heading_tag)
+            if heading and heading.text.strip():
+                place_name = heading.text.strip()
+                break
+        if not place_name:
+            title_tag = soup.find('title')
+            if title_tag and title_tag.text.strip():
+                place_name = title_tag.text.strip()
+
+        image_srcs = [img['src'] for img in soup.find_all('img', src=True)]
+
+        category_classes = None
+        categories = []
+        # Flexible match for variations like 'element element-itemcategory first last'
+        categories_div = soup.find('div', class_=lambda x: x and CATEGORY_CLASS in x)
+        if categories_div:
+            category_classes = categories_div.get('class', [])
+            for link in categories_div.find_all('a', href=True):
+                category_text = link.text.strip()
+                if category_text:
+                    categories.append(category_text)
+
+        return {
+            'place_name': place_name,
+            'image_srcs': image_srcs,
+            'category_classes': category_classes,
+            'categories': categories,
+        }
+
+class LxmlParser:
+    """lxml backend answering each lookup with a targeted XPath query."""
+
+    name = 'lxml'
+
+    def __init__(self):
+        if not LXML_AVAILABLE:
+            raise ImportError("lxml is not installed")
+        self._parser = lxml.html.HTMLParser(encoding='utf-8')
+
+    def _document(self, html: str):
+        """Parse a page into an lxml document, or None if it is empty."""
+        try:
+            return lxml.html.document_fromstring(html.encode('utf-8'), parser=self._parser)
+        except ParserError:
+            return None
+
+    def extract_links(self, html: str, pattern: str) -> List[str]:
+        """
+        Extract hrefs containing a pattern.
+
+        Args:
+            html: Page HTML
+            pattern: Substring the href must contain
+
+        Returns:
+            Unique raw href values in document order
+        """
+        doc = self._document(html)
+        if doc is None:
+            return []
+        return _unique([str(href) for href in doc.xpath('//a/@href') if pattern in href])
+
+    def extract_stamp_page(self, html: str) -> Dict:
+        """
+        Extract the fields of a stamp location page.
+
+        Args:
+            html: Page HTML
+
+        Returns:
+            Same dictionary as SoupParser.extract_stamp_page
+        """
+        result = {'place_name': None, 'image_srcs': [], 'category_classes': None, 'categories': []}
+        doc = self._document(html)
+        if doc is None:
+            return result
+
+        for heading_tag in HEADING_TAGS:
+            heading = doc.find(f'.//{heading_tag}')
+            if heading is not None and heading.text_content().strip():
+                result['place_name'] = heading.text_content().strip()
+                break
+        if not result['place_name']:
+            title_tag = doc.find('.//title')
+            if title_tag is not None and title_tag.text_content().strip():
+                result['place_name'] = title_tag.text_content().strip()
+
+        result['image_srcs'] = [str(src) for src in doc.xpath('//img/@src')]
+
+        categories_divs = doc.xpath(f"//div[contains(@class, '{CATEGORY_CLASS}')]")
+        if categories_divs:
+            categories_div = categories_divs[0]
+            result['category_classes'] = categories_div.get('class', '').split()
+            for link in categories_div.xpath('.//a[@href]'):
+                category_text = link.text_content().strip()
+                if category_text:
+                    result['categories'].append(category_text)
+
+        return result
+
+PARSERS = {
+    'lxml': LxmlParser,
+    'html.parser': SoupParser,
+}
+
+def get_parser(name: Optional[str] = None):
+    """
+    Create a parser backend.
+
+    Args:
+        name: "lxml" or "html.parser"; None picks lxml when installed
+
+    Returns:
+        Parser instance
+    """
+    if name is None:
+        name = 'lxml' if LXML_AVAILABLE else 'html.parser'
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser backend: {name}. Use one of {', '.join(PARSERS)}")
+    if name == 'lxml' and not LXML_AVAILABLE:
+        logging.warning("lxml is not installed, falling back to html.parser")
+        name = 'html.parser'
+    return PARSERS[name]()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Route registry for the Pilgrim Stamp Scraper.
+Each Camino route on lossellosdelcamino.com is described by its menu page
+and the link patterns of its town and stamp pages, so adding a route is a
+registry entry rather than a code change in the scraper.
+"""
+
+from typing import Dict, List, NamedTuple
+
+class RouteConfig(NamedTuple):
+    """Declarative description of one route on the stamp site."""
+
+    key: str            # Short name used on the command line and in the crawl state
+    name: str           # Display name written to the route column
+    menu_path: str      # Path of the route menu page listing its towns
+    town_pattern: str   # Substring identifying town (category) links
+    stamp_pattern: str  # Substring identifying stamp location (item) links
+
+def _site_route(key: str, name: str, menu_path: str) -> RouteConfig:
+    """Build a route following the site's usual menu-camino-<key> link layout."""
+    return RouteConfig(
+        key=key,
+        name=name,
+        menu_path=menu_path,
+        town_pattern=f"menu-camino-{key}/category/",
+        stamp_pattern=f"menu-camino-{key}/item/",
+    )
+
+ROUTES: Dict[str, RouteConfig] = {
+    'navarro': _site_route('navarro', 'Camino Navarro', '/index.php/ruta-desde-roncesvalles/menu-camino-navarro'),
+    'frances': _site_route('frances', 'Camino Francés', '/index.php/ruta-del-camino-frances/menu-camino-frances'),
+}
+
+def register_route(route: RouteConfig) -> None:
+    """
+    Add a route to the registry (or replace one with the same key).
+
+    Args:
+        route: Route description
+    """
+    ROUTES[route.key] = route
+
+def get_route(key: str) -> RouteConfig:
+    """
+    Look up a registered route.
+
+    Args:
+        key: Route key, e.g. "navarro"
+
+    Returns:
+        RouteConfig for the route
+    """
+    if key not in ROUTES:
+        raise ValueError(f"Unknown route: {key}. Use one of {', '.join(ROUTES)}")
+    return ROUTES[key]
+
+def route_keys() -> List[str]:
+    """Keys of all registered routes, in registration order."""
+    return list(ROUTES)
@@ -5,70 +5,367 @@ Handles web scraping of pilgrim stamp locations from the Camino Navarro website.
 """
 
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import asyncio
+import functools
+import hashlib
+import os
+import random
+import threading
 import time
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
-def retry_on_any_error(max_retries=3, delay=60):
+from parsers import get_parser
+from download_pool import PARTIAL_SUFFIX
+from image_store import ImageStore
+from routes import get_route
+
+BASE_URL = "https://www.lossellosdelcamino.com"
+
+class RetryPolicy:
     """
-    Decorator to retry functions on any error with 1-minute delays.
+    Retry policy with exponential backoff, jitter and error classification.
+    
+    Only transient failures are retried: timeouts, connection errors,
+    HTTP 429 and HTTP 5xx. Other HTTP errors (404 and friends) and
+    non-HTTP errors such as parse failures are raised immediately. A
+    Retry-After header overrides the computed backoff; one asking for more
+    than max_delay fails the call at once, since retrying earlier would
+    only hit the same limit. A retry budget shared by everything using the
+    policy stops a failing site from turning a crawl into hours of waiting.
     """
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        logging.warning(f"Error occurred (attempt {attempt + 1}/{max_retries}): {e}. Waiting {delay} seconds...")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        logging.error(f"Max retries reached. Final error: {e}")
-                        raise
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
+    
+    RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+    
+    def __init__(self, max_retries: int = 3, base_delay: float = 2.0, max_delay: float = 60.0,
+                 jitter: bool = True, retry_budget: Optional[int] = 100):
+        """
+        Initialize the retry policy.
+        
+        Args:
+            max_retries: Retries per call after the first attempt
+            base_delay: Delay before the first retry in seconds, doubled on each retry
+            max_delay: Upper bound for any single delay; a longer Retry-After gives up
+            jitter: Randomize delays ("full jitter") so parallel workers do not retry in lockstep
+            retry_budget: Total retries allowed across all calls, or None for unlimited
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_budget = retry_budget
+        self.retries_used = 0
+        self._lock = threading.Lock()
+    
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Classify an error as transient (worth retrying) or fatal.
+        
+        Args:
+            error: Exception raised by the wrapped call
+            
+        Returns:
+            True if the call may succeed when repeated
+        """
+        if isinstance(error, requests.HTTPError):
+            response = error.response
+            return response is not None and response.status_code in self.RETRYABLE_STATUS_CODES
+        # A body cut off mid-stream is as transient as a dropped connection
+        return isinstance(error, (requests.Timeout, requests.ConnectionError,
+                                  requests.exceptions.ChunkedEncodingError))
+    
+    def get_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Compute how long to wait before the next attempt.
+        
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            error: Exception raised by that attempt
+            
+        Returns:
+            Delay in seconds, longer than max_delay only for a Retry-After
+            the caller will not wait for
+        """
+        retry_after = self._parse_retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+    
+    @staticmethod
+    def _parse_retry_after(error: Exception) -> Optional[float]:
+        """Read a Retry-After header (seconds or HTTP date) from an HTTP error."""
+        response = getattr(error, 'response', None)
+        if response is None:
+            return None
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    
+    def _consume_budget(self) -> bool:
+        """Take one retry from the budget, returning False once it is spent."""
+        with self._lock:
+            if self.retry_budget is not None and self.retries_used >= self.retry_budget:
+                return False
+            self.retries_used += 1
+            return True
+    
+    def call(self, func, *args, **kwargs):
+        """
+        Call func, retrying transient failures according to the policy.
+        
+        An error that already went through a retry loop further down the
+        call stack is re-raised untouched, so decorated methods calling each
+        other never multiply their retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if getattr(e, '_retry_handled', False) or not self.is_retryable(e):
+                    raise
+                if attempt >= self.max_retries:
+                    logging.error(f"Max retries reached. Final error: {e}")
+                    e._retry_handled = True
+                    raise
+                delay = self.get_delay(attempt, e)
+                if delay > self.max_delay:
+                    logging.error(f"Server asked to retry in {delay:.0f}s, more than {self.max_delay:.0f}s. Final error: {e}")
+                    e._retry_handled = True
+                    raise
+                if not self._consume_budget():
+                    logging.error(f"Retry budget of {self.retry_budget} exhausted. Final error: {e}")
+                    e._retry_handled = True
+                    raise
+                logging.warning(f"Error occurred (attempt {attempt + 1}/{self.max_retries + 1}): {e}. Waiting {delay:.1f} seconds...")
+                time.sleep(delay)
+
+def retry_with_policy(func):
+    """
+    Decorator retrying a scraper method with the instance's retry_policy.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return self.retry_policy.call(func, self, *args, **kwargs)
+    return wrapper
 
 class PilgrimStampScraper:
     """Main scraper class for pilgrim stamp locations."""
     
-    def __init__(self, route: str = "navarro"):
+    def __init__(self, route: str = "navarro", rate_limiter=None, retry_policy: Optional[RetryPolicy] = None,
+                 cache=None, state=None, parser: Optional[str] = None, image_store=None):
         """
         Initialize the scraper with base configuration.
         
         Args:
-            route: Route to scrape - "navarro" or "frances"
+            route: Key of a route in routes.ROUTES, e.g. "navarro" or "frances"
+            rate_limiter: utils.RateLimiter applied to every request (defaults to the shared one)
+            retry_policy: RetryPolicy for page requests (defaults to a fresh policy per scraper)
+            cache: Optional http_cache.HttpCache for pages and images
+            state: Optional crawl_state.CrawlState recording progress for resumable crawls
+            parser: HTML parser backend, "lxml" or "html.parser" (defaults to lxml when installed)
+            image_store: image_store.ImageStore for downloaded images (defaults to images/stamp_images)
         """
-        self.base_url = "https://www.lossellosdelcamino.com"
+        self.base_url = BASE_URL
         self.route = route
         
-        # Construct the appropriate URL based on route
-        if route == "navarro":
-            self.main_url = f"{self.base_url}/index.php/ruta-desde-roncesvalles/menu-camino-navarro"
-            self.route_name = "Camino Navarro"
-        elif route == "frances":
-            self.main_url = f"{self.base_url}/index.php/ruta-del-camino-frances/menu-camino-frances"
-            self.route_name = "Camino Francés"
-        else:
-            raise ValueError(f"Unknown route: {route}. Use 'navarro' or 'frances'")
+        # Menu URL, display name and link patterns come from the route registry
+        route_config = get_route(route)
+        self.main_url = f"{self.base_url}{route_config.menu_path}"
+        self.route_name = route_config.name
+        self.town_link_pattern = route_config.town_pattern
+        self.stamp_link_pattern = route_config.stamp_pattern
         
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        
+        from utils import RATE_LIMITER
+        self.rate_limiter = rate_limiter or RATE_LIMITER
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.cache = cache
+        self.state = state
+        self.parser = get_parser(parser)
+        self.image_store = image_store or ImageStore()
     
-    @retry_on_any_error(max_retries=3, delay=60)
+    @retry_with_policy
     def _make_request(self, url: str, **kwargs):
         """
-        Make HTTP request with retry logic for any errors.
+        Make HTTP request, retrying transient errors according to retry_policy.
         """
-        response = self.session.get(url, **kwargs)
+        response = self._get(url, **kwargs)
         response.raise_for_status()
         return response
+    
+    def _send(self, url: str, **kwargs):
+        """
+        Send a rate-limited GET request over the network.
+        """
+        self.rate_limiter.acquire(url)
+        return self.session.get(url, **kwargs)
+    
+    def _get(self, url: str, **kwargs):
+        """
+        GET a URL through the response cache when one is configured.
+        """
+        if self.cache is not None:
+            return self.cache.get(url, self._send, **kwargs)
+        return self._send(url, **kwargs)
+        
+    def _parse_town_links(self, html: str) -> List[str]:
+        """
+        Extract unique town category links from a route menu page.
+        
+        Args:
+            html: HTML content of the route menu page
+            
+        Returns:
+            List of town URLs
+        """
+        # Find all links that contain the route-specific pattern
+        town_links = []
+        for href in self.parser.extract_links(html, self.town_link_pattern):
+            full_url = urljoin(self.base_url, href)
+            if full_url not in town_links:
+                town_links.append(full_url)
+                logging.info(f"Found town link: {full_url}")
+        return town_links
+    
+    def _parse_stamp_links(self, html: str) -> List[str]:
+        """
+        Extract unique stamp location links from a town page.
+        
+        Args:
+            html: HTML content of the town page
+            
+        Returns:
+            List of stamp location URLs
+        """
+        # Find all links that contain the route-specific pattern
+        hrefs = self.parser.extract_links(html, self.stamp_link_pattern)
+        return list(dict.fromkeys(urljoin(self.base_url, href) for href in hrefs))
+    
+    def _parse_stamp_page(self, html: str, stamp_url: str) -> Optional[Dict]:
+        """
+        Extract place name, image URL and categories from a stamp location page.
+        
+        Args:
+            html: HTML content of the stamp location page
+            stamp_url: URL the page was fetched from
+            
+        Returns:
+            Dictionary with place name, image URL, categories, and stamp URL, or None if incomplete
+        """
+        fields = self.parser.extract_stamp_page(html)
+        
+        # Main heading (h1, h2 or h3), falling back to the page title
+        place_name = fields['place_name']
+        if not place_name:
+            logging.warning(f"Could not extract place name from {stamp_url}")
+            return None
+        
+        # Extract image URL - look for img tags with stamp images
+        image_url = None
+        image_srcs = fields['image_srcs']
+        for src in image_srcs:
+            # Check if this looks like a stamp image (contains media/zoo/images)
+            if 'media/zoo/images' in src:
+                image_url = urljoin(self.base_url, src)
+                break
+        
+        # If no media/zoo/images found, try to find any image
+        if not image_url:
+            # Get the first image that's not a logo or navigation element
+            for src in image_srcs:
+                # Skip common non-stamp images
+                if any(skip in src.lower() for skip in ['logo', 'nav', 'header', 'footer', 'banner']):
+                    continue
+                image_url = urljoin(self.base_url, src)
+                break
+        
+        if not image_url:
+            logging.warning(f"Could not extract image URL from {stamp_url}")
+            return None
+        
+        # Categories from the element-itemcategory div
+        categories = fields['categories']
+        if fields['category_classes'] is not None:
+            # Log the actual class attributes found for debugging
+            logging.debug(f"Found categories div with classes: {fields['category_classes']}")
+            
+            if categories:
+                logging.info(f"Found {len(categories)} categories: {', '.join(categories)}")
+            else:
+                logging.warning(f"⚠️  Categories div found but no category text extracted for: {place_name}")
+        else:
+            logging.warning(f"⚠️  NO CATEGORIES FOUND for: {place_name} - missing categories div")
+
+        result = {
+            'place_name': place_name,
+            'image_url': image_url,
+            'stamp_url': stamp_url,
+            'categories': categories
+        }
+        
+        logging.info(f"Successfully extracted: {place_name} with image: {image_url}")
+        if categories:
+            logging.info(f"Categories: {', '.join(categories)}")
+        else:
+            logging.warning(f"⚠️  NO CATEGORIES AVAILABLE for: {place_name}")
         
+        return result
+    
+    def _resumed_town_stamps(self, town_url: str) -> Optional[List[str]]:
+        """Stamp links of a town already crawled in a previous run, or None."""
+        if self.state is None:
+            return None
+        stamp_links = self.state.get_town_stamps(self.route, town_url)
+        if stamp_links is not None:
+            logging.info(f"Resuming town {town_url}: {len(stamp_links)} stamp locations from crawl state")
+        return stamp_links
+    
+    def _record_town(self, town_url: str, town_name: str, stamp_links: Optional[List[str]],
+                     error: Optional[str] = None) -> None:
+        """Journal a town page as done (with its stamp links) or failed."""
+        if self.state is None:
+            return
+        if stamp_links is None:
+            self.state.mark_town_failed(self.route, town_url, error or 'unknown error')
+        else:
+            self.state.record_town(self.route, town_url, town_name, stamp_links)
+    
+    def _resumed_stamp(self, stamp_url: str, town_name: str) -> Optional[Dict]:
+        """Record of a stamp location completed in a previous run, or None."""
+        if self.state is None:
+            return None
+        record = self.state.get_stamp_record(self.route, town_name, stamp_url)
+        if record:
+            logging.info(f"    ✓ Already processed, skipping: {record['place_name']}")
+        return record
+    
+    def _record_stamp(self, stamp_url: str, town_name: str, record: Optional[Dict],
+                      error: Optional[str] = None) -> None:
+        """Journal the outcome of a stamp location."""
+        if self.state is not None:
+            self.state.record_stamp(self.route, town_name, stamp_url, record, error)
+    
     def get_town_links(self) -> List[str]:
         """
         Extract all town category links from the main page.
@@ -76,25 +373,20 @@ class PilgrimStampScraper:
         Returns:
             List of town URLs
         """
+        if self.state is not None:
+            resumed_town_links = self.state.get_towns(self.route)
+            if resumed_town_links:
+                logging.info(f"✓ Resuming {self.route_name} with {len(resumed_town_links)} town links from crawl state")
+                return resumed_town_links
+        
         try:
             logging.info(f"Fetching main page for {self.route_name}: {self.main_url}")
             response = self._make_request(self.main_url, timeout=30)
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find all links that contain the route-specific pattern
-            route_pattern = f"menu-camino-{self.route}/category/"
-            town_links = set()  # Use set to automatically remove duplicates
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                if route_pattern in href:
-                    full_url = urljoin(self.base_url, href)
-                    town_links.add(full_url)  # Add to set (duplicates automatically ignored)
-                    logging.info(f"Found town link: {full_url}")
-            
-            # Convert set back to list for return
-            unique_town_links = list(town_links)
+            unique_town_links = self._parse_town_links(response.text)
             logging.info(f"✓ Total unique town links found for {self.route_name}: {len(unique_town_links)}")
+            if self.state is not None:
+                self.state.add_towns(self.route, unique_town_links)
             return unique_town_links
             
         except Exception as e:
@@ -111,60 +403,48 @@ class PilgrimStampScraper:
         Returns:
             Dictionary mapping town names to lists of stamp location URLs
         """
+        from utils import extract_town_name_from_url
+        
         town_stamp_locations = {}
         
         for i, town_url in enumerate(town_urls, 1):
+            # Extract town name from URL for the dictionary key
+            town_name = extract_town_name_from_url(town_url)
+            
+            resumed_stamp_links = self._resumed_town_stamps(town_url)
+            if resumed_stamp_links is not None:
+                town_stamp_locations[town_name] = resumed_stamp_links
+                continue
+            
             try:
                 logging.info(f"Processing town {i}/{len(town_urls)} for {self.route_name}: {town_url}")
                 
-                # Add rate limiting delay between requests
-                if i > 1:  # Don't delay for the first request
-                    time.sleep(1)
-                
                 response = self._make_request(town_url)
                 response.raise_for_status()
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Find all links that contain the route-specific pattern
-                route_pattern = f"menu-camino-{self.route}/item/"
-                stamp_links = set()  # Use set to avoid duplicates
-                for a_tag in soup.find_all('a', href=True):
-                    href = a_tag['href']
-                    if route_pattern in href:
-                        full_url = urljoin(self.base_url, href)
-                        stamp_links.add(full_url)
-                
-                # Convert set to list
-                unique_stamp_links = list(stamp_links)
-                
-                # Extract town name from URL for the dictionary key
-                from utils import extract_town_name_from_url
-                town_name = extract_town_name_from_url(town_url)
+                unique_stamp_links = self._parse_stamp_links(response.text)
                 
                 town_stamp_locations[town_name] = unique_stamp_links
+                self._record_town(town_url, town_name, unique_stamp_links)
                 logging.info(f"Found {len(unique_stamp_links)} stamp locations for {town_name}")
                 
             except requests.RequestException as e:
                 logging.error(f"Error fetching town page {town_url}: {e}")
                 # Add empty list for failed towns to maintain structure
-                from utils import extract_town_name_from_url
-                town_name = extract_town_name_from_url(town_url)
                 town_stamp_locations[town_name] = []
+                self._record_town(town_url, town_name, None, str(e))
                 
             except Exception as e:
                 logging.error(f"Unexpected error processing town {town_url}: {e}")
                 # Add empty list for failed towns to maintain structure
-                from utils import extract_town_name_from_url
-                town_name = extract_town_name_from_url(town_url)
                 town_stamp_locations[town_name] = []
+                self._record_town(town_url, town_name, None, str(e))
         
         total_stamp_locations = sum(len(locations) for locations in town_stamp_locations.values())
         logging.info(f"Total stamp locations found across all towns: {total_stamp_locations}")
         
         return town_stamp_locations
     
-    @retry_on_any_error(max_retries=3, delay=60)
     def scrape_stamp_location(self, stamp_url: str) -> Optional[Dict]:
         """
         Scrape individual stamp location page for place name, image, and categories.
@@ -181,173 +461,242 @@ class PilgrimStampScraper:
             response = self._make_request(stamp_url)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract place name - try multiple selectors
-            place_name = None
+            return self._parse_stamp_page(response.text, stamp_url)
             
-            # Try to find the main heading (h1, h2, or h3)
-            for heading_tag in ['h1', 'h2', 'h3']:
-                heading = soup.find(heading_tag)
-                if heading and heading.text.strip():
-                    place_name = heading.text.strip()
-                    break
+        except requests.RequestException as e:
+            logging.error(f"Error fetching stamp location page {stamp_url}: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error scraping stamp location {stamp_url}: {e}")
+            return None
+    
+    def _download_image(self, image_url: str, temp_path: str) -> Optional[Dict]:
+        """
+        Stream an image into a temporary file, hashing it on the way.
+        
+        Args:
+            image_url: URL of the stamp image
+            temp_path: File to write; it is removed again if the download fails
             
-            # If no heading found, try to find title attribute or other text elements
-            if not place_name:
-                title_tag = soup.find('title')
-                if title_tag and title_tag.text.strip():
-                    place_name = title_tag.text.strip()
+        Returns:
+            Dictionary with size, sha256 and content_type, or None if failed
+        """
+        # Ensure the directory exists
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        
+        try:
+            return self._stream_image(image_url, temp_path)
+        except requests.RequestException as e:
+            logging.error(f"Error downloading image {image_url}: {e}")
+        except Exception as e:
+            logging.error(f"Unexpected error downloading image {image_url}: {e}")
+        return None
+    
+    @retry_with_policy
+    def _stream_image(self, image_url: str, temp_path: str) -> Optional[Dict]:
+        """
+        Download an image once, raising transient errors for the retry policy.
+        
+        Returns:
+            Dictionary with size, sha256 and content_type, or None if the
+            response is not a usable image
+        """
+        logging.info(f"Downloading image: {image_url}")
+        completed = False
+        try:
+            # Download the image with streaming for large files
+            response = self._get(image_url, stream=True, timeout=30)
+            response.raise_for_status()
             
-            if not place_name:
-                logging.warning(f"Could not extract place name from {stamp_url}")
+            # Check if it's actually an image
+            content_type = response.headers.get('content-type', '')
+            if not content_type.startswith('image/'):
+                logging.warning(f"URL does not point to an image: {content_type}")
                 return None
             
-            # Extract image URL - look for img tags with stamp images
-            image_url = None
-            
-            # Look for images that might be stamp images
-            img_tags = soup.find_all('img', src=True)
-            for img in img_tags:
-                src = img['src']
-                # Check if this looks like a stamp image (contains media/zoo/images)
-                if 'media/zoo/images' in src:
-                    image_url = urljoin(self.base_url, src)
-                    break
-            
-            # If no media/zoo/images found, try to find any image
-            if not image_url and img_tags:
-                # Get the first image that's not a logo or navigation element
-                for img in img_tags:
-                    src = img['src']
-                    # Skip common non-stamp images
-                    if any(skip in src.lower() for skip in ['logo', 'nav', 'header', 'footer', 'banner']):
-                        continue
-                    image_url = urljoin(self.base_url, src)
-                    break
-            
-            if not image_url:
-                logging.warning(f"Could not extract image URL from {stamp_url}")
+            # Check file size (skip if too large, likely not an image)
+            content_length = response.headers.get('content-length')
+            if content_length and int(content_length) > 10 * 1024 * 1024:  # 10MB limit
+                logging.warning(f"File too large ({int(content_length)} bytes), likely not an image")
                 return None
             
-            # Extract categories from the categories div
-            categories = []
-            # Use a more flexible selector to catch variations like 'element element-itemcategory first last'
-            categories_div = soup.find('div', class_=lambda x: x and 'element-itemcategory' in x)
-            if categories_div:
-                # Log the actual class attributes found for debugging
-                class_attrs = categories_div.get('class', [])
-                logging.debug(f"Found categories div with classes: {class_attrs}")
-                
-                # Find all links within the categories div
-                category_links = categories_div.find_all('a', href=True)
-                for link in category_links:
-                    category_text = link.text.strip()
-                    if category_text:
-                        categories.append(category_text)
-                
-                if categories:
-                    logging.info(f"Found {len(categories)} categories: {', '.join(categories)}")
-                else:
-                    logging.warning(f"⚠️  Categories div found but no category text extracted for: {place_name}")
-            else:
-                logging.warning(f"⚠️  NO CATEGORIES FOUND for: {place_name} - missing categories div")
-
-            result = {
-                'place_name': place_name,
-                'image_url': image_url,
-                'stamp_url': stamp_url,
-                'categories': categories
-            }
-            
-            logging.info(f"Successfully extracted: {place_name} with image: {image_url}")
-            if categories:
-                logging.info(f"Categories: {', '.join(categories)}")
-            else:
-                logging.warning(f"⚠️  NO CATEGORIES AVAILABLE for: {place_name}")
+            # Stream into the temp file, hashing as we go, so an interrupted
+            # download never leaves a truncated image under a final name
+            hasher = hashlib.sha256()
+            file_size = 0
+            with open(temp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    if chunk:  # Filter out keep-alive chunks
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        file_size += len(chunk)
             
-            return result
+            if file_size == 0:
+                logging.error(f"Empty image response: {image_url}")
+                return None
             
-        except requests.RequestException as e:
-            logging.error(f"Error fetching stamp location page {stamp_url}: {e}")
-            return None
-        except Exception as e:
-            logging.error(f"Unexpected error scraping stamp location {stamp_url}: {e}")
+            completed = True
+            return {'size': file_size, 'sha256': hasher.hexdigest(), 'content_type': content_type}
+        finally:
+            # Never leave a partial file behind, whatever went wrong
+            if not completed:
+                self._discard(temp_path)
+    
+    @staticmethod
+    def _discard(path: str) -> None:
+        """Remove a temporary file if it exists."""
+        if os.path.exists(path):
+            os.remove(path)
+    
+    def store_stamp_image(self, image_url: str, stamp_url: str) -> Optional[str]:
+        """
+        Download a stamp image into the content-addressed image store.
+        
+        Args:
+            image_url: URL of the stamp image
+            stamp_url: Stamp location page the image belongs to
+            
+        Returns:
+            Stored image path, or None if the download failed
+        """
+        # Images are not in the response cache; an offline replay reuses the stored one
+        if self.cache is not None and self.cache.mode == 'offline':
+            stored = self.image_store.lookup(stamp_url)
+            if stored and stored['image_url'] == image_url and os.path.exists(stored['path']):
+                return stored['path']
+        
+        temp_path = os.path.join(self.image_store.directory, f".{threading.get_ident()}{PARTIAL_SUFFIX}")
+        downloaded = self._download_image(image_url, temp_path)
+        if not downloaded:
             return None
+        
+        ext = self.image_store.extension(image_url, downloaded['content_type'])
+        path = self.image_store.add(temp_path, downloaded['sha256'], downloaded['size'], ext)
+        self.image_store.record(stamp_url, image_url, downloaded['sha256'])
+        logging.info(f"✓ Stored image as: {path} ({downloaded['size']} bytes)")
+        return path
     
-    def download_stamp_image(self, image_url: str, local_path: str) -> bool:
+    def local_image_path(self, image_url: str) -> str:
         """
-        Download stamp image and save to local path.
+        Build the path used for stamp images before the content-addressed store.
         
         Args:
             image_url: URL of the stamp image
-            local_path: Local file path to save the image
             
         Returns:
-            True if successful, False otherwise
+            Path inside images/stamp_images named after the sanitized image basename
         """
-        max_retries = 2
-        retry_delay = 1
+        from utils import sanitize_filename
         
-        for attempt in range(max_retries):
-            try:
-                logging.info(f"Downloading image (attempt {attempt + 1}/{max_retries}): {image_url}")
-                
-                # Ensure the directory exists
-                import os
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-                
-                # Download the image with streaming for large files
-                response = self.session.get(image_url, stream=True, timeout=30)
-                response.raise_for_status()
-                
-                # Check if it's actually an image
-                content_type = response.headers.get('content-type', '')
-                if not content_type.startswith('image/'):
-                    logging.warning(f"URL does not point to an image: {content_type}")
-                    return False
-                
-                # Check file size (skip if too large, likely not an image)
-                content_length = response.headers.get('content-length')
-                if content_length and int(content_length) > 10 * 1024 * 1024:  # 10MB limit
-                    logging.warning(f"File too large ({int(content_length)} bytes), likely not an image")
-                    return False
-                
-                # Save the image
-                with open(local_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:  # Filter out keep-alive chunks
-                            f.write(chunk)
-                
-                # Verify the file was created and has content
-                if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
-                    file_size = os.path.getsize(local_path)
-                    logging.info(f"✓ Successfully downloaded image to: {local_path} ({file_size} bytes)")
-                    return True
-                else:
-                    logging.error(f"Failed to save image to: {local_path}")
-                    if attempt < max_retries - 1:
-                        logging.info(f"Retrying in {retry_delay} seconds...")
-                        time.sleep(retry_delay)
-                        continue
-                    return False
-                    
-            except requests.RequestException as e:
-                logging.error(f"Error downloading image (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    logging.info(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    continue
-                return False
-            except Exception as e:
-                logging.error(f"Unexpected error downloading image (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    logging.info(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    continue
-                return False
+        # Extract filename from image URL and sanitize it
+        safe_filename = sanitize_filename(os.path.basename(image_url))
+        return os.path.join('images', 'stamp_images', safe_filename)
+    
+    def process_stamp_location(self, stamp_url: str, town_name: str) -> Optional[Dict]:
+        """
+        Scrape a stamp location page and download its image.
         
-        return False
+        Args:
+            stamp_url: URL of the stamp location page
+            town_name: Town the stamp location was listed under
+            
+        Returns:
+            Scraped record with town name and local image path, or None if failed
+        """
+        resumed = self._resumed_stamp(stamp_url, town_name)
+        if resumed:
+            return resumed
+        
+        stamp_data = self.scrape_stamp_location(stamp_url)
+        if not stamp_data:
+            logging.warning(f"    ⚠ Failed to scrape stamp location: {stamp_url}")
+            self._record_stamp(stamp_url, town_name, None, 'scrape failed')
+            return None
+        
+        return self._complete_stamp_record(stamp_data, town_name)
+
+    def queue_stamp_location(self, stamp_url: str, town_name: str, image_pool):
+        """
+        Scrape a stamp location page now and queue its image download.
+        
+        The calling thread moves on to the next page while a pool worker
+        downloads the image and completes the record.
+        
+        Args:
+            stamp_url: URL of the stamp location page
+            town_name: Town the stamp location was listed under
+            image_pool: download_pool.ImageDownloadPool running the downloads
+        
+        Returns:
+            Future resolving to the same value process_stamp_location returns
+        """
+        resumed = self._resumed_stamp(stamp_url, town_name)
+        if resumed:
+            return image_pool.completed(resumed)
+        
+        stamp_data = self.scrape_stamp_location(stamp_url)
+        if not stamp_data:
+            logging.warning(f"    ⚠ Failed to scrape stamp location: {stamp_url}")
+            self._record_stamp(stamp_url, town_name, None, 'scrape failed')
+            return image_pool.completed(None)
+        
+        return image_pool.submit(self._complete_stamp_record, stamp_data, town_name)
+
+    def _complete_stamp_record(self, stamp_data: Dict, town_name: str) -> Optional[Dict]:
+        """
+        Download the image of a scraped stamp and annotate the record.
+        
+        Args:
+            stamp_data: Record returned by scrape_stamp_location
+            town_name: Town the stamp location was listed under
+            
+        Returns:
+            Record with route, town name and local image path, or None if the download failed
+        """
+        stamp_url = stamp_data['stamp_url']
+        local_image_path = self.store_stamp_image(stamp_data['image_url'], stamp_url)
+        if not local_image_path:
+            logging.warning(f"    ⚠ Failed to download image for: {stamp_data['place_name']}")
+            self._record_stamp(stamp_url, town_name, None, 'image download failed')
+            return None
+        
+        # Update the stamp data with local image path, town name and route
+        stamp_data['local_image_path'] = local_image_path
+        stamp_data['town_name'] = town_name
+        stamp_data['route'] = self.route_name
+        self._record_stamp(stamp_url, town_name, stamp_data)
+        logging.info(f"    ✓ Successfully processed: {stamp_data['place_name']}")
+        return stamp_data
+    
+    def check_stamp_location(self, stamp_url: str, town_name: str):
+        """
+        Re-check a stamp location that is already in the dataset.
+        
+        The page is fetched through the response cache, so an unchanged page
+        costs a 304 and is not parsed again.
+        
+        Args:
+            stamp_url: URL of the stamp location page
+            town_name: Town the stamp location was listed under
+            
+        Returns:
+            Tuple (changed, record): (False, None) if the page is unchanged,
+            otherwise True and the fresh record (None if scraping failed)
+        """
+        try:
+            response = self._make_request(stamp_url)
+            if getattr(response, 'from_cache', False):
+                return False, None
+            
+            stamp_data = self._parse_stamp_page(response.text, stamp_url)
+            if not stamp_data:
+                logging.warning(f"    ⚠ Failed to scrape stamp location: {stamp_url}")
+                return True, None
+            return True, self._complete_stamp_record(stamp_data, town_name)
+            
+        except Exception as e:
+            logging.error(f"    ✗ Error re-checking stamp location {stamp_url}: {e}")
+            return True, None
     
     def compile_data(self, scraped_data: List[Dict]) -> 'pandas.DataFrame':
         """
@@ -357,7 +706,7 @@ class PilgrimStampScraper:
             scraped_data: List of dictionaries containing scraped data
             
         Returns:
-            Pandas DataFrame with columns: route, town, place, categories, english_categories, image_path
+            Pandas DataFrame with columns: route, town, place, categories, english_categories, image_path, stamp_url
         """
         try:
             import pandas as pd
@@ -371,16 +720,9 @@ class PilgrimStampScraper:
                     # Get town name from the stored town_name field
                     town_name = item.get('town_name', 'Unknown Town')
                     
-                    # Create local image path
-                    import os
-                    from utils import sanitize_filename
-                    
-                    # Extract filename from image URL
-                    image_filename = os.path.basename(item['image_url'])
-                    # Sanitize the filename
-                    safe_filename = sanitize_filename(image_filename)
-                    # Create local path in images/stamp_images directory
-                    local_image_path = os.path.join('images', 'stamp_images', safe_filename)
+                    # Stored image path; records journaled before the image
+                    # store only know the old basename path
+                    local_image_path = item.get('local_image_path') or self.local_image_path(item['image_url'])
                     
                     # Get categories, join them with semicolons if multiple
                     categories = item.get('categories', [])
@@ -391,19 +733,20 @@ class PilgrimStampScraper:
                     english_categories_text = '; '.join(english_categories) if english_categories else ''
                     
                     compiled_data.append({
-                        'route': self.route_name,
+                        'route': item.get('route', self.route_name),
                         'town': town_name,
                         'place': item['place_name'],
                         'categories': categories_text,
                         'english_categories': english_categories_text,
-                        'image_path': local_image_path
+                        'image_path': local_image_path,
+                        'stamp_url': item.get('stamp_url', '')
                     })
             
             # Create DataFrame
             df = pd.DataFrame(compiled_data)
             
             # Validate DataFrame structure
-            expected_columns = ['route', 'town', 'place', 'categories', 'english_categories', 'image_path']
+            expected_columns = ['route', 'town', 'place', 'categories', 'english_categories', 'image_path', 'stamp_url']
             if not all(col in df.columns for col in expected_columns):
                 missing_cols = [col for col in expected_columns if col not in df.columns]
                 logging.error(f"Missing columns in DataFrame: {missing_cols}")
@@ -485,3 +828,336 @@ class PilgrimStampScraper:
         except Exception as e:
             logging.error(f"Error in export_data: {e}")
             return False
+
+
+class AsyncPilgrimStampScraper(PilgrimStampScraper):
+    """
+    Concurrent variant of the scraper driven by asyncio.
+    
+    Blocking requests calls run on a bounded thread pool while a per-host
+    semaphore caps the number of requests in flight; the shared rate limiter
+    still paces every request, so the site sees a polite, steady load. The
+    first request of each call waits for its token on the event loop, so a
+    throttled call does not hold a pool thread while it waits. Crawl state
+    reads and writes (SQLite) run on the pool too, never on the event loop,
+    and towns and stamps are worked off by `concurrency` workers each rather
+    than one coroutine per page.
+    """
+    
+    def __init__(self, route: str = "navarro", concurrency: int = 8,
+                 requests_per_second: Optional[float] = None, executor: Optional[ThreadPoolExecutor] = None,
+                 host_semaphores: Optional[Dict[str, asyncio.Semaphore]] = None, **kwargs):
+        """
+        Initialize the async scraper.
+        
+        Args:
+            route: Key of a route in routes.ROUTES
+            concurrency: Maximum number of requests in flight per host
+            requests_per_second: If given, reconfigure the site's rate limit (burst = concurrency)
+            executor: Thread pool to share with other scrapers (defaults to a private one)
+            host_semaphores: Per-host semaphores to share with other scrapers, so
+                concurrency is a budget for all of them together
+            **kwargs: rate_limiter, retry_policy, cache, state, parser and image_store, as for PilgrimStampScraper
+        """
+        super().__init__(route, **kwargs)
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if requests_per_second is not None:
+            self.rate_limiter.configure(urlparse(self.base_url).netloc, requests_per_second, concurrency)
+        
+        self.concurrency = concurrency
+        self._executor = executor or ThreadPoolExecutor(max_workers=concurrency)
+        self._host_semaphores = host_semaphores if host_semaphores is not None else {}
+        # Host whose token the current worker thread was handed by _run_bounded
+        self._prepaid = threading.local()
+        
+        # Let every worker thread keep its own pooled connection
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    async def _run_bounded(self, url: str, func, *args, **kwargs):
+        """
+        Run a blocking scraper call for url under the per-host limits.
+        
+        Args:
+            url: URL the call will fetch, used to pick the host limits
+            func: Blocking callable to run on the thread pool
+            
+        Returns:
+            Whatever func returns
+        """
+        host = urlparse(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        async with semaphore:
+            # Offline, nothing is sent, so there is no token to wait for
+            prepaid = None
+            if self.cache is None or self.cache.mode != 'offline':
+                await self.rate_limiter.acquire_async(url)
+                prepaid = host
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(self._call_prepaid, prepaid, func, *args, **kwargs)
+            )
+    
+    def _call_prepaid(self, host: Optional[str], func, *args, **kwargs):
+        """Run func on a worker thread holding one already acquired token for host."""
+        self._prepaid.host = host
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._prepaid.host = None
+    
+    async def _run_state(self, func, *args):
+        """
+        Run a blocking crawl state call (e.g. _resumed_stamp) on the thread pool.
+        
+        Returns:
+            Whatever func returns
+        """
+        if self.state is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    async def _run_jobs(self, func, jobs: List[Tuple]) -> List:
+        """
+        Await func(*job) for every job with at most `concurrency` jobs running.
+        
+        Workers take the next job from a queue when they finish one, so a
+        route with thousands of stamps has `concurrency` coroutines alive
+        instead of one per stamp, all waiting on the host semaphore.
+        
+        Args:
+            func: Coroutine function
+            jobs: Argument tuples, one per call
+            
+        Returns:
+            Results of func, in job order
+        """
+        results = [None] * len(jobs)
+        queue = asyncio.Queue()
+        for position, job in enumerate(jobs):
+            queue.put_nowait((position, job))
+        
+        async def worker():
+            while not queue.empty():
+                position, job = queue.get_nowait()
+                results[position] = await func(*job)
+        
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(jobs)))))
+        return results
+    
+    def _send(self, url: str, **kwargs):
+        """
+        Send a GET request, using the token paid on the event loop if there is one.
+        
+        Further requests of the same call (retries, images) wait in the thread.
+        """
+        if getattr(self._prepaid, 'host', None) == urlparse(url).netloc:
+            self._prepaid.host = None
+            return self.session.get(url, **kwargs)
+        return super()._send(url, **kwargs)
+    
+    async def get_town_links(self) -> List[str]:
+        """
+        Extract all town category links from the main page.
+        
+        Returns:
+            List of town URLs
+        """
+        return await self._run_bounded(self.main_url, super().get_town_links)
+    
+    async def _get_town_stamp_links(self, town_url: str) -> List[str]:
+        """Fetch one town page and return its stamp location links."""
+        from utils import extract_town_name_from_url
+        
+        town_name = extract_town_name_from_url(town_url)
+        resumed_stamp_links = await self._run_state(self._resumed_town_stamps, town_url)
+        if resumed_stamp_links is not None:
+            return resumed_stamp_links
+        
+        try:
+            response = await self._run_bounded(town_url, self._make_request, town_url, timeout=30)
+            unique_stamp_links = self._parse_stamp_links(response.text)
+            await self._run_state(self._record_town, town_url, town_name, unique_stamp_links)
+            logging.info(f"Found {len(unique_stamp_links)} stamp locations for {town_name}")
+            return unique_stamp_links
+        except requests.RequestException as e:
+            logging.error(f"Error fetching town page {town_url}: {e}")
+            await self._run_state(self._record_town, town_url, town_name, None, str(e))
+        except Exception as e:
+            logging.error(f"Unexpected error processing town {town_url}: {e}")
+            await self._run_state(self._record_town, town_url, town_name, None, str(e))
+        # Empty list for failed towns to maintain structure
+        return []
+    
+    async def get_stamp_locations_by_town(self, town_urls: List[str]) -> Dict[str, List[str]]:
+        """
+        Extract stamp location links for each town concurrently.
+        
+        Args:
+            town_urls: List of town URLs to process
+            
+        Returns:
+            Dictionary mapping town names to lists of stamp location URLs
+        """
+        from utils import extract_town_name_from_url
+        
+        logging.info(f"Processing {len(town_urls)} towns for {self.route_name} (concurrency {self.concurrency})")
+        results = await self._run_jobs(self._get_town_stamp_links, [(url,) for url in town_urls])
+        
+        # Assemble in input order so the output matches the sequential scraper
+        town_stamp_locations = {}
+        for town_url, stamp_links in zip(town_urls, results):
+            town_stamp_locations[extract_town_name_from_url(town_url)] = stamp_links
+        
+        total_stamp_locations = sum(len(locations) for locations in town_stamp_locations.values())
+        logging.info(f"Total stamp locations found across all towns: {total_stamp_locations}")
+        
+        return town_stamp_locations
+    
+    async def scrape_stamp_location(self, stamp_url: str) -> Optional[Dict]:
+        """
+        Scrape individual stamp location page for place name, image, and categories.
+        
+        Args:
+            stamp_url: URL of the stamp location page
+            
+        Returns:
+            Dictionary with place name, image URL, categories, and stamp URL, or None if failed
+        """
+        return await self._run_bounded(stamp_url, super().scrape_stamp_location, stamp_url)
+    
+    async def process_stamp_location(self, stamp_url: str, town_name: str) -> Optional[Dict]:
+        """
+        Scrape a stamp location page and download its image.
+        
+        Args:
+            stamp_url: URL of the stamp location page
+            town_name: Town the stamp location was listed under
+            
+        Returns:
+            Scraped record with town name and local image path, or None if failed
+        """
+        resumed = await self._run_state(self._resumed_stamp, stamp_url, town_name)
+        if resumed:
+            return resumed
+        
+        try:
+            stamp_data = await self.scrape_stamp_location(stamp_url)
+            if not stamp_data:
+                logging.warning(f"    ⚠ Failed to scrape stamp location: {stamp_url}")
+                await self._run_state(self._record_stamp, stamp_url, town_name, None, 'scrape failed')
+                return None
+            
+            return await self._run_bounded(
+                stamp_data['image_url'], self._complete_stamp_record, stamp_data, town_name
+            )
+            
+        except Exception as e:
+            logging.error(f"    ✗ Error processing stamp location {stamp_url}: {e}")
+            await self._run_state(self._record_stamp, stamp_url, town_name, None, str(e))
+            return None
+    
+    async def check_stamp_location(self, stamp_url: str, town_name: str):
+        """
+        Re-check a stamp location that is already in the dataset.
+        
+        Args:
+            stamp_url: URL of the stamp location page
+            town_name: Town the stamp location was listed under
+            
+        Returns:
+            Tuple (changed, record), as for PilgrimStampScraper.check_stamp_location
+        """
+        return await self._run_bounded(stamp_url, super().check_stamp_location, stamp_url, town_name)
+    
+    async def crawl(self) -> List[Dict]:
+        """
+        Crawl the whole route: towns, stamp locations and stamp images.
+        
+        Returns:
+            List of scraped records in the same shape and order the sequential
+            crawl produces, ready for compile_data
+        """
+        town_links = await self.get_town_links()
+        if not town_links:
+            logging.warning(f"No town links found for {self.route_name}")
+            return []
+        logging.info(f"✓ Found {len(town_links)} towns to process for {self.route_name}")
+        
+        town_stamp_locations = await self.get_stamp_locations_by_town(town_links)
+        jobs = [
+            (town_name, stamp_url)
+            for town_name, stamp_urls in town_stamp_locations.items()
+            for stamp_url in stamp_urls
+        ]
+        logging.info(f"Scraping {len(jobs)} stamp locations for {self.route_name}")
+        
+        results = await self._run_jobs(self.process_stamp_location, [(url, town) for town, url in jobs])
+        scraped_data = [record for record in results if record]
+        
+        logging.info(f"✓ Successfully processed {len(scraped_data)} stamp locations for {self.route_name}")
+        if len(scraped_data) < len(jobs):
+            logging.warning(f"⚠ Failed to process {len(jobs) - len(scraped_data)} stamp locations for {self.route_name}")
+        
+        return scraped_data
+
+def create_route_scrapers(routes: List[str], concurrency: int = 8,
+                          **kwargs) -> Tuple[List[AsyncPilgrimStampScraper], ThreadPoolExecutor]:
+    """
+    Create async scrapers for several routes that share one request budget.
+    
+    All scrapers share one thread pool and one set of per-host semaphores,
+    and every request still goes through the shared rate limiter, so running
+    them together puts the same load on the site as a single-route crawl.
+    
+    Args:
+        routes: Route keys
+        concurrency: Maximum requests in flight per host, across all routes
+        **kwargs: Options passed to every AsyncPilgrimStampScraper (cache, state, image_store, ...)
+        
+    Returns:
+        One scraper per route, in the order given, and the shared thread
+        pool, which the caller shuts down when the crawl is over
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    host_semaphores: Dict[str, asyncio.Semaphore] = {}
+    scrapers = [
+        AsyncPilgrimStampScraper(route, concurrency=concurrency, executor=executor,
+                                 host_semaphores=host_semaphores, **kwargs)
+        for route in routes
+    ]
+    return scrapers, executor
+
+async def crawl_routes(routes: List[str], concurrency: int = 8, **kwargs) -> Dict[str, List[Dict]]:
+    """
+    Crawl several routes at once on one event loop.
+    
+    The routes' towns and stamps interleave under the shared budget of
+    create_route_scrapers instead of running back to back, so adding a
+    route adds work to the queue rather than another full crawl in series.
+    
+    Args:
+        routes: Route keys to crawl
+        concurrency: Maximum requests in flight per host, across all routes
+        **kwargs: Options passed to every AsyncPilgrimStampScraper (cache, state, image_store, ...)
+        
+    Returns:
+        Dictionary mapping each route key to its scraped records
+    """
+    if not routes:
+        logging.warning("No routes to crawl")
+        return {}
+    
+    scrapers, executor = create_route_scrapers(routes, concurrency, **kwargs)
+    logging.info(f"Crawling {len(scrapers)} routes in parallel: {', '.join(s.route_name for s in scrapers)}")
+    
+    try:
+        results = await asyncio.gather(*(scraper.crawl() for scraper in scrapers))
+    finally:
+        executor.shutdown(wait=False)
+    return dict(zip(routes, results))
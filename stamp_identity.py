@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Stamp identity for matching stamps across files.
+The analysis and review outputs name a stamp by its place and town, so a
+stamp's identity is a 64-bit hash of that pair. Hashing whole columns at
+once turns "is this stamp flagged / corrected / new?" into one vectorized
+set lookup instead of a scan of the other file for every stamp. Hash
+matches are confirmed by value, so a collision cannot match two different
+stamps.
+"""
+
+import numpy as np
+import pandas as pd
+
+def stamp_keys(df: pd.DataFrame, place_column: str = 'place', town_column: str = 'town') -> pd.Series:
+    """
+    Hash the (place, town) identity of every row.
+
+    Rows missing a place or town have no identity (<NA>) and match nothing,
+    as comparing them by value never did.
+
+    Args:
+        df: Stamps with place and town columns
+        place_column: Column holding the place name
+        town_column: Column holding the town name
+
+    Returns:
+        Nullable UInt64 Series of keys indexed like df
+    """
+    pairs = df[[place_column, town_column]]
+    keys = pd.util.hash_pandas_object(pairs, index=False).astype('UInt64')
+    return keys.mask(pairs.isna().any(axis=1))
+
+def stamps_in(stamps_df: pd.DataFrame, other_df: pd.DataFrame,
+              place_column: str = 'place', town_column: str = 'town') -> np.ndarray:
+    """
+    Check which stamps also appear in another table.
+
+    Args:
+        stamps_df: Stamps with place and town columns
+        other_df: Table to look the stamps up in
+        place_column: Place column of other_df
+        town_column: Town column of other_df
+
+    Returns:
+        Boolean array, True for stamps whose (place, town) is in other_df
+    """
+    other_keys = stamp_keys(other_df, place_column, town_column)
+    found = stamp_keys(stamps_df).isin(other_keys.dropna()).to_numpy(dtype=bool)
+    candidates = np.flatnonzero(found)
+    if len(candidates):
+        # Equal hashes are only candidates: confirm them against the actual names
+        known = other_df[other_keys.notna().to_numpy()]
+        other_pairs = set(zip(known[place_column], known[town_column]))
+        pairs = stamps_df.iloc[candidates]
+        found[candidates] = [pair in other_pairs for pair in zip(pairs['place'], pairs['town'])]
+    return found
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests for the trail distance analysis of analyze_stamp_distances.py.
+Trails and stamps are synthetic; references are computed independently.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from openpyxl import load_workbook
+
+from analyze_stamp_distances import (
+    WGS84_A, WGS84_F, ChainageIndex, LocalTransverseMercator, TrailIndex, TrailPart,
+    calculate_distances_to_trail, export_to_excel, haversine_distance,
+)
+
+E2 = WGS84_F * (2 - WGS84_F)
+
+def ellipsoid_distance_km(lat1, lon1, lat2, lon2):
+    """Short geodesic distance on WGS84 from the meridian and prime vertical radii."""
+    phi = np.radians((lat1 + lat2) / 2)
+    w = 1 - E2 * np.sin(phi) ** 2
+    meridian_radius = WGS84_A * (1 - E2) / w ** 1.5
+    normal_radius = WGS84_A / np.sqrt(w)
+    return np.hypot(
+        meridian_radius * np.radians(lat2 - lat1),
+        normal_radius * np.cos(phi) * np.radians(lon2 - lon1)
+    ) / 1000
+
+def stamps(lons, lats, route=None):
+    """Stamps frame with the columns the analysis reads."""
+    df = pd.DataFrame({'place': 'Albergue', 'town': 'Town', 'longitude': lons, 'latitude': lats})
+    if route is not None:
+        df['route'] = route
+    return df
+
+def test_metric_distances_at_route_extremes_match_geodesic():
+    # A trail along 42.5N spanning 8.5 degrees, wider than the Camino Frances
+    lons = np.linspace(-8.5, 0.0, 851)
+    trail = [TrailPart('', np.column_stack([lons, np.full_like(lons, 42.5)]).tolist())]
+    projection = LocalTransverseMercator.for_coords(trail[0].coords)
+    index = TrailIndex(trail, projection)
+
+    # Stamps about 5.5 km north and south of both ends and of the middle
+    df = stamps([-8.4, -8.4, -0.1, -0.1, -4.25], [42.55, 42.45, 42.55, 42.45, 42.55])
+    distances, _ = index.distances(df, max_distance_km=10)
+
+    reference = ellipsoid_distance_km(df['latitude'], df['longitude'],
+                                      distances['nearest_trail_lat'], distances['nearest_trail_lon'])
+    np.testing.assert_allclose(distances['distance_km'], reference, rtol=1e-6)
+    # Against the spherical haversine only the sphere's radius differs, evenly
+    spherical = haversine_distance(df['latitude'].to_numpy(), df['longitude'].to_numpy(),
+                                   distances['nearest_trail_lat'].to_numpy(), distances['nearest_trail_lon'].to_numpy())
+    ratio = distances['distance_km'].to_numpy() / spherical
+    np.testing.assert_allclose(ratio, ratio[-1], rtol=1e-4)
+    np.testing.assert_allclose(ratio, 1, rtol=5e-3)
+
+    assert abs(index.route_length_km[''] - ellipsoid_distance_km(42.5, -8.5, 42.5, 0.0)) < 1e-3
+
+def random_trail(rng, route, start_lon, vertices):
+    """A wiggly westward trail near 42.5N."""
+    lons = start_lon - np.cumsum(rng.uniform(0.001, 0.01, vertices))
+    lats = 42.5 + np.cumsum(rng.normal(0, 0.004, vertices))
+    return TrailPart(route, np.column_stack([lons, lats]).tolist())
+
+def brute_force_nearest(parts, lons, lats, route_of_stamp):
+    """Nearest trail point of every stamp from its route's full lines, in degrees."""
+    nearest = []
+    for lon, lat, route in zip(lons, lats, route_of_stamp):
+        point = shapely.Point(lon, lat)
+        lines = [shapely.LineString(part.coords) for part in parts if part.route == route]
+        line = min(lines, key=point.distance)
+        nearest.append(line.interpolate(line.project(point)).coords[0])
+    return np.array(nearest)
+
+@pytest.mark.parametrize('max_distance_km', [None, 2.0])
+def test_trail_index_matches_brute_force_search(max_distance_km):
+    rng = np.random.default_rng(7)
+    # Two routes, one drawn as two separate lines
+    parts = [random_trail(rng, 'frances', -1.0, 300), random_trail(rng, 'frances', -2.5, 200),
+             random_trail(rng, 'norte', -1.2, 400)]
+    coords = np.concatenate([part.coords for part in parts])
+    lons = rng.uniform(coords[:, 0].min(), coords[:, 0].max(), 300)
+    lats = rng.uniform(coords[:, 1].min() - 0.05, coords[:, 1].max() + 0.05, 300)
+    routes = rng.choice(['frances', 'norte'], 300)
+
+    index = TrailIndex(parts)
+    distances, beyond_radius = index.distances(stamps(lons, lats, routes), max_distance_km)
+
+    expected = brute_force_nearest(parts, lons, lats, routes)
+    np.testing.assert_allclose(distances[['nearest_trail_lon', 'nearest_trail_lat']], expected, atol=1e-9)
+    np.testing.assert_allclose(distances['distance_km'],
+                               haversine_distance(lats, lons, expected[:, 1], expected[:, 0]), atol=1e-6)
+    assert (distances['trail_route'] == routes).all()
+    if max_distance_km is not None:
+        # Stamps left to the unbounded search are all beyond the threshold
+        assert 0 < beyond_radius <= (distances['distance_km'] > max_distance_km).sum()
+
+def test_chainage_runs_from_the_eastern_end():
+    # Drawn west to east, so chainage is reversed
+    lons = np.linspace(-3.0, -2.0, 101)
+    trail = [TrailPart('', np.column_stack([lons, np.full_like(lons, 42.5)]).tolist())]
+    index = TrailIndex(trail)
+
+    distances, _ = index.distances(stamps([-2.0, -2.25, -2.5, -3.0], [42.51, 42.49, 42.5, 42.5]))
+
+    # Chainage follows the trail's 0.01 degree edges, not the great circle
+    expected = np.array([0, 25, 50, 100]) * haversine_distance(42.5, -2.0, 42.5, -2.01)
+    np.testing.assert_allclose(distances['chainage_km'], expected, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(index.route_length_km[''], expected[-1])
+    assert TrailIndex(trail, chainage_from_east=False).distances(stamps([-3.0], [42.5]))[0]['chainage_km'][0] == 0
+
+def test_chainage_index_matches_a_linear_scan():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({
+        'place': [f"Albergue {i}" for i in range(200)],
+        'trail_route': rng.choice(['frances', 'norte', 'primitivo'], 200),
+        'chainage_km': rng.integers(0, 800, 200).astype(float),
+    })
+    index = ChainageIndex(df)
+
+    for start, end, route in [(120, 145, None), (120, 145, 'norte'), (0, 800, None), (300, 300, None),
+                              (500, 400, None), (0, 50, 'invierno')]:
+        found = index.between(start, end, route)
+        mask = df['chainage_km'].between(start, end)
+        if route is not None:
+            mask &= df['trail_route'] == route
+        assert sorted(found.index) == sorted(df.index[mask])
+        # Ordered by chainage within each route
+        for _, section in found.groupby('trail_route', sort=False):
+            assert section['chainage_km'].is_monotonic_increasing
+
+def straight_trail(route, lat):
+    """A trail along a parallel from 3W to 2W."""
+    lons = np.linspace(-3.0, -2.0, 11)
+    return TrailPart(route, np.column_stack([lons, np.full_like(lons, lat)]).tolist())
+
+def test_routes_without_a_trail_need_allow_fallback():
+    trails = [straight_trail('Camino Francés', 42.5)]
+    df = stamps([-2.5, -2.5], [42.5, 42.9], ['Camino Francés', 'Camino Navarro'])
+
+    with pytest.raises(ValueError, match='Camino Navarro'):
+        calculate_distances_to_trail(df, trails, 5.0)
+
+    beyond, distances = calculate_distances_to_trail(df, trails, 5.0, allow_fallback=True)
+    assert distances['trail_route'].tolist() == ['Camino Francés', 'Camino Francés']
+    assert [stamp['distance_km'] > 40 for stamp in beyond] == [True]
+
+    # A trail of its own, or an untagged trail meant for every route, needs no fallback
+    _, distances = calculate_distances_to_trail(df, trails + [straight_trail('Camino Navarro', 42.9)], 5.0)
+    assert distances['distance_km'].max() < 1e-6
+    calculate_distances_to_trail(df, [straight_trail('', 42.5)], 5.0)
+
+def test_excel_title_does_not_name_a_route(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    trails = [straight_trail('Camino Navarro', 42.5)]
+    beyond, _ = calculate_distances_to_trail(stamps([-2.5], [42.7], 'Camino Navarro'), trails, 5.0)
+
+    workbook = load_workbook(export_to_excel(beyond, 5.0))
+
+    assert workbook.active['A1'].value == "Pilgrim Stamps Beyond 5.0km from the Trail of Their Route"
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the resumable crawl frontier of crawl_state.py.
+"""
+
+from crawl_state import CrawlState
+
+ROUTE = 'navarro'
+TOWN_URL = 'https://example.org/town/estella'
+STAMP_URLS = ['https://example.org/stamp/albergue', 'https://example.org/stamp/parroquia']
+
+def test_progress_survives_reopening_the_journal(tmp_path):
+    path = str(tmp_path / 'crawl_state.sqlite')
+    record = {'place_name': 'Albergue', 'town_name': 'Estella'}
+
+    state = CrawlState(path)
+    state.add_towns(ROUTE, [TOWN_URL, 'https://example.org/town/viana'])
+    state.record_town(ROUTE, TOWN_URL, 'Estella', STAMP_URLS)
+    state.record_stamp(ROUTE, 'Estella', STAMP_URLS[0], record)
+    state.record_stamp(ROUTE, 'Estella', STAMP_URLS[1], None, 'timeout')
+    state.close()
+
+    state = CrawlState(path)
+    assert state.summary() == {'towns': {'done': 1, 'pending': 1}, 'stamps': {'done': 1, 'failed': 1}}
+    assert state.get_towns(ROUTE) == [TOWN_URL, 'https://example.org/town/viana']
+    assert state.get_town_stamps(ROUTE, TOWN_URL) == STAMP_URLS
+    assert state.get_town_stamps(ROUTE, 'https://example.org/town/viana') is None
+    assert state.get_stamp_record(ROUTE, 'Estella', STAMP_URLS[0]) == record
+    assert state.get_stamp_record(ROUTE, 'Estella', STAMP_URLS[1]) is None
+
+    # A failed stamp that succeeds later is done, and a reset forgets everything
+    state.record_stamp(ROUTE, 'Estella', STAMP_URLS[1], {'place_name': 'Parroquia'})
+    assert state.summary()['stamps'] == {'done': 2}
+    state.reset()
+    assert state.summary() == {'towns': {}, 'stamps': {}}
+    state.close()
+
+def test_stamps_outside_the_frontier_are_still_journaled(tmp_path):
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    state.record_town(ROUTE, TOWN_URL, 'Estella', STAMP_URLS[:1])
+
+    late_url = 'https://example.org/stamp/hospital'
+    state.record_stamp(ROUTE, 'Estella', late_url, {'place_name': 'Hospital'})
+
+    assert state.get_stamp_record(ROUTE, 'Estella', late_url) == {'place_name': 'Hospital'}
+    # The town's own stamp list is unchanged
+    assert state.get_town_stamps(ROUTE, TOWN_URL) == STAMP_URLS[:1]
+    state.close()
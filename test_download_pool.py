@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the image download pool of download_pool.py.
+"""
+
+import threading
+import time
+
+import pytest
+
+from download_pool import PARTIAL_SUFFIX, ImageDownloadPool, remove_partial_downloads
+
+def test_pool_runs_every_job_and_stops_on_sentinels():
+    pool = ImageDownloadPool(workers=3)
+    threads = set()
+
+    def download(i):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.001)
+        return f"image-{i}" if i % 5 else None
+
+    futures = [pool.submit(download, i) for i in range(40)]
+    pool.close()
+
+    assert [future.result(timeout=0) for future in futures] == [f"image-{i}" if i % 5 else None for i in range(40)]
+    assert pool.stats['submitted'] == 40
+    assert (pool.stats['succeeded'], pool.stats['failed']) == (32, 8)
+    assert threads <= {f'image-download-{i}' for i in range(3)}
+    # Every worker took its sentinel and exited
+    assert not any(thread.is_alive() for thread in pool._threads)
+
+def test_job_errors_are_set_on_their_future():
+    with ImageDownloadPool(workers=1) as pool:
+        failing = pool.submit(lambda: 1 / 0)
+        ok = pool.submit(lambda: 'image')
+
+    with pytest.raises(ZeroDivisionError):
+        failing.result(timeout=0)
+    assert ok.result(timeout=0) == 'image'
+    assert pool.stats['failed'] == 1 and pool.stats['succeeded'] == 1
+
+def test_submit_blocks_while_the_queue_is_full():
+    release = threading.Event()
+    pool = ImageDownloadPool(workers=1, queue_size=1)
+    pool.submit(release.wait)          # taken by the worker
+    pool.submit(lambda: 'queued')      # fills the queue
+
+    submitted = threading.Event()
+    producer = threading.Thread(target=lambda: (pool.submit(lambda: 'third'), submitted.set()))
+    producer.start()
+    assert not submitted.wait(0.05)
+
+    release.set()
+    assert submitted.wait(1)
+    producer.join()
+    pool.close()
+    assert pool.stats['blocked_seconds'] > 0.04
+
+def test_completed_futures_need_no_worker():
+    assert ImageDownloadPool.completed({'place_name': 'Albergue'}).result(timeout=0) == {'place_name': 'Albergue'}
+
+def test_partial_downloads_are_removed(tmp_path):
+    (tmp_path / f"abc.jpg.1234{PARTIAL_SUFFIX}").write_bytes(b'half')
+    (tmp_path / f".5678{PARTIAL_SUFFIX}").write_bytes(b'half')
+    (tmp_path / 'abc.jpg').write_bytes(b'whole')
+
+    assert remove_partial_downloads(str(tmp_path)) == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['abc.jpg']
+    assert remove_partial_downloads(str(tmp_path / 'missing')) == 0
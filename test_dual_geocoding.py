@@ -1,45 +1,119 @@
 #!/usr/bin/env python3
 """
-Test script for dual geocoding functionality.
-Tests both Nominatim and Google Maps (if API key available).
+Tests for Google geocoding against the local stand-in server
+(geocoding_stub_server.py): coordinates, statuses and request counts, also
+when the server answers with HTTP 500s and OVER_QUERY_LIMIT.
 """
 
-import os
-import sys
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+googlemaps = pytest.importorskip('googlemaps')
+
+from geocode_cache import GeocodeCache
 from geocode_pilgrim_stamps import PilgrimStampGeocoder
+from geocoder_backends import GoogleBackend
+from geocoding_stub_server import StubGeocodingServer, stub_result
+from utils import RateLimiter
+
+TEST_CASES = [
+    ("Albergue de Villava", "Villava Atarrabia"),
+    ("Catedral Metropolitana de Pamplona", "Pamplona Iruna"),
+    ("Hotel Akerreta", "Akerreta"),
+]
+
+@pytest.fixture
+def client_sleeps(monkeypatch):
+    """Record the googlemaps client's retry backoff instead of sleeping."""
+    delays = []
+    monkeypatch.setattr(googlemaps.client, 'time', SimpleNamespace(time=time.time, sleep=delays.append))
+    return delays
+
+def google_geocoder(server, geocode_cache=None, **client_options):
+    """Geocoder with only the Google backend, talking to the stub server, unthrottled."""
+    backend = GoogleBackend(server.client(**client_options), geocode_cache,
+                            rate_limiter=RateLimiter(default_rate=10000.0, default_burst=100))
+    return PilgrimStampGeocoder(backends=[backend])
+
+def write_dataset(path, rows):
+    """Dataset CSV of `rows` stamps in 20 towns, every stamp listed twice."""
+    stamps = [(f"Albergue {i}", f"Town {i % 20}") for i in range(rows)]
+    pd.DataFrame(stamps * 2, columns=['place', 'town']).assign(route='Camino Navarro').to_csv(path, index=False)
+
+def assert_matches_stub(df, server):
+    """Every row carries the stub's coordinates, or failed for a stub miss."""
+    expected_results = [stub_result(f"{place}, {town}, Spain", server.miss_rate)
+                        for place, town in zip(df['place'], df['town'])]
+    for (_, row), expected in zip(df.iterrows(), expected_results):
+        if expected is None:
+            assert row['geocoding_status'] == 'failed' and not row['google_success']
+            assert pd.isna(row['latitude'])
+        else:
+            location = expected['geometry']['location']
+            assert (row['latitude'], row['longitude']) == (location['lat'], location['lng'])
+            assert (row['geocoding_status'], row['geocoding_source'], row['confidence']) == ('success', 'google', 'high')
+
+def test_locations_get_the_stub_coordinates():
+    with StubGeocodingServer(latency=0, miss_rate=0) as server:
+        geocoder = google_geocoder(server)
+        results = [geocoder.geocode_location(place, town) for place, town in TEST_CASES]
+
+    for (place, town), result in zip(TEST_CASES, results):
+        location = stub_result(f"{place}, {town}, Spain", miss_rate=0)['geometry']['location']
+        assert result['google_query'] == f"{place}, {town}, Spain"
+        assert result['final_coords'] == result['google_coords'] == (location['lat'], location['lng'])
+        assert (result['geocoding_source'], result['confidence']) == ('google', 'high')
+    assert server.stats['requests'] == server.stats['ok'] == 3
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_dataset_is_geocoded_once_per_unique_lookup(tmp_path, workers):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 60)
+
+    with StubGeocodingServer(latency=0.002, miss_rate=0.2) as server:
+        df = google_geocoder(server).geocode_dataset(str(csv_path), workers=workers)
+
+    assert len(df) == 120
+    assert_matches_stub(df, server)
+    assert server.stats['requests'] == 60
+    assert server.stats['zero_results'] == (df['geocoding_status'] == 'failed').sum() / 2
+    assert 1 <= server.stats['max_in_flight'] <= workers
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_server_and_quota_errors_are_retried_to_the_same_results(tmp_path, client_sleeps, workers):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 60)
+
+    with StubGeocodingServer(latency=0, miss_rate=0.2, error_rate=0.15, quota_error_rate=0.15, seed=3) as server:
+        df = google_geocoder(server).geocode_dataset(str(csv_path), workers=workers)
+
+    assert_matches_stub(df, server)
+    stats = server.stats
+    assert stats['server_errors'] > 0 and stats['quota_errors'] > 0
+    # Each lookup was answered once; every error cost one retry
+    assert stats['ok'] + stats['zero_results'] == 60
+    assert stats['requests'] == 60 + stats['server_errors'] + stats['quota_errors']
+    assert len(client_sleeps) == stats['server_errors'] + stats['quota_errors']
+
+def test_errors_are_not_cached_but_results_are(tmp_path, client_sleeps):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 20)
+    cache = GeocodeCache(str(tmp_path / 'geocode_cache.sqlite'))
+
+    # Quota exhausted and no retries: every lookup fails, nothing is cached
+    with StubGeocodingServer(latency=0, quota_error_rate=1.0) as server:
+        df = google_geocoder(server, cache, retry_over_query_limit=False).geocode_dataset(str(csv_path))
+    assert (df['geocoding_status'] == 'failed').all()
+    assert server.stats['quota_errors'] == 20 and cache.stats['stored'] == 0
+
+    with StubGeocodingServer(latency=0, miss_rate=0.2) as server:
+        first = google_geocoder(server, cache).geocode_dataset(str(csv_path))
+        second = google_geocoder(server, cache).geocode_dataset(str(csv_path))
 
-def test_dual_geocoding():
-    """Test the dual geocoding functionality."""
-    print("🧪 Testing Dual Geocoding Functionality")
-    print("=" * 50)
-    
-    # Initialize geocoder
-    geocoder = PilgrimStampGeocoder()
-    
-    # Test cases
-    test_cases = [
-        ("Albergue de Villava", "Villava Atarrabia"),
-        ("Catedral Metropolitana de Pamplona", "Pamplona Iruna"),
-        ("Hotel Akerreta", "Akerreta"),
-    ]
-    
-    print(f"Testing {len(test_cases)} locations...")
-    print(f"Google Maps API available: {'Yes' if geocoder.google_client else 'No'}")
-    print()
-    
-    for i, (place, town) in enumerate(test_cases, 1):
-        print(f"--- Test {i}: {place} in {town} ---")
-        
-        result = geocoder.geocode_location(place, town)
-        
-        print(f"  Nominatim: {result['nominatim_coords']}")
-        print(f"  Google Maps: {result['google_coords']}")
-        print(f"  Final result: {result['final_coords']}")
-        print(f"  Source: {result['geocoding_source']}")
-        print(f"  Confidence: {result['confidence']}")
-        print()
-    
-    print("✅ Dual geocoding test completed!")
-
-if __name__ == "__main__":
-    test_dual_geocoding()
+    # Found and "no result" answers alike are served from the cache on the rerun
+    assert server.stats['requests'] == 20
+    assert_matches_stub(second, server)
+    pd.testing.assert_frame_equal(first, second)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent geocoding cache of geocode_cache.py.
+The clock is moved forward instead of waiting for entries to expire.
+"""
+
+import pytest
+
+import geocode_cache
+from geocode_cache import SECONDS_PER_DAY, GeocodeCache, normalize_query
+
+RESULT = [{'geometry': {'location': {'lat': 42.67, 'lng': -2.03}}, 'formatted_address': 'Estella, Navarra'}]
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Settable stand-in for time.time in geocode_cache."""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(geocode_cache.time, 'time', lambda: now[0])
+    return now
+
+def test_queries_differing_in_case_accents_and_spacing_share_a_key():
+    key = normalize_query("Albergue  San Martín, Cizur Menor")
+
+    assert key == 'albergue san martin, cizur menor'
+    assert normalize_query("ALBERGUE San Martin ,Cizur   Menor ") == key
+    assert normalize_query("Albergue San Martín, Cizur Mayor") != key
+
+def test_normalized_queries_hit_the_same_entry(tmp_path, clock):
+    cache = GeocodeCache(str(tmp_path / 'geocode_cache.sqlite'))
+    cache.store("Albergue San Martín, Estella", RESULT)
+
+    assert cache.lookup("albergue san martin,estella")['response'] == RESULT
+    assert cache.lookup("Albergue San Martín, Viana") is None
+    assert cache.stats == {'hits': 1, 'negative_hits': 0, 'expired': 0, 'misses': 1, 'stored': 1}
+
+def test_found_results_expire_after_their_ttl(tmp_path, clock):
+    cache = GeocodeCache(str(tmp_path / 'geocode_cache.sqlite'), ttl_days=180, negative_ttl_days=14)
+    cache.store("Estella", RESULT)
+
+    clock[0] += 179 * SECONDS_PER_DAY
+    assert cache.lookup("Estella")['response'] == RESULT
+    clock[0] += 2 * SECONDS_PER_DAY
+    assert cache.lookup("Estella") is None
+    assert cache.stats['expired'] == 1
+
+    # Storing again renews the entry
+    cache.store("Estella", RESULT)
+    assert cache.lookup("Estella")['fetched_at'] == clock[0]
+
+def test_negative_entries_use_their_own_ttl(tmp_path, clock):
+    cache = GeocodeCache(str(tmp_path / 'geocode_cache.sqlite'), ttl_days=180, negative_ttl_days=14)
+    cache.store("Ermita perdida, Estella", [])
+    cache.store("Estella", RESULT)
+
+    clock[0] += 13 * SECONDS_PER_DAY
+    assert cache.lookup("Ermita perdida, Estella") == {'response': [], 'fetched_at': clock[0] - 13 * SECONDS_PER_DAY}
+    assert cache.stats['negative_hits'] == 1
+
+    clock[0] += 2 * SECONDS_PER_DAY
+    assert cache.lookup("Ermita perdida, Estella") is None
+    # The found result of the same age is still fresh
+    assert cache.lookup("Estella")['response'] == RESULT
+
+def test_entries_without_ttl_never_expire_and_survive_reopening(tmp_path, clock):
+    path = str(tmp_path / 'geocode_cache.sqlite')
+    cache = GeocodeCache(path, ttl_days=None, negative_ttl_days=None)
+    cache.store("Estella", RESULT)
+    cache.store("Ermita perdida, Estella", [])
+    cache.close()
+
+    clock[0] += 10_000 * SECONDS_PER_DAY
+    reopened = GeocodeCache(path, ttl_days=None, negative_ttl_days=None)
+    assert reopened.lookup("Estella")['response'] == RESULT
+    assert reopened.lookup("Ermita perdida, Estella")['response'] == []
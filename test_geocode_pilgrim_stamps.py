@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Tests for the dataset geocoding loop of geocode_pilgrim_stamps.py.
+A counting stand-in backend replaces Google, so no key or network is needed.
+"""
+
+import json
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geocode_pilgrim_stamps import (
+    DETAILS_SHARD_SIZE, GEOCODE_COLUMNS, PilgrimStampGeocoder, load_geocode_checkpoint, load_unchanged_geocodes,
+    plan_geocoding_queries, with_result_dtypes,
+)
+from geocoder_backends import GeocodeMatch
+
+class CountingBackend:
+    """Backend answering every query with coordinates derived from it, counting calls."""
+
+    name = 'counting'
+
+    def __init__(self, delay=0.001):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def query(self, place, town):
+        return f"{place}, {town}"
+
+    def geocode(self, query):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        # Coordinates depend on the query only, not on call order
+        return GeocodeMatch(42.0 + zlib.crc32(query.encode()) % 10000 / 1e5, -3.0, 'medium', query)
+
+def write_dataset(path, rows):
+    """Write a dataset CSV with one unique lookup per row."""
+    pd.DataFrame({
+        'route': 'Camino Francés',
+        'town': [f"Town {i}" for i in range(rows)],
+        'place': [f"Albergue {i}" for i in range(rows)],
+    }).to_csv(path, index=False)
+
+def test_plan_keys_ignore_case_accents_and_spacing():
+    df = pd.DataFrame({
+        'town': ['Cizur Menor', ' cizur  menor', 'Cizur Menor', 'Cizur Mayor'],
+        'place': ['Albergue San Martín', 'ALBERGUE SAN MARTIN ', 'Albergue San Martín', 'Albergue San Martín'],
+    })
+
+    plan = plan_geocoding_queries(df)
+
+    assert plan['place'].tolist()[1] == 'ALBERGUE SAN MARTIN'
+    assert plan[['place_key', 'town_key']].drop_duplicates().values.tolist() == [
+        ['albergue san martin', 'cizur menor'], ['albergue san martin', 'cizur mayor'],
+    ]
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_duplicate_rows_are_geocoded_once_and_fanned_out(tmp_path, workers):
+    csv_path = tmp_path / 'stamps.csv'
+    pd.DataFrame({
+        'route': ['Camino Navarro', 'Camino Francés', 'Camino Navarro', 'Camino Francés', 'Camino Navarro'],
+        'town': ['Estella', 'Viana', 'ESTELLA', 'Viana', 'Logroño'],
+        'place': ['Albergue San Martín', 'Parroquia', 'albergue san martin', 'Parroquia', 'Albergue San Martín'],
+    }).to_csv(csv_path, index=False)
+    backend = CountingBackend()
+
+    result = PilgrimStampGeocoder(backends=[backend]).geocode_dataset(str(csv_path), workers=workers)
+
+    assert backend.calls == 3
+    # Every row keeps its own place and route and gets the coordinates of its key
+    assert result['route'].tolist()[:2] == ['Camino Navarro', 'Camino Francés']
+    assert result['place'].tolist()[2] == 'albergue san martin'
+    latitudes = result['latitude'].tolist()
+    assert latitudes[0] == latitudes[2] and latitudes[1] == latitudes[3]
+    assert len(set(latitudes)) == 3
+    assert (result['geocoding_status'] == 'success').all()
+
+def test_result_dtypes_survive_a_checkpoint_round_trip(tmp_path):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 30)
+    checkpoint_path = tmp_path / 'checkpoint.csv'
+
+    class FractionalBackend(CountingBackend):
+        """Coordinates using every digit of a float64."""
+        def geocode(self, query):
+            if query.endswith('7'):
+                return None
+            seed = zlib.crc32(query.encode())
+            return GeocodeMatch(42.0 + seed / 7e9, -3.0 - seed / 3e9, 'medium', query)
+
+    result = PilgrimStampGeocoder(backends=[FractionalBackend()]).geocode_dataset(
+        str(csv_path), checkpoint_path=str(checkpoint_path), checkpoint_every=7
+    )
+    checkpoint = load_geocode_checkpoint(str(checkpoint_path))
+
+    assert len(checkpoint) == 30
+    assert checkpoint[GEOCODE_COLUMNS].dtypes.equals(result[GEOCODE_COLUMNS].dtypes)
+    pd.testing.assert_frame_equal(checkpoint[GEOCODE_COLUMNS], result[GEOCODE_COLUMNS])
+    assert result['geocoding_status'].value_counts()['failed'] == 3
+
+    # The geocoded CSV read back as text gets the same columns again
+    output_path = tmp_path / 'geocoded.csv'
+    result.to_csv(output_path, index=False)
+    reread = with_result_dtypes(pd.read_csv(output_path, dtype=str, keep_default_na=False))
+    pd.testing.assert_frame_equal(reread[GEOCODE_COLUMNS], result[GEOCODE_COLUMNS])
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_interrupted_run_stops_after_lookups_in_flight(tmp_path, monkeypatch, workers):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 2000)
+    backend = CountingBackend()
+    geocoder = PilgrimStampGeocoder(backends=[backend])
+
+    def interrupted_assembly(plan, results, *args):
+        """Take 50 results, then stop like Ctrl-C while results are collected."""
+        for _ in range(50):
+            next(results)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(geocoder, '_assemble_results', interrupted_assembly)
+    with pytest.raises(KeyboardInterrupt):
+        geocoder.geocode_dataset(str(csv_path), workers=workers)
+    # Lookups already running finish; none may start after the interrupt
+    time.sleep(0.05)
+
+    assert backend.calls <= 50 + 2 * workers
+
+def test_concurrent_results_keep_row_order(tmp_path):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 200)
+
+    sequential = PilgrimStampGeocoder(backends=[CountingBackend(delay=0)]).geocode_dataset(str(csv_path))
+    concurrent = PilgrimStampGeocoder(backends=[CountingBackend()]).geocode_dataset(str(csv_path), workers=8)
+
+    assert (concurrent['geocoding_status'] == 'success').all()
+    assert concurrent['latitude'].tolist() == sequential['latitude'].tolist()
+
+class InterruptingBackend(CountingBackend):
+    """Backend interrupted like Ctrl-C on its call number `stop_at`, failing every fifth query."""
+
+    def __init__(self, stop_at):
+        super().__init__(delay=0)
+        self.stop_at = stop_at
+
+    def geocode(self, query):
+        if self.calls + 1 == self.stop_at:
+            raise KeyboardInterrupt
+        match = super().geocode(query)
+        return None if self.calls % 5 == 0 else match
+
+def test_resume_skips_lookups_completed_before_the_interrupt(tmp_path):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 100)
+    checkpoint_path = str(tmp_path / 'checkpoint.csv')
+
+    with pytest.raises(KeyboardInterrupt):
+        PilgrimStampGeocoder(backends=[InterruptingBackend(stop_at=43)]).geocode_dataset(
+            str(csv_path), checkpoint_path=checkpoint_path, checkpoint_every=10
+        )
+    # 42 lookups done, 34 of them successful; the last ones were flushed on the way out
+    checkpoint = load_geocode_checkpoint(checkpoint_path)
+    assert len(checkpoint) == 42
+    assert (checkpoint['geocoding_status'] == 'success').sum() == 34
+
+    backend = CountingBackend(delay=0)
+    result = PilgrimStampGeocoder(backends=[backend]).geocode_dataset(
+        str(csv_path), checkpoint_path=checkpoint_path, resume=True, checkpoint_every=10
+    )
+
+    # Only the failed and never-tried lookups are sent again
+    assert backend.calls == 100 - 34
+    assert (result['geocoding_status'] == 'success').all()
+    assert result['place'].tolist() == [f"Albergue {i}" for i in range(100)]
+    # Retried keys were appended again; the latest entry of each key wins
+    assert len(load_geocode_checkpoint(checkpoint_path)) == 100
+    assert (load_geocode_checkpoint(checkpoint_path)['geocoding_status'] == 'success').all()
+
+def test_a_fresh_run_discards_the_old_checkpoint(tmp_path):
+    csv_path = tmp_path / 'stamps.csv'
+    write_dataset(csv_path, 20)
+    checkpoint_path = str(tmp_path / 'checkpoint.csv')
+    PilgrimStampGeocoder(backends=[CountingBackend(delay=0)]).geocode_dataset(str(csv_path), checkpoint_path=checkpoint_path)
+
+    backend = CountingBackend(delay=0)
+    PilgrimStampGeocoder(backends=[backend]).geocode_dataset(str(csv_path), checkpoint_path=checkpoint_path)
+
+    assert backend.calls == 20
+    assert len(pd.read_csv(checkpoint_path)) == 20
+
+def test_changeset_geocodes_only_added_and_modified_stamps(tmp_path):
+    previous = pd.DataFrame({
+        'route': 'Camino Francés',
+        'town': ['Estella', 'Viana', 'Sarria', 'Logroño'],
+        'place': ['Albergue', 'Parroquia', 'Bar', 'Hospital'],
+        'stamp_url': [f"https://example.org/{i}" for i in range(4)],
+    })
+    csv_path = tmp_path / 'stamps.csv'
+    previous.to_csv(csv_path, index=False)
+    previous_csv = tmp_path / 'geocoded.csv'
+    old_backend = CountingBackend()
+    geocoded = PilgrimStampGeocoder(backends=[old_backend]).geocode_dataset(str(csv_path))
+    # Mark the previous output so carried-over coordinates are recognisable
+    geocoded['longitude'] = [-1.0, -2.0, -3.0, -4.0]
+    geocoded.loc[3, ['latitude', 'longitude', 'geocoding_status']] = [np.nan, np.nan, 'failed']
+    geocoded.to_csv(previous_csv, index=False)
+
+    # The crawl renamed the Viana stamp, removed Sarria and found one in Pamplona
+    current = previous.drop(index=2)
+    current.loc[1, 'place'] = 'Parroquia de Santa María'
+    current = pd.concat([current, pd.DataFrame([{
+        'route': 'Camino Francés', 'town': 'Pamplona', 'place': 'Catedral', 'stamp_url': 'https://example.org/9'
+    }])], ignore_index=True)
+    current.to_csv(csv_path, index=False)
+    changeset = {
+        'added': current.iloc[[3]].to_dict(orient='records'),
+        'modified': [{'before': previous.iloc[1].to_dict(), 'after': current.iloc[1].to_dict()}],
+        'removed': [previous.iloc[2].to_dict()],
+    }
+
+    backend = CountingBackend()
+    reuse = load_unchanged_geocodes(str(previous_csv), changeset)
+    result = PilgrimStampGeocoder(backends=[backend]).geocode_dataset(str(csv_path), reuse=reuse)
+
+    # Renamed and new stamps are geocoded, and so is the failed lookup
+    assert backend.calls == 3
+    assert result['town'].tolist() == ['Estella', 'Viana', 'Logroño', 'Pamplona']
+    assert result['longitude'].tolist() == [-1.0, -3.0, -3.0, -3.0]
+    assert (result['geocoding_status'] == 'success').all()
+    assert result['latitude'].dtype == 'float64' and result['geocoding_status'].dtype == 'category'
+
+def test_changeset_without_previous_output_geocodes_everything(tmp_path):
+    assert load_unchanged_geocodes(str(tmp_path / 'missing.csv'), {'added': [], 'modified': [], 'removed': []}) is None
+
+def geocoded_stamps(rows):
+    """Geocoded dataset of `rows` stamps, every tenth of them failed."""
+    df = pd.DataFrame({
+        'route': 'Camino Francés',
+        'town': [f"Town {i % 20}" for i in range(rows)],
+        'place': [f"Albergue {i}" for i in range(rows)],
+        'categories': 'Albergue',
+        'english_categories': 'Hostel',
+        'latitude': [42.0 + i / 1000 for i in range(rows)],
+        'longitude': [-2.0 - i / 1000 for i in range(rows)],
+        'geocoding_status': ['failed' if i % 10 == 9 else 'success' for i in range(rows)],
+        'geocoding_source': 'google',
+        'confidence': 'high',
+    })
+    failed = df['geocoding_status'] == 'failed'
+    df.loc[failed, ['latitude', 'longitude']] = np.nan
+    df['google_latitude'], df['google_longitude'] = df['latitude'], df['longitude']
+    df['google_success'] = ~failed
+    return df
+
+def test_cluster_map_embeds_one_feature_per_geocoded_stamp(tmp_path):
+    map_path = tmp_path / 'map.html'
+
+    PilgrimStampGeocoder(backends=[CountingBackend()]).create_folium_map(geocoded_stamps(120), str(map_path), map_mode='cluster')
+
+    html = map_path.read_text(encoding='utf-8')
+    assert html.count('"type": "Feature"') == 108
+    assert 'L.markerClusterGroup' in html
+    assert not (tmp_path / 'map_data').exists()
+
+def test_lazy_map_writes_its_data_files_and_loads_them_asynchronously(tmp_path):
+    map_path = tmp_path / 'map.html'
+
+    PilgrimStampGeocoder(backends=[CountingBackend()]).create_folium_map(geocoded_stamps(120), str(map_path), map_mode='lazy')
+
+    data_dir = tmp_path / 'map_data'
+    stamps = json.loads((data_dir / 'stamps.geojson').read_text(encoding='utf-8'))
+    assert len(stamps['features']) == 108
+    assert [feature['properties']['id'] for feature in stamps['features']] == list(range(108))
+    shards = sorted(path.name for path in (data_dir / 'details').iterdir())
+    assert shards == [f"{shard}.json" for shard in range(-(-108 // DETAILS_SHARD_SIZE))]
+    details = json.loads((data_dir / 'details' / '2.json').read_text(encoding='utf-8'))
+    assert details['100'] == {'place': 'Albergue 111', 'town': 'Town 11', 'route': 'Camino Francés',
+                              'source': 'google', 'confidence': 'high', 'google': [42.111, -2.111],
+                              'categories_en': 'Hostel', 'categories_es': 'Albergue'}
+
+    # The page holds no stamps itself and fetches them without blocking
+    html = map_path.read_text(encoding='utf-8')
+    assert '"type": "Feature"' not in html
+    assert 'async: false' not in html and '$.ajax' not in html
+    loader = re.search(r'fetch\("map_data/stamps\.geojson"\).*?\.addLayer\((geo_json_\w+)\)', html, re.S)
+    assert loader and f"var {loader.group(1)} = L.geoJson(" in html
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline gazetteer backend of geocoder_backends.py.
+The gazetteers are small GeoNames and GeoJSON files written per test.
+"""
+
+import json
+
+import pytest
+
+from geocoder_backends import GazetteerBackend, town_key
+
+# name, asciiname, alternate names, latitude, longitude, feature class, country, population
+PLACES = [
+    ('Estella', 'Estella', 'Lizarra,Estella-Lizarra', 42.6717, -2.0317, 'P', 'ES', 13673),
+    ('Pamplona', 'Pamplona', 'Iruña,Iruna', 42.8169, -1.6432, 'P', 'ES', 197138),
+    ('Logroño', 'Logrono', '', 42.4650, -2.4456, 'P', 'ES', 151136),
+    ('Santo Domingo de la Calzada', 'Santo Domingo de la Calzada', '', 42.4407, -2.9535, 'P', 'ES', 6345),
+    ('Santo Domingo de Silos', 'Santo Domingo de Silos', '', 41.9626, -3.4190, 'P', 'ES', 300),
+    # A hamlet sharing a name with a bigger town, a mountain and a French town
+    ('Viana', 'Viana', '', 42.0000, -7.0000, 'P', 'ES', 40),
+    ('Viana', 'Viana', '', 42.5153, -2.3712, 'P', 'ES', 4069),
+    ('Monte Estella', 'Monte Estella', '', 42.7000, -2.1000, 'T', 'ES', 0),
+    ('Saint-Jean-Pied-de-Port', 'Saint-Jean-Pied-de-Port', '', 43.1634, -1.2378, 'P', 'FR', 1619),
+]
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    """GazetteerBackend over a GeoNames dump of PLACES."""
+    path = tmp_path / 'ES.txt'
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, (name, ascii_name, alternates, lat, lon, feature_class, country, population) in enumerate(PLACES):
+            # geonameid, names, coordinates, class, code, country, cc2, admin1-4, population, ...
+            row = [str(i), name, ascii_name, alternates, str(lat), str(lon), feature_class, 'PPL', country,
+                   '', '', '', '', '', str(population), '', '', 'Europe/Madrid', '2024-01-01']
+            f.write('\t'.join(row) + '\n')
+    return GazetteerBackend(str(path))
+
+def test_exact_names_and_spellings_match_with_medium_confidence(gazetteer):
+    estella = gazetteer.geocode('Estella')
+    assert (estella.latitude, estella.longitude, estella.confidence) == (42.6717, -2.0317, 'medium')
+
+    # Alternate names, accents, case and town labels naming the town twice
+    assert gazetteer.geocode('LIZARRA').matched == 'Estella'
+    assert gazetteer.geocode('Logrono').matched == 'Logroño'
+    assert gazetteer.geocode('Pamplona / Iruña').confidence == 'medium'
+    assert gazetteer.geocode('Estella (Lizarra)').matched == 'Estella'
+
+def test_colliding_names_resolve_to_the_most_populous_place(gazetteer):
+    assert gazetteer.geocode('Viana').longitude == -2.3712
+
+def test_prefixes_complete_to_the_most_populous_town_with_low_confidence(gazetteer):
+    match = gazetteer.geocode('Santo Domingo')
+
+    assert match.matched == 'Santo Domingo de la Calzada'
+    assert match.confidence == 'low'
+    # A cut-off word is not a prefix, but still a close spelling
+    assert gazetteer.geocode('Pamplon').matched == 'Pamplona'
+    assert gazetteer.geocode('Pamplon').confidence == 'low'
+
+def test_misspellings_match_with_low_confidence(gazetteer):
+    match = gazetteer.geocode('Logrroño')
+
+    assert (match.matched, match.confidence) == ('Logroño', 'low')
+    assert gazetteer.geocode('Zubiri') is None
+    # Close spellings are only searched among names with the same initial
+    assert gazetteer.geocode('Kstella') is None
+
+def test_only_populated_places_of_the_country_are_indexed(gazetteer):
+    assert gazetteer.geocode('Monte Estella') is None
+    assert gazetteer.geocode('Saint-Jean-Pied-de-Port') is None
+
+def test_queries_need_a_town(gazetteer):
+    assert gazetteer.query('Albergue', '  Estella ') == 'Estella'
+    assert gazetteer.query('Albergue', ' ') is None
+
+def test_geojson_gazetteers_are_supported(tmp_path):
+    path = tmp_path / 'towns.geojson'
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-2.0317, 42.6717]},
+         'properties': {'name': 'Estella'}},
+        {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': [[0, 0], [1, 1]]},
+         'properties': {'name': 'Camino'}},
+    ]}), encoding='utf-8')
+
+    gazetteer = GazetteerBackend(str(path))
+
+    assert gazetteer.geocode('estella')[:3] == (42.6717, -2.0317, 'medium')
+    assert gazetteer.geocode('Camino') is None
+
+def test_town_keys_drop_punctuation():
+    assert town_key('Saint-Jean-Pied-de-Port') == 'saint jean pied de port'
+    assert town_key(' Estella / Lizarra ') == 'estella lizarra'
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the conditional-GET and offline modes of http_cache.py.
+A stand-in fetch function plays the web server.
+"""
+
+import pytest
+import requests
+
+from http_cache import CacheMissError, HttpCache
+
+URL = 'https://example.org/stamp/albergue'
+
+def response(status_code, body=b'', headers=None):
+    """Build a requests.Response as the network would return it."""
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers.update(headers or {})
+    resp._content = body
+    resp.url = URL
+    return resp
+
+class Server:
+    """Fetch function answering 304 when the client's ETag is current."""
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, url, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        if (headers or {}).get('If-None-Match') == self.etag:
+            return response(304, headers={'ETag': self.etag})
+        return response(200, self.body, {'ETag': self.etag, 'Content-Type': 'text/html; charset=utf-8'})
+
+def test_revalidation_serves_the_cached_body_on_304(tmp_path):
+    cache = HttpCache(str(tmp_path / 'cache.sqlite'))
+    server = Server(b'<h1>Albergue</h1>', '"v1"')
+
+    first = cache.get(URL, server, timeout=30)
+    second = cache.get(URL, server, timeout=30)
+
+    assert server.requests == [{}, {'If-None-Match': '"v1"'}]
+    assert first.content == second.content == b'<h1>Albergue</h1>'
+    assert second.status_code == 200 and second.from_cache
+    assert second.text == '<h1>Albergue</h1>'
+    assert cache.stats == {'hits': 0, 'revalidated': 1, 'stored': 1, 'misses': 1}
+
+    # A changed page replaces the cached copy
+    server.body, server.etag = b'<h1>Albergue nuevo</h1>', '"v2"'
+    assert cache.get(URL, server).content == b'<h1>Albergue nuevo</h1>'
+    assert cache.lookup(URL)['etag'] == '"v2"'
+
+def test_offline_mode_never_touches_the_network(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    online = HttpCache(path)
+    online.get(URL, Server(b'<h1>Albergue</h1>', '"v1"'))
+    online.close()
+
+    def no_network(url, **kwargs):
+        raise AssertionError(f"offline cache fetched {url}")
+
+    offline = HttpCache(path, mode='offline')
+    assert offline.get(URL, no_network).content == b'<h1>Albergue</h1>'
+    with pytest.raises(CacheMissError):
+        offline.get('https://example.org/stamp/unknown', no_network)
+    assert offline.stats['hits'] == 1 and offline.stats['misses'] == 1
+
+def test_refresh_mode_ignores_cached_validators(tmp_path):
+    cache = HttpCache(str(tmp_path / 'cache.sqlite'))
+    server = Server(b'<h1>Albergue</h1>', '"v1"')
+    cache.get(URL, server)
+
+    refresh = HttpCache(cache.path, mode='refresh')
+    refresh.get(URL, server)
+
+    assert server.requests == [{}, {}]
+
+def test_streamed_and_binary_responses_are_not_stored(tmp_path):
+    cache = HttpCache(str(tmp_path / 'cache.sqlite'))
+    streamed = []
+
+    class Body:
+        """Streamed response whose body must not be read by the cache."""
+        status_code = 200
+        headers = {'Content-Type': 'image/jpeg'}
+
+        @property
+        def content(self):
+            raise AssertionError("streamed body read by the cache")
+
+    def fetch(url, **kwargs):
+        streamed.append(kwargs)
+        return Body()
+
+    assert isinstance(cache.get('https://example.org/a.jpg', fetch, stream=True, timeout=30), Body)
+    assert streamed == [{'stream': True, 'timeout': 30}]
+    # Binary responses fetched without streaming are passed through too
+    cache.get('https://example.org/b.jpg', lambda url, **kwargs: response(200, b'\xff\xd8', {'Content-Type': 'image/jpeg'}))
+    assert cache.lookup('https://example.org/a.jpg') is None and cache.lookup('https://example.org/b.jpg') is None
+    assert cache.stats['stored'] == 0
+
+    offline = HttpCache(cache.path, mode='offline')
+    with pytest.raises(CacheMissError):
+        offline.get('https://example.org/a.jpg', fetch, stream=True)
+    assert len(streamed) == 1
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed image store of image_store.py and for
+saving its manifest when a crawl is interrupted.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import pytest
+
+import main
+from image_store import ImageStore, link_or_copy
+
+def download(store, name, body):
+    """Write a downloaded temp file and move it into the store."""
+    temp_path = os.path.join(store.directory, f"{name}.part")
+    os.makedirs(store.directory, exist_ok=True)
+    with open(temp_path, 'wb') as f:
+        f.write(body)
+    sha256 = hashlib.sha256(body).hexdigest()
+    return sha256, store.add(temp_path, sha256, len(body), '.jpg')
+
+def test_duplicate_images_are_stored_once(tmp_path):
+    store = ImageStore(str(tmp_path / 'images'))
+
+    sha_a, path_a = download(store, 'albergue', b'shared stamp')
+    sha_b, path_b = download(store, 'parroquia', b'shared stamp')
+    store.record('https://example.org/stamp/albergue', 'https://example.org/a.jpg', sha_a)
+    store.record('https://example.org/stamp/parroquia', 'https://example.org/b.jpg', sha_b)
+
+    assert path_a == path_b == store.path_for(sha_a, '.jpg')
+    assert sorted(os.listdir(store.directory)) == [f"{sha_a}.jpg"]
+    assert store.stats == {'stored': 1, 'deduplicated': 1, 'bytes_saved': len(b'shared stamp')}
+    assert store.lookup('https://example.org/stamp/parroquia') == {
+        'image_url': 'https://example.org/b.jpg', 'sha256': sha_a, 'path': path_a,
+    }
+
+def test_manifest_autosaves_and_reloads(tmp_path):
+    store = ImageStore(str(tmp_path / 'images'), autosave_every=2)
+    sha256, path = download(store, 'albergue', b'stamp')
+
+    store.record('https://example.org/stamp/1', 'https://example.org/a.jpg', sha256)
+    assert not os.path.exists(store.manifest_path)
+    store.record('https://example.org/stamp/2', 'https://example.org/a.jpg', sha256)
+
+    reopened = ImageStore(store.directory)
+    assert reopened.lookup('https://example.org/stamp/2')['path'] == path
+    assert reopened.manifest['objects'] == {sha256: {'path': path, 'size': len(b'stamp')}}
+
+def test_link_or_copy_hardlinks_the_stored_image(tmp_path):
+    source = tmp_path / 'abc.jpg'
+    source.write_bytes(b'stamp')
+    destination = tmp_path / 'clean' / 'Estella_Albergue.jpg'
+    destination.parent.mkdir()
+
+    assert link_or_copy(str(source), str(destination)) == 'linked'
+    assert os.stat(source).st_ino == os.stat(destination).st_ino
+    assert link_or_copy(str(source), str(destination)) == 'unchanged'
+
+    # A stale file at the destination is replaced by a link
+    other = tmp_path / 'def.jpg'
+    other.write_bytes(b'new stamp')
+    assert link_or_copy(str(other), str(destination)) == 'linked'
+    assert destination.read_bytes() == b'new stamp'
+
+def test_interrupted_crawl_saves_the_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--routes', 'navarro', '--image-workers', '0'])
+
+    def interrupted_route(scraper, image_pool=None):
+        # A few images stored, fewer than the autosave threshold, then Ctrl+C
+        sha256, _ = download(scraper.image_store, 'albergue', b'stamp')
+        scraper.image_store.record('https://example.org/stamp/1', 'https://example.org/a.jpg', sha256)
+        raise KeyboardInterrupt
+    monkeypatch.setattr(main, 'scrape_route', interrupted_route)
+
+    main.main()
+
+    with open(tmp_path / 'images' / 'stamp_images' / 'manifest.json', encoding='utf-8') as f:
+        assert list(json.load(f)['stamps']) == ['https://example.org/stamp/1']
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for merging a re-crawl into the previous dataset (incremental.py).
+"""
+
+import hashlib
+
+import pandas as pd
+
+from incremental import merge_dataset, row_key
+
+COLUMNS = ['route', 'town', 'place', 'stamp_url', 'categories', 'english_categories', 'image_path']
+
+def stamp(route, town, place, url, image_path='images/a.jpg'):
+    """One dataset row."""
+    return {'route': route, 'town': town, 'place': place, 'stamp_url': url,
+            'categories': 'Albergues de peregrinos', 'english_categories': 'Pilgrim hostels',
+            'image_path': image_path}
+
+def frame(*rows):
+    return pd.DataFrame(list(rows), columns=COLUMNS)
+
+def test_stamps_gone_from_crawled_routes_become_tombstones():
+    kept = stamp('Camino Navarro', 'Estella', 'Albergue', 'https://example.org/1')
+    gone = stamp('Camino Navarro', 'Estella', 'Parroquia', 'https://example.org/2')
+    other_route = stamp('Camino Francés', 'Sarria', 'Bar', 'https://example.org/3')
+    previous = frame(kept, gone, other_route)
+
+    merged, changeset = merge_dataset(previous, {row_key(kept)}, frame(), frame(), ['Camino Navarro'])
+
+    assert merged['stamp_url'].tolist() == [kept['stamp_url'], other_route['stamp_url']]
+    assert [row['stamp_url'] for row in changeset['removed']] == [gone['stamp_url']]
+    assert changeset['removed'][0]['removed_at'] == changeset['generated']
+    assert changeset['added'] == [] and changeset['modified'] == []
+
+def test_modified_and_added_stamps_are_merged_in_place():
+    unchanged = stamp('Camino Navarro', 'Estella', 'Albergue', 'https://example.org/1')
+    edited = stamp('Camino Navarro', 'Estella', 'Parroquia', 'https://example.org/2')
+    previous = frame(unchanged, edited)
+    new = stamp('Camino Navarro', 'Viana', 'Hospital', 'https://example.org/4')
+    discovered = {row_key(unchanged), row_key(edited), row_key(new)}
+
+    # The unchanged page was re-scraped too, but its content did not change
+    changed = frame(unchanged, dict(edited, image_path='images/b.jpg'))
+    merged, changeset = merge_dataset(previous, discovered, frame(new), changed, ['Camino Navarro'])
+
+    assert merged['stamp_url'].tolist() == ['https://example.org/1', 'https://example.org/2', 'https://example.org/4']
+    assert merged['image_path'].tolist() == ['images/a.jpg', 'images/b.jpg', 'images/a.jpg']
+    assert [entry['after']['stamp_url'] for entry in changeset['modified']] == [edited['stamp_url']]
+    assert changeset['modified'][0]['before']['image_path'] == 'images/a.jpg'
+    assert [row['stamp_url'] for row in changeset['added']] == [new['stamp_url']]
+    assert changeset['removed'] == []
+
+def test_images_moved_into_the_store_are_not_modifications(tmp_path):
+    # A dataset written before the image store names images after their URL
+    old_dir = tmp_path / 'images' / 'stamp_images'
+    old_dir.mkdir(parents=True)
+    (old_dir / 'sello_albergue.jpg').write_bytes(b'albergue stamp')
+    (old_dir / 'sello_parroquia.jpg').write_bytes(b'parroquia stamp')
+    moved = stamp('Camino Navarro', 'Estella', 'Albergue', 'https://example.org/1', str(old_dir / 'sello_albergue.jpg'))
+    redrawn = stamp('Camino Navarro', 'Estella', 'Parroquia', 'https://example.org/2', str(old_dir / 'sello_parroquia.jpg'))
+    csv_path = tmp_path / 'pilgrim_stamps.csv'
+    frame(moved, redrawn).to_csv(csv_path, index=False)
+    previous = pd.read_csv(csv_path, keep_default_na=False)
+
+    # The re-crawl stores the same albergue image and a new parroquia one by hash
+    albergue_sha = hashlib.sha256(b'albergue stamp').hexdigest()
+    parroquia_sha = hashlib.sha256(b'new parroquia stamp').hexdigest()
+    changed = frame(dict(moved, image_path=str(old_dir / f"{albergue_sha}.jpg")),
+                    dict(redrawn, image_path=str(old_dir / f"{parroquia_sha}.jpg")))
+    discovered = {row_key(moved), row_key(redrawn)}
+
+    merged, changeset = merge_dataset(previous, discovered, frame(), changed, ['Camino Navarro'])
+
+    assert [entry['after']['stamp_url'] for entry in changeset['modified']] == [redrawn['stamp_url']]
+    # Both rows now point into the store
+    assert merged['image_path'].tolist() == changed['image_path'].tolist()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests that the lxml and BeautifulSoup parser backends of parsers.py
+extract identical data from stamp and town pages.
+"""
+
+import pytest
+
+pytest.importorskip('lxml')
+
+from parsers import LxmlParser, SoupParser, get_parser
+
+TOWN_PATTERN = '/menu-camino-navarro/category/'
+STAMP_PATTERN = '/menu-camino-navarro/item/'
+
+TOWN_PAGE = """<!DOCTYPE html>
+<html><head><title>Estella - Los Sellos del Camino</title></head>
+<body>
+<ul class="menu">
+  <li><a href="/index.php/ruta/menu-camino-navarro/category/estella">Estella</a></li>
+  <li><a href="/index.php/ruta/menu-camino-navarro/category/viana">Viana</a></li>
+  <li><a href="/index.php/ruta/menu-camino-navarro/category/estella">Estella again</a></li>
+</ul>
+<div class="items">
+  <a href="/index.php/ruta/menu-camino-navarro/item/albergue-de-peregrinos"><img src="/media/zoo/images/a.jpg"></a>
+  <a href="/index.php/ruta/menu-camino-navarro/item/parroquia-de-san-pedro">Parroquia de San Pedro</a>
+  <a href="/index.php/ruta/menu-camino-navarro/item/albergue-de-peregrinos">Albergue</a>
+  <a>no href</a>
+  <a href="https://other.example.org/">Elsewhere</a>
+</div>
+</body></html>"""
+
+STAMP_PAGES = {
+    'full item': """<!DOCTYPE html>
+<html><head><title>Sello - Los Sellos del Camino</title></head>
+<body>
+<div id="header"><img src="/images/logo.png"></div>
+<h1 class="pos-title">  Albergue de peregrinos <span>Jesús y María</span> </h1>
+<div class="pos-media"><img src="/media/zoo/images/sello_abc123.jpg" alt="sello"><img alt="no src"></div>
+<div class="element element-itemcategory first last">
+  <a href="/category/albergues">Albergues de peregrinos</a>,
+  <a href="/category/parroquias"> Parroquias </a>,
+  <a href="/category/empty">   </a>
+  <a>Sin enlace</a>
+</div>
+</body></html>""",
+    'heading fallbacks': """<html><head><title>Título</title></head><body>
+<h1>   </h1><h2></h2><h3>Bar Iruña</h3>
+<div class="element-itemcategory"><a href="/category/bares">Bares</a></div>
+<div class="element element-itemcategory"><a href="/category/other">Second block</a></div>
+</body></html>""",
+    'title only': """<html><head><title> Ermita de Eunate </title></head><body>
+<p>No headings here</p><img src="/media/zoo/images/eunate.jpg">
+</body></html>""",
+    'missing elements': """<html><body><p>Página sin datos</p></body></html>""",
+    'empty categories': """<html><body><h1>Hospital</h1>
+<div class="element element-itemcategory"></div></body></html>""",
+    'empty page': "",
+    'whitespace page': "   \n ",
+}
+
+@pytest.mark.parametrize('name', list(STAMP_PAGES))
+def test_backends_extract_identical_stamp_fields(name):
+    html = STAMP_PAGES[name]
+    assert LxmlParser().extract_stamp_page(html) == SoupParser().extract_stamp_page(html)
+
+def test_stamp_fields_match_the_page():
+    fields = LxmlParser().extract_stamp_page(STAMP_PAGES['full item'])
+
+    assert fields == {
+        'place_name': 'Albergue de peregrinos Jesús y María',
+        'image_srcs': ['/images/logo.png', '/media/zoo/images/sello_abc123.jpg'],
+        'category_classes': ['element', 'element-itemcategory', 'first', 'last'],
+        'categories': ['Albergues de peregrinos', 'Parroquias'],
+    }
+    assert LxmlParser().extract_stamp_page(STAMP_PAGES['heading fallbacks'])['place_name'] == 'Bar Iruña'
+    assert LxmlParser().extract_stamp_page(STAMP_PAGES['title only'])['place_name'] == 'Ermita de Eunate'
+    assert LxmlParser().extract_stamp_page(STAMP_PAGES['missing elements']) == {
+        'place_name': None, 'image_srcs': [], 'category_classes': None, 'categories': [],
+    }
+
+@pytest.mark.parametrize('pattern', [TOWN_PATTERN, STAMP_PATTERN, 'no-such-pattern'])
+def test_backends_extract_identical_links(pattern):
+    for html in (TOWN_PAGE, STAMP_PAGES['missing elements'], STAMP_PAGES['empty page']):
+        assert LxmlParser().extract_links(html, pattern) == SoupParser().extract_links(html, pattern)
+
+def test_links_are_unique_in_document_order():
+    assert LxmlParser().extract_links(TOWN_PAGE, STAMP_PATTERN) == [
+        '/index.php/ruta/menu-camino-navarro/item/albergue-de-peregrinos',
+        '/index.php/ruta/menu-camino-navarro/item/parroquia-de-san-pedro',
+    ]
+
+def test_unknown_backend_is_rejected():
+    assert get_parser('html.parser').name == 'html.parser'
+    with pytest.raises(ValueError):
+        get_parser('regex')
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the route registry of routes.py.
+"""
+
+import pytest
+
+import routes
+from routes import RouteConfig, get_route, register_route, route_keys
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A private copy of the registry, so registered routes do not leak."""
+    monkeypatch.setattr(routes, 'ROUTES', dict(routes.ROUTES))
+    return routes.ROUTES
+
+def test_site_routes_follow_the_menu_link_layout():
+    navarro = get_route('navarro')
+
+    assert navarro.name == 'Camino Navarro'
+    assert navarro.town_pattern == 'menu-camino-navarro/category/'
+    assert navarro.stamp_pattern == 'menu-camino-navarro/item/'
+    assert route_keys()[:2] == ['navarro', 'frances']
+
+def test_unknown_routes_are_rejected():
+    with pytest.raises(ValueError, match='navarro'):
+        get_route('portugues')
+
+def test_registered_routes_are_crawlable_by_key(registry):
+    norte = RouteConfig('norte', 'Camino del Norte', '/index.php/menu-camino-norte',
+                        'menu-camino-norte/category/', 'menu-camino-norte/item/')
+    register_route(norte)
+
+    assert get_route('norte') is norte
+    assert route_keys()[-1] == 'norte'
+
+    # Registering a key again replaces the route in place
+    renamed = norte._replace(name='Camino del Norte (costa)')
+    register_route(renamed)
+    assert get_route('norte').name == 'Camino del Norte (costa)'
+    assert route_keys().count('norte') == 1
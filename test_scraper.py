@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Tests for scraper.py.
+Requests never reach the network: sessions and failures are stand-ins.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import scraper
+from crawl_state import CrawlState
+from http_cache import HttpCache
+from image_store import ImageStore
+from routes import get_route
+from scraper import AsyncPilgrimStampScraper, PilgrimStampScraper, RetryPolicy, crawl_routes
+from utils import RateLimiter
+
+def ok_response(url):
+    """200 response for url with an empty HTML body."""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b'<html></html>'
+    response.url = url
+    return response
+
+def http_error(status_code, headers=None):
+    """HTTPError carrying a response with the given status and headers."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status_code} Error", response=response)
+
+class Failing:
+    """Callable raising a fresh error on every call, counting the calls."""
+
+    def __init__(self, make_error):
+        self.make_error = make_error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        raise self.make_error()
+
+class StampSite:
+    """
+    Local copy of the stamp site serving route menus, town pages, stamp
+    pages and images, recording the requests it receives.
+    """
+
+    def __init__(self, towns_by_route, latency=0.0):
+        """
+        Args:
+            towns_by_route: {route key: {town slug: [stamp slugs]}}
+            latency: Seconds each response is delayed, or a function of the request path
+        """
+        self.latency = latency
+        self.pages = {}
+        for route, towns in towns_by_route.items():
+            config = get_route(route)
+            prefix = f"/index.php/ruta/{config.town_pattern.split('/')[0]}"
+            self.pages[config.menu_path] = ('text/html', ''.join(
+                f'<a href="{prefix}/category/{town}">{town}</a>' for town in towns
+            ))
+            for town, stamps in towns.items():
+                self.pages[f"{prefix}/category/{town}"] = ('text/html', ''.join(
+                    f'<a href="{prefix}/item/{stamp}">{stamp}</a>' for stamp in stamps
+                ))
+                for stamp in stamps:
+                    self.pages[f"{prefix}/item/{stamp}"] = ('text/html', (
+                        f'<h1>{stamp}</h1><img src="/media/zoo/images/{stamp}.jpg">'
+                        '<div class="element element-itemcategory"><a href="#">Albergues de peregrinos</a></div>'
+                    ))
+                    self.pages[f"/media/zoo/images/{stamp}.jpg"] = ('image/jpeg', f"stamp {stamp}")
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests.append(handler.path)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency(handler.path) if callable(self.latency) else self.latency)
+            content_type, body = self.pages.get(handler.path, ('text/html', None))
+            handler.send_response(404 if body is None else 200)
+            body = (body or 'Not found').encode('utf-8')
+            handler.send_header('Content-Type', content_type)
+            handler.send_header('Content-Length', str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry delays instead of sleeping."""
+    delays = []
+    monkeypatch.setattr(scraper.time, 'sleep', delays.append)
+    return delays
+
+def test_async_calls_take_their_first_token_on_the_event_loop(tmp_path, monkeypatch):
+    limiter = RateLimiter(default_rate=1000.0, default_burst=1)
+    stamp_scraper = AsyncPilgrimStampScraper(
+        'navarro', concurrency=4, rate_limiter=limiter, image_store=ImageStore(str(tmp_path))
+    )
+    sent = []
+    monkeypatch.setattr(stamp_scraper.session, 'get', lambda url, **kwargs: sent.append(url) or ok_response(url))
+    blocking = []
+    acquire = limiter.acquire
+    monkeypatch.setattr(limiter, 'acquire', lambda url: blocking.append(url) or acquire(url))
+
+    def fetch_twice(url):
+        """A call sending a second request, as a retry or an image download does."""
+        stamp_scraper._send(url)
+        return stamp_scraper._send(url)
+
+    urls = [f"https://example.org/stamp/{i}" for i in range(6)]
+    async def run():
+        await asyncio.gather(*(stamp_scraper._run_bounded(url, stamp_scraper._send, url) for url in urls))
+        await stamp_scraper._run_bounded(urls[0], fetch_twice, urls[0])
+    asyncio.run(run())
+    stamp_scraper._executor.shutdown()
+
+    # Every request paid exactly one token; only the second one of a call waited in its thread
+    assert len(sent) == 8
+    assert limiter.stats()['example.org']['requests'] == 8
+    assert blocking == [urls[0]]
+
+def test_retry_after_overrides_backoff(sleeps):
+    policy = RetryPolicy(max_retries=2, base_delay=1.0, max_delay=30.0)
+
+    assert policy.get_delay(0, http_error(429, {'Retry-After': '7'})) == 7.0
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=20)
+    assert 15 < policy.get_delay(0, http_error(503, {'Retry-After': format_datetime(retry_at, usegmt=True)})) <= 20
+
+    failing = Failing(lambda: http_error(429, {'Retry-After': '5'}))
+    with pytest.raises(requests.HTTPError):
+        policy.call(failing)
+    assert failing.calls == 3
+    assert sleeps == [5.0, 5.0]
+
+def test_retry_after_beyond_max_delay_gives_up_at_once(sleeps):
+    policy = RetryPolicy(max_retries=3, max_delay=60.0, retry_budget=10)
+    failing = Failing(lambda: http_error(503, {'Retry-After': '3600'}))
+
+    with pytest.raises(requests.HTTPError):
+        policy.call(failing)
+
+    assert failing.calls == 1
+    assert sleeps == []
+    assert policy.retries_used == 0
+
+def test_fatal_errors_are_not_retried(sleeps):
+    policy = RetryPolicy(max_retries=3)
+    for make_error in (lambda: http_error(404), lambda: ValueError("unparseable page")):
+        failing = Failing(make_error)
+        with pytest.raises(Exception):
+            policy.call(failing)
+        assert failing.calls == 1
+    assert sleeps == []
+
+def test_retry_budget_is_shared_by_all_calls(sleeps):
+    policy = RetryPolicy(max_retries=5, base_delay=0.0, retry_budget=3)
+
+    first = Failing(requests.Timeout)
+    with pytest.raises(requests.Timeout):
+        policy.call(first)
+    second = Failing(requests.ConnectionError)
+    with pytest.raises(requests.ConnectionError):
+        policy.call(second)
+
+    # Three retries in total, all spent by the first call
+    assert (first.calls, second.calls) == (4, 1)
+    assert policy.retries_used == 3
+
+def test_nested_calls_do_not_multiply_retries(sleeps):
+    policy = RetryPolicy(max_retries=2, base_delay=0.0, retry_budget=None)
+    inner = Failing(requests.Timeout)
+
+    with pytest.raises(requests.Timeout):
+        policy.call(policy.call, inner)
+
+    assert inner.calls == 3
+    assert len(sleeps) == 2
+
+class ImageResponse:
+    """Streamed image response whose body can break off after some chunks."""
+
+    def __init__(self, chunks, status_code=200, headers=None, broken=False):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.headers = {'content-type': 'image/jpeg', **(headers or {})}
+        self.broken = broken
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise http_error(self.status_code, self.headers)
+
+    def iter_content(self, chunk_size):
+        yield from self.chunks
+        if self.broken:
+            raise requests.exceptions.ChunkedEncodingError("connection broken mid-body")
+
+def test_image_downloads_use_the_retry_policy_and_discard_partial_files(tmp_path, monkeypatch, sleeps):
+    stamp_scraper = PilgrimStampScraper(
+        'navarro', retry_policy=RetryPolicy(max_retries=3, base_delay=1.0, jitter=False),
+        image_store=ImageStore(str(tmp_path / 'images'))
+    )
+    temp_path = str(tmp_path / 'images' / 'stamp.jpg.part')
+    responses = [
+        ImageResponse([], status_code=503),
+        ImageResponse([b'half an im'], broken=True),
+        ImageResponse([b'a stamp ', b'image']),
+    ]
+    partial_seen = []
+    def get(url, **kwargs):
+        partial_seen.append(os.path.exists(temp_path))
+        return responses.pop(0)
+    monkeypatch.setattr(stamp_scraper, '_get', get)
+
+    downloaded = stamp_scraper._download_image('https://example.org/stamp.jpg', temp_path)
+
+    assert downloaded['size'] == len(b'a stamp image')
+    assert sleeps == [1.0, 2.0]
+    # The broken body was removed before the next attempt
+    assert partial_seen == [False, False, False]
+    with open(temp_path, 'rb') as f:
+        assert f.read() == b'a stamp image'
+
+def test_failed_image_downloads_leave_no_partial_file(tmp_path, monkeypatch, sleeps):
+    stamp_scraper = PilgrimStampScraper(
+        'navarro', retry_policy=RetryPolicy(max_retries=1, base_delay=0.0),
+        image_store=ImageStore(str(tmp_path / 'images'))
+    )
+    temp_path = str(tmp_path / 'images' / 'stamp.jpg.part')
+    monkeypatch.setattr(stamp_scraper, '_get', lambda url, **kwargs: ImageResponse([b'partial'], broken=True))
+
+    assert stamp_scraper._download_image('https://example.org/stamp.jpg', temp_path) is None
+    assert not os.path.exists(temp_path)
+
+    # An interrupt is not swallowed, but still cleans up
+    def interrupted(url, **kwargs):
+        response = ImageResponse([b'partial'])
+        def chunks(chunk_size):
+            yield b'partial'
+            raise KeyboardInterrupt
+        response.iter_content = chunks
+        return response
+    monkeypatch.setattr(stamp_scraper, '_get', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        stamp_scraper._download_image('https://example.org/stamp.jpg', temp_path)
+    assert not os.path.exists(temp_path)
+
+def test_offline_replay_reuses_stored_images(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / 'images'))
+    online = PilgrimStampScraper('navarro', image_store=store)
+    monkeypatch.setattr(online, '_get', lambda url, **kwargs: ImageResponse([b'a stamp image']))
+    path = online.store_stamp_image('https://example.org/stamp.jpg', 'https://example.org/stamp/1')
+
+    offline = PilgrimStampScraper('navarro', image_store=store,
+                                  cache=HttpCache(str(tmp_path / 'cache.sqlite'), mode='offline'))
+    monkeypatch.setattr(offline, 'session', None)
+
+    assert offline.store_stamp_image('https://example.org/stamp.jpg', 'https://example.org/stamp/1') == path
+    # A stamp whose image changed, or was never stored, cannot be replayed
+    assert offline.store_stamp_image('https://example.org/new.jpg', 'https://example.org/stamp/1') is None
+    assert offline.store_stamp_image('https://example.org/stamp.jpg', 'https://example.org/stamp/2') is None
+
+def test_resumed_crawl_skips_completed_stamps(tmp_path, monkeypatch):
+    town_url = 'https://example.org/town/estella'
+    done_url = 'https://example.org/stamp/albergue'
+    failed_url = 'https://example.org/stamp/parroquia'
+    record = {'place_name': 'Albergue', 'image_url': 'https://example.org/a.jpg', 'town_name': 'Estella'}
+
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    state.record_town('navarro', town_url, 'Estella', [done_url, failed_url])
+    state.record_stamp('navarro', 'Estella', done_url, record)
+    state.record_stamp('navarro', 'Estella', failed_url, None, 'timeout')
+
+    stamp_scraper = PilgrimStampScraper(
+        'navarro', retry_policy=RetryPolicy(max_retries=0), state=state,
+        image_store=ImageStore(str(tmp_path / 'images'))
+    )
+    sent = []
+    def offline_send(url, **kwargs):
+        sent.append(url)
+        raise requests.ConnectionError(f"offline: {url}")
+    monkeypatch.setattr(stamp_scraper, '_send', offline_send)
+
+    assert stamp_scraper.get_stamp_locations_by_town([town_url]) == {'Estella': [done_url, failed_url]}
+    assert stamp_scraper.process_stamp_location(done_url, 'Estella') == record
+    assert sent == []
+    # Failed stamps are fetched again
+    assert stamp_scraper.process_stamp_location(failed_url, 'Estella') is None
+    assert sent == [failed_url]
+    state.close()
+
+def test_crawl_routes_crawls_every_route_from_the_stub_site(tmp_path, monkeypatch):
+    towns = {
+        'navarro': {'estella': ['albergue-estella', 'parroquia-estella'], 'viana': ['hospital-viana']},
+        'frances': {'sarria': ['bar-sarria', 'albergue-sarria', 'ermita-sarria']},
+    }
+    store = ImageStore(str(tmp_path / 'images'))
+
+    with StampSite(towns) as site:
+        monkeypatch.setattr(scraper, 'BASE_URL', site.url)
+        results = asyncio.run(crawl_routes(
+            ['navarro', 'frances'], concurrency=4, image_store=store,
+            rate_limiter=RateLimiter(default_rate=1000.0, default_burst=100)
+        ))
+
+    assert list(results) == ['navarro', 'frances']
+    assert [(r['route'], r['town_name'], r['place_name']) for r in results['navarro']] == [
+        ('Camino Navarro', 'Estella', 'albergue-estella'),
+        ('Camino Navarro', 'Estella', 'parroquia-estella'),
+        ('Camino Navarro', 'Viana', 'hospital-viana'),
+    ]
+    assert [r['place_name'] for r in results['frances']] == ['bar-sarria', 'albergue-sarria', 'ermita-sarria']
+    assert all(r['categories'] == ['Albergues de peregrinos'] for r in results['frances'])
+    # Every page and image was fetched once: 2 menus, 3 towns, 6 stamps, 6 images
+    assert len(site.requests) == len(set(site.requests)) == 17
+    assert store.stats['stored'] == 6
+
+def test_crawl_routes_without_routes_does_nothing():
+    assert asyncio.run(crawl_routes([])) == {}
+
+def test_async_crawl_keeps_order_under_a_bounded_worker_queue(tmp_path, monkeypatch):
+    towns = {'navarro': {town: [f"{town}-stamp-{i}" for i in range(8)] for town in ('estella', 'viana', 'los-arcos')}}
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    state_threads = set()
+    for name in ('get_town_stamps', 'record_town', 'get_stamp_record', 'record_stamp'):
+        def on_thread(*args, _call=getattr(state, name)):
+            state_threads.add(threading.current_thread())
+            return _call(*args)
+        monkeypatch.setattr(state, name, on_thread)
+
+    # Some stamp pages answer slowly, so requests complete out of order
+    def latency(path):
+        return 0.03 if path.endswith(('-1', '-4', '-6')) else 0.005
+
+    with StampSite(towns, latency) as site:
+        monkeypatch.setattr(scraper, 'BASE_URL', site.url)
+        stamp_scraper = AsyncPilgrimStampScraper(
+            'navarro', concurrency=3, state=state, image_store=ImageStore(str(tmp_path / 'images')),
+            rate_limiter=RateLimiter(default_rate=1000.0, default_burst=100)
+        )
+        running = []
+        active = [0]
+        process = stamp_scraper.process_stamp_location
+        async def tracked(*args):
+            active[0] += 1
+            running.append(active[0])
+            try:
+                return await process(*args)
+            finally:
+                active[0] -= 1
+        monkeypatch.setattr(stamp_scraper, 'process_stamp_location', tracked)
+
+        records = asyncio.run(stamp_scraper.crawl())
+        stamp_scraper._executor.shutdown()
+
+    # Records in town and page order, as the sequential crawl returns them
+    assert [record['place_name'] for record in records] == [
+        stamp for stamps in towns['navarro'].values() for stamp in stamps
+    ]
+    # At most `concurrency` stamps in progress and requests in flight
+    assert max(running) == 3
+    assert 2 <= site.max_in_flight <= 3
+    # Crawl state was only touched from pool threads, never the event loop
+    assert state_threads and threading.main_thread() not in state_threads
+    assert len(state.get_towns('navarro')) == 3
+    state.close()
@@ -90,15 +90,10 @@ def test_small_sample():
                     # Scrape the stamp location
                     stamp_data = scraper.scrape_stamp_location(stamp_url)
                     if stamp_data:
-                        # Download the image
-                        import os
-                        from utils import sanitize_filename
+                        # Download the image into the content-addressed store
+                        local_image_path = scraper.store_stamp_image(stamp_data['image_url'], stamp_url)
                         
-                        image_filename = os.path.basename(stamp_data['image_url'])
-                        safe_filename = sanitize_filename(image_filename)
-                        local_image_path = os.path.join('images', 'stamp_images', safe_filename)
-                        
-                        if scraper.download_stamp_image(stamp_data['image_url'], local_image_path):
+                        if local_image_path:
                             # Update the stamp data with local image path and town name
                             stamp_data['local_image_path'] = local_image_path
                             stamp_data['town_name'] = town_name  # Add the town name from the dictionary
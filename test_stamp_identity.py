@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the (place, town) stamp identity of stamp_identity.py.
+"""
+
+import numpy as np
+import pandas as pd
+
+import stamp_identity
+
+from stamp_identity import stamp_keys, stamps_in
+
+def test_keys_identify_place_and_town_pairs():
+    df = pd.DataFrame({
+        'place': ['Albergue', 'Albergue', 'Albergue', None, 'Bar'],
+        'town': ['Estella', 'Viana', 'Estella', 'Estella', None],
+    })
+
+    keys = stamp_keys(df)
+
+    assert keys.dtype == 'UInt64'
+    assert keys[0] == keys[2]
+    assert keys[0] != keys[1]
+    assert keys[3:].isna().all()
+
+def test_keys_do_not_depend_on_where_the_pair_splits():
+    df = pd.DataFrame({'place': ['Albergue Estella', 'Albergue'], 'town': ['Viana', 'Estella Viana']})
+    keys = stamp_keys(df)
+    assert keys[0] != keys[1]
+
+def test_stamps_in_matches_the_brute_force_lookup():
+    stamps = pd.DataFrame({
+        'place': ['Albergue', 'Parroquia', 'Bar', np.nan, 'Hospital'],
+        'town': ['Estella', 'Viana', 'Sarria', 'Estella', 'Viana'],
+    })
+    flagged = pd.DataFrame({
+        'place_name': ['Parroquia', 'Albergue', np.nan, 'Hospital'],
+        'town_name': ['Viana', 'Viana', 'Estella', 'Estella'],
+    })
+
+    # Missing names read from CSV are NaN, which never equals anything
+    found = stamps_in(stamps, flagged, 'place_name', 'town_name')
+
+    expected = [
+        any(place == other_place and town == other_town
+            for other_place, other_town in zip(flagged['place_name'], flagged['town_name']))
+        for place, town in zip(stamps['place'], stamps['town'])
+    ]
+    assert found.tolist() == expected == [False, True, False, False, False]
+
+def test_hash_collisions_do_not_match_different_stamps(monkeypatch):
+    stamps = pd.DataFrame({'place': ['Albergue', 'Parroquia', 'Bar'], 'town': ['Estella', 'Viana', 'Sarria']})
+    flagged = pd.DataFrame({'place': ['Parroquia', 'Hospital'], 'town': ['Viana', 'Estella']})
+
+    # Every pair hashes to the same key
+    def colliding_keys(df, place_column='place', town_column='town'):
+        pairs = df[[place_column, town_column]]
+        return pd.Series(7, index=df.index, dtype='UInt64').mask(pairs.isna().any(axis=1))
+    monkeypatch.setattr(stamp_identity, 'stamp_keys', colliding_keys)
+
+    assert stamps_in(stamps, flagged).tolist() == [False, True, False]
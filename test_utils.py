@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-bucket rate limiter of utils.py.
+Blocking acquires run on a fake clock standing in for time.monotonic and time.sleep.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import utils
+from utils import RateLimiter, TokenBucket
+
+class FakeClock:
+    """Monotonic clock that only moves when slept on or advanced."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(utils.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(utils.time, 'sleep', clock.sleep)
+    return clock
+
+def test_bucket_allows_a_burst_then_paces_requests(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+
+    waits = [bucket.acquire() for _ in range(5)]
+
+    assert waits == [0.0, 0.0, 0.0, 0.5, 0.5]
+    assert clock.now == pytest.approx(1001.0)
+    assert (bucket.requests, bucket.throttled_requests) == (5, 2)
+    assert bucket.throttled_seconds == pytest.approx(1.0)
+
+def test_idle_time_refills_the_bucket_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=1.0, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+
+    # A slow response already used up the time until the next slot
+    clock.now += 1.0
+    assert bucket.acquire() == 0.0
+
+    clock.now += 60.0
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+def test_limiter_keeps_one_bucket_per_host(clock):
+    limiter = RateLimiter(default_rate=1.0, host_limits={'fast.example.org': (10.0, 1)})
+
+    assert limiter.bucket('https://slow.example.org/a') is limiter.bucket('slow.example.org')
+    assert [limiter.acquire('https://slow.example.org/a') for _ in range(2)] == [0.0, 1.0]
+    assert [limiter.acquire('https://fast.example.org/a') for _ in range(2)] == [0.0, pytest.approx(0.1)]
+    assert limiter.stats()['slow.example.org']['throttled_requests'] == 1
+
+def test_async_acquire_waits_without_blocking_the_event_loop():
+    bucket = TokenBucket(rate=50.0, burst=1)
+    ticks = []
+
+    async def ticker():
+        while len(ticks) < 5:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.005)
+
+    async def run():
+        return await asyncio.gather(bucket.acquire_async(), bucket.acquire_async(), bucket.acquire_async(), ticker())
+
+    start = time.monotonic()
+    waits = asyncio.run(run())[:3]
+
+    assert waits == [0.0, pytest.approx(0.02, abs=0.005), pytest.approx(0.04, abs=0.005)]
+    assert time.monotonic() - start == pytest.approx(0.04, abs=0.03)
+    # The loop kept running while the coroutines waited for their tokens
+    assert ticks[4] - start < 0.04
+
+def test_invalid_limits_are_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1.0, burst=0)
@@ -5,9 +5,12 @@ Contains helper functions for URL handling, HTML parsing, and other utilities.
 """
 
 import os
+import hashlib
 import time
+import asyncio
+import threading
 from urllib.parse import urljoin, urlparse
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 
 def ensure_directory_exists(directory_path: str) -> None:
@@ -85,14 +88,210 @@ def sanitize_filename(filename: str) -> str:
         filename = filename.replace(char, '_')
     return filename
 
-def rate_limit_delay(seconds: float = 1.0) -> None:
+def file_sha256(file_path: str, chunk_size: int = 65536) -> str:
     """
-    Implement rate limiting delay between requests.
+    Compute the SHA-256 hex digest of a file without loading it into memory.
     
     Args:
-        seconds: Number of seconds to delay
+        file_path: Path to the file
+        chunk_size: Bytes read per iteration
+    
+    Returns:
+        Hex digest of the file contents
+    """
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+class TokenBucket:
     """
-    time.sleep(seconds)
+    Token bucket allowing `rate` requests per second with bursts of up to `burst`.
+    
+    Callers reserve a token under a lock and then sleep outside it, so the
+    bucket can be shared by threads and by coroutines on an event loop.
+    A request only waits when the bucket is empty, so time already spent
+    waiting on a slow response counts towards the next slot.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize the bucket full.
+        
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens the bucket holds
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        
+        # Throttling statistics
+        self.requests = 0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+    
+    def _reserve(self) -> float:
+        """
+        Take one token, going into debt if the bucket is empty.
+        
+        Returns:
+            Seconds the caller must wait before making its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.requests += 1
+            if wait > 0:
+                self.throttled_requests += 1
+                self.throttled_seconds += wait
+            return wait
+    
+    def acquire(self) -> float:
+        """
+        Block the calling thread until a token is available.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    async def acquire_async(self) -> float:
+        """
+        Suspend the calling coroutine until a token is available.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+class RateLimiter:
+    """Registry of per-host token buckets shared by all HTTP clients."""
+    
+    def __init__(self, default_rate: float = 1.0, default_burst: int = 1,
+                 host_limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        Initialize the rate limiter.
+        
+        Args:
+            default_rate: Requests per second for hosts without an explicit limit
+            default_burst: Burst size for hosts without an explicit limit
+            host_limits: Mapping of host to (requests per second, burst)
+        """
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._host_limits = dict(host_limits or {})
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    def configure(self, host: str, rate: float, burst: int = 1) -> None:
+        """
+        Set the limit for a host, replacing any bucket already in use.
+        
+        Args:
+            host: Host name, e.g. "www.lossellosdelcamino.com"
+            rate: Requests per second
+            burst: Maximum burst size
+        """
+        with self._lock:
+            self._host_limits[host] = (rate, burst)
+            self._buckets[host] = TokenBucket(rate, burst)
+        logging.info(f"Rate limit for {host}: {rate} requests/second (burst {burst})")
+    
+    def bucket(self, url_or_host: str) -> TokenBucket:
+        """
+        Get the token bucket for a URL or host name.
+        
+        Args:
+            url_or_host: Full URL or bare host name
+            
+        Returns:
+            TokenBucket for the host
+        """
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self._host_limits.get(host, (self.default_rate, self.default_burst))
+                self._buckets[host] = TokenBucket(rate, burst)
+            return self._buckets[host]
+    
+    def acquire(self, url_or_host: str) -> float:
+        """
+        Wait for permission to send a request to a host (blocking).
+        
+        Args:
+            url_or_host: Full URL or bare host name
+            
+        Returns:
+            Seconds spent waiting
+        """
+        return self.bucket(url_or_host).acquire()
+    
+    async def acquire_async(self, url_or_host: str) -> float:
+        """
+        Wait for permission to send a request to a host (asyncio).
+        
+        Args:
+            url_or_host: Full URL or bare host name
+            
+        Returns:
+            Seconds spent waiting
+        """
+        return await self.bucket(url_or_host).acquire_async()
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get per-host throttling statistics.
+        
+        Returns:
+            Mapping of host to requests, throttled_requests and throttled_seconds
+        """
+        with self._lock:
+            return {
+                host: {
+                    'requests': bucket.requests,
+                    'throttled_requests': bucket.throttled_requests,
+                    'throttled_seconds': bucket.throttled_seconds,
+                }
+                for host, bucket in self._buckets.items()
+            }
+    
+    def log_stats(self) -> None:
+        """Log how much time each host spent throttled."""
+        for host, host_stats in self.stats().items():
+            logging.info(
+                f"Rate limiter {host}: {host_stats['requests']} requests, "
+                f"{host_stats['throttled_requests']} throttled, "
+                f"{host_stats['throttled_seconds']:.1f}s spent waiting"
+            )
+
+# Shared rate limiter used by the scraper and the geocoder
+RATE_LIMITER = RateLimiter(
+    default_rate=1.0,
+    default_burst=1,
+    host_limits={
+        'www.lossellosdelcamino.com': (1.0, 2),
+        'maps.googleapis.com': (10.0, 10),
+    }
+)
 
 # Spanish to English category translation mapping
 SPANISH_TO_ENGLISH_CATEGORIES = {